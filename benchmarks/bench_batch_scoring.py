@@ -0,0 +1,82 @@
+# benchmarks/bench_batch_scoring.py
+"""
+Throughput of score_logins_batch() vs. calling get_full_model_prediction() per row.
+
+    python benchmarks/bench_batch_scoring.py [--sizes 1000 100000 1000000]
+"""
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.database import get_full_model_prediction
+from utils.model_manager import get_model
+from utils.scoring import score_logins_batch
+
+LOCATIONS = [
+    ('Philippines', 'Manila'), ('Philippines', 'Cebu'), ('United Arab Emirates', 'Dubai'),
+    ('Singapore', 'Singapore'), ('Russia', 'Moscow'), ('Nigeria', 'Lagos'), ('Japan', 'Tokyo'),
+]
+
+
+def make_events(n, seed=0):
+    """Random but realistic-looking login events"""
+    rng = np.random.default_rng(seed)
+    loc = rng.integers(0, len(LOCATIONS), n)
+    return pd.DataFrame({
+        'time_diff': rng.exponential(12, n).round(2),
+        'distance': rng.choice([5, 50, 500, 2400, 8500, 12000, 15000], n),
+        'device_type': rng.integers(0, 3, n),
+        'is_attack_ip': (rng.random(n) < 0.05).astype(int),
+        'login_successful': (rng.random(n) > 0.1).astype(int),
+        'latency': rng.integers(10, 3000, n),
+        'country': [LOCATIONS[i][0] for i in loc],
+        'city': [LOCATIONS[i][1] for i in loc],
+    })
+
+
+def check_parity(events):
+    """Batch output must equal the single-row path row for row"""
+    batch = score_logins_batch(events)
+    for i, event in enumerate(events.to_dict('records')):
+        single = get_full_model_prediction('bench', event)
+        for key, value in single.items():
+            if batch.at[i, key] != value:
+                raise AssertionError(f"row {i} field {key}: {batch.at[i, key]!r} != {value!r}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[1_000, 100_000, 1_000_000])
+    parser.add_argument('--single-rows', type=int, default=200, help="rows to time on the per-row path")
+    args = parser.parse_args()
+
+    get_model()  # exclude the one-off load from the timings
+
+    check_parity(make_events(500, seed=1))
+    print("✅ Batch output matches the single-row path")
+
+    events = make_events(args.single_rows)
+    records = events.to_dict('records')
+    started = time.perf_counter()
+    for event in records:
+        get_full_model_prediction('bench', event)
+    per_row = (time.perf_counter() - started) / len(records)
+    print(f"single-row path: {1 / per_row:,.0f} rows/s ({per_row * 1e3:.2f} ms/row)")
+
+    for n in args.sizes:
+        events = make_events(n)
+        started = time.perf_counter()
+        score_logins_batch(events)
+        elapsed = time.perf_counter() - started
+        print(f"batch {n:>9,} rows: {elapsed:8.2f}s  {n / elapsed:>12,.0f} rows/s  "
+              f"({per_row * n / elapsed:,.0f}x per-row)")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+# benchmarks/bench_bulk_review.py
+"""
+Reviewing a selection of logins one UPDATE transaction per row
+(update_admin_action) vs. one write transaction
+(update_admin_actions_bulk), and loading one page of the review grid.
+
+    python benchmarks/bench_bulk_review.py [--rows 200000] [--selected 25 100 500] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_coded_storage import JSON_INSERT_SQL, random_row
+from utils import database
+from utils.cache import set_cache_enabled
+from utils.connection import connect
+from utils.migrations import migrate
+
+# The grid's first page of high-risk pending logins (pages/3_Recent Login Activities.py)
+GRID_FILTERS = {'review_status': 'pending', 'min_risk': 70}
+
+
+def best_of(repeat, run):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    return min(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--selected', type=int, nargs='+', default=[25, 100, 500])
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+    # Time the queries, not cache hits
+    set_cache_enabled(False)
+
+    with tempfile.TemporaryDirectory() as workdir:
+        database.DATABASE_PATH = os.path.join(workdir, 'bantai.db')
+        conn = connect(database.DATABASE_PATH)
+        migrate(conn, target=7)
+        rng = random.Random(0)
+        for start in range(0, args.rows, 10000):
+            with conn:
+                conn.executemany(JSON_INSERT_SQL, [random_row(rng, 2000) for _ in range(min(10000, args.rows - start))])
+        migrate(conn)
+        # Every run decides fresh pending logins, as an analyst working the backlog would
+        pending = [row[0] for row in conn.execute("SELECT id FROM login_activities WHERE admin_action = 'Pending Review'")]
+        rng.shuffle(pending)
+        conn.close()
+
+        def take(n):
+            return [pending.pop() for _ in range(n)]
+
+        results = []
+        for selected in args.selected:
+            per_row = best_of(args.repeat,
+                              lambda: [database.update_admin_action(i, 'False Positive') for i in take(selected)])
+            bulk = best_of(args.repeat, lambda: database.update_admin_actions_bulk(take(selected), 'False Positive'))
+            results.append((selected, per_row, bulk))
+
+        page = best_of(args.repeat, lambda: database.get_login_activities_page(limit=25, **GRID_FILTERS))
+        full_count = best_of(args.repeat, lambda: database.count_activities(**GRID_FILTERS))
+        bounded_count = best_of(args.repeat, lambda: database.count_activities(limit=1000, **GRID_FILTERS))
+
+    print(f"{args.rows:,} rows, best of {args.repeat}")
+    print(f"{'selected':>9} {'per row':>10} {'bulk':>9}")
+    for selected, per_row, bulk in results:
+        print(f"{selected:>9} {per_row:>8.1f}ms {bulk:>7.1f}ms")
+    print(f"\ngrid page (25 rows) {page:.1f}ms, count {full_count:.1f}ms, count up to 1,000 {bounded_count:.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,147 @@
+# benchmarks/bench_coded_storage.py
+"""
+Database size and full-listing read time with analysis factors/warnings
+stored as JSON text (schema version 7) vs. coded (version 8).
+
+    python benchmarks/bench_coded_storage.py [--rows 200000] [--repeat 3]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import database
+from utils.activities import query_login_activities
+from utils.connection import connect
+from utils.migrations import migrate
+
+CONTEXTS = [('Philippines', 'Manila', 'Domestic location'),
+            ('Philippines', 'Cebu', 'Domestic location'),
+            ('United Arab Emirates', 'Dubai', 'Major OFW employment hubs in Middle East'),
+            ('Singapore', 'Singapore', 'Major OFW employment hubs in Asia'),
+            ('Russia', 'Moscow', 'Known cybercrime and state-sponsored threat locations')]
+
+DEVICES = ['mobile', 'desktop', 'tablet']
+
+# Columns as version 7 stores them
+JSON_INSERT_SQL = '''
+    INSERT INTO login_activities
+    (user_id, login_timestamp, country, city, time_diff_hrs, distance_km, device_type, latency_ms,
+     login_successful, is_attack_ip, risk_score, risk_percentage, risk_classification, recommended_action,
+     recommendation_text, analysis_factors, warnings, behavior_consistency, location_context, admin_action)
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+# The listing query before coded storage, JSON parsed per row
+JSON_SELECT_SQL = '''
+    SELECT la.id AS "#", la.user_id AS "User ID", la.login_timestamp AS "Login Timestamp (UTC+8)",
+           la.country AS "Country", la.city AS "City", la.time_diff_hrs AS "time_diff (hrs)",
+           la.distance_km AS "distance (km)", la.device_type AS "device_type", la.latency_ms AS "latency (ms)",
+           la.login_successful AS "login_successful", la.is_attack_ip AS "is_attack_ip",
+           la.risk_score AS "risk_score", la.risk_percentage AS "Risk %", la.risk_classification AS "Classification",
+           la.recommended_action AS "AI Action", la.recommendation_text AS "AI Recommendation",
+           la.analysis_factors AS "Analysis Factors", la.warnings AS "Warnings",
+           la.behavior_consistency AS "Behavior %", la.location_context AS "Location Context",
+           la.admin_action AS "Admin Action"
+    FROM login_activities la
+    ORDER BY la.login_timestamp DESC, la.id DESC
+'''
+
+
+def random_row(rng, user_count):
+    country, city, context = rng.choice(CONTEXTS)
+    device = rng.choice(DEVICES)
+    distance = rng.choice([5, 50, 500, 8500, 12000])
+    latency = rng.randint(10, 3000)
+    is_attack_ip = int(rng.random() < 0.05)
+    login_successful = int(rng.random() > 0.1)
+    risk_score = rng.random()
+    consistency = rng.choice([70, 85, 95]) if rng.random() < 0.7 else rng.randint(0, 100)
+    login_data = {'distance': distance, 'device_type': DEVICES.index(device), 'is_attack_ip': is_attack_ip,
+                  'login_successful': login_successful, 'latency': latency}
+    factors = database.generate_analysis_factors(login_data, context, consistency)
+    warnings = database.generate_warnings(login_data, risk_score)
+    level = 0 if risk_score < 0.3 else 1 if risk_score < 0.7 else 2
+    timestamp = f"2026-{rng.randint(1, 9):02d}-{rng.randint(1, 28):02d} {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00"
+    return (f"U_{rng.randrange(user_count):05d}", timestamp, country, city, rng.uniform(0, 48), distance, device,
+            latency, login_successful, is_attack_ip, risk_score, risk_score * 100, ['LOW', 'MEDIUM', 'HIGH'][level],
+            ['ALLOW', 'ALLOW_WITH_OTP', 'BLOCK'][level], 'ALLOW with SMS OTP: Possible legitimate travel.',
+            json.dumps(factors), json.dumps(warnings), consistency, context, 'Pending Review')
+
+
+def file_size(path):
+    conn = connect(path)
+    conn.execute('PRAGMA wal_checkpoint(TRUNCATE)')
+    conn.execute('VACUUM')
+    conn.close()
+    return os.path.getsize(path)
+
+
+def best_of(repeat, read):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        rows = len(read())
+        timings.append(time.perf_counter() - started)
+    return min(timings), rows
+
+
+def read_json(conn):
+    import pandas as pd
+
+    df = pd.read_sql_query(JSON_SELECT_SQL, conn)
+    df['Analysis Factors'] = df['Analysis Factors'].apply(lambda x: json.loads(x) if x else [])
+    df['Warnings'] = df['Warnings'].apply(lambda x: json.loads(x) if x else [])
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        before_path = os.path.join(workdir, 'json.db')
+        after_path = os.path.join(workdir, 'coded.db')
+
+        conn = connect(before_path)
+        migrate(conn, target=7)
+        rng = random.Random(0)
+        for start in range(0, args.rows, 10000):
+            with conn:
+                conn.executemany(JSON_INSERT_SQL, [random_row(rng, args.users)
+                                                   for _ in range(min(10000, args.rows - start))])
+        conn.close()
+        before_size = file_size(before_path)
+        shutil.copy(before_path, after_path)
+
+        conn = connect(before_path)
+        before_time, rows = best_of(args.repeat, lambda: read_json(conn))
+        conn.close()
+
+        conn = connect(after_path)
+        started = time.perf_counter()
+        migrate(conn)
+        migration_time = time.perf_counter() - started
+        conn.close()
+        after_size = file_size(after_path)
+
+        conn = connect(after_path)
+        after_time, _ = best_of(args.repeat, lambda: query_login_activities(conn, limit=None)[0])
+        conn.close()
+
+    print(f"{rows:,} rows, migration took {migration_time:.1f}s")
+    print(f"{'JSON text':<12} {before_size / 2**20:8.1f} MiB  full listing {before_time * 1000:8.0f} ms")
+    print(f"{'coded':<12} {after_size / 2**20:8.1f} MiB  full listing {after_time * 1000:8.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,93 @@
+# benchmarks/bench_dashboard_feed.py
+"""
+Dashboard refresh cost as the table grows: reloading the page's data (what
+the Refresh button did) vs. polling the live feed (utils.feed).
+
+    python benchmarks/bench_dashboard_feed.py [--rows 100000 1000000] [--ticks 50] [--inserts 5]
+
+Between ticks, --inserts new logins are written and one login in the feed's
+window is reviewed. The result cache is off, so both sides run their queries.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_coded_storage import JSON_INSERT_SQL, random_row
+from bench_db_concurrency import random_row as scored_row
+from utils import database
+from utils.cache import set_cache_enabled
+from utils.connection import close_thread_connection, connect
+from utils.migrations import migrate
+
+
+def reload_dashboard():
+    """The reads the dashboard made on every rerun"""
+    database.get_login_activities_page(limit=5)
+    database.get_dashboard_metrics_enhanced()
+    database.get_detection_accuracy()
+    database.get_false_positives_count()
+    database.count_activities(location_context='OFW')
+    database.count_activities(location_context='Domestic')
+
+
+def write_tick(rng, inserts):
+    database.insert_login_activities([scored_row(rng, 2000) for _ in range(inserts)])
+    # Newest pending login, inside the feed window
+    newest_pending = database.get_connection().execute(
+        "SELECT MAX(id) FROM login_activities WHERE admin_action = 'Pending Review'").fetchone()[0]
+    database.update_admin_action(newest_pending, 'False Positive')
+
+
+def timed_ticks(rng, args, refresh):
+    timings = []
+    for _ in range(args.ticks):
+        write_tick(rng, args.inserts)
+        started = time.perf_counter()
+        refresh()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--ticks', type=int, default=50)
+    parser.add_argument('--inserts', type=int, default=5, help="new logins between ticks")
+    args = parser.parse_args()
+    # Time the queries, not cache hits
+    set_cache_enabled(False)
+
+    results = []
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as workdir:
+            database.DATABASE_PATH = os.path.join(workdir, 'bantai.db')
+            conn = connect(database.DATABASE_PATH)
+            # Old-format rows, then the migrations
+            migrate(conn, target=7)
+            rng = random.Random(0)
+            for start in range(0, rows, 10000):
+                with conn:
+                    conn.executemany(JSON_INSERT_SQL, [random_row(rng, 2000) for _ in range(min(10000, rows - start))])
+            migrate(conn)
+
+            feed = database.start_dashboard_feed()
+            reload_ms = timed_ticks(rng, args, reload_dashboard)
+            poll_ms = timed_ticks(rng, args, lambda: database.poll_dashboard_feed(feed))
+            conn.close()
+            close_thread_connection(database.DATABASE_PATH)
+        results.append((rows, reload_ms, poll_ms))
+
+    print(f"{args.inserts} new logins and 1 review per tick, median of {args.ticks} ticks")
+    print(f"{'rows':>12} {'reload':>10} {'poll':>9}")
+    for rows, reload_ms, poll_ms in results:
+        print(f"{rows:>12,} {reload_ms:>8.1f}ms {poll_ms:>7.1f}ms")
+
+
+if __name__ == '__main__':
+    main()
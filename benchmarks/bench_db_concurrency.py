@@ -0,0 +1,141 @@
+# benchmarks/bench_db_concurrency.py
+"""
+Queries/sec of the database helpers with concurrent readers and one writer,
+per-call connections (the old behaviour) vs. pooled WAL connections.
+
+    python benchmarks/bench_db_concurrency.py [--readers 20] [--seconds 10] [--rows 50000]
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import database
+from utils.cache import set_cache_enabled
+from utils.connection import close_thread_connection
+
+PREDICTION = {
+    'risk_score': 0.45, 'risk_percentage': 45.0, 'classification': 'MEDIUM', 'action': 'ALLOW_WITH_OTP',
+    'recommendation': 'ALLOW with SMS OTP: Possible legitimate travel, verify with additional authentication.',
+    'analysis_factors': ['Travel is plausible (Domestic travel)', 'Behavior consistency: 85%'],
+    'warnings': [], 'behavior_consistency': 85, 'location_context': 'Domestic location',
+}
+
+CITIES = [('Philippines', 'Manila'), ('Philippines', 'Cebu'), ('United Arab Emirates', 'Dubai'),
+          ('Singapore', 'Singapore'), ('Russia', 'Moscow')]
+
+
+def random_row(rng, user_count):
+    country, city = rng.choice(CITIES)
+    timestamp = f"2026-{rng.randint(1, 9):02d}-{rng.randint(1, 28):02d} {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00"
+    prediction = dict(PREDICTION, risk_percentage=rng.uniform(0, 100))
+    return database.login_activity_row(
+        f"U_{rng.randrange(user_count):05d}", timestamp, country, city, rng.uniform(0, 48),
+        rng.choice([5, 50, 500, 8500]), rng.choice(['mobile', 'desktop', 'tablet']), rng.randint(10, 3000),
+        int(rng.random() < 0.05), int(rng.random() > 0.1), prediction)
+
+
+def populate(rows, users):
+    database.initialize_database()
+    rng = random.Random(0)
+    for start in range(0, rows, 10000):
+        database.insert_login_activities([random_row(rng, users) for _ in range(min(10000, rows - start))])
+
+
+def read_once(rng, users):
+    user_id = f"U_{rng.randrange(users):05d}"
+    choice = rng.random()
+    if choice < 0.4:
+        database.get_dashboard_metrics_enhanced()
+    elif choice < 0.7:
+        database.get_user_stats(user_id)
+    elif choice < 0.9:
+        database.get_user_location_patterns(user_id)
+    else:
+        database.get_user_device_patterns(user_id)
+
+
+def run(readers, seconds, users):
+    stop = threading.Event()
+    counts = {'reads': 0, 'writes': 0, 'errors': 0}
+    lock = threading.Lock()
+
+    def reader(seed):
+        rng = random.Random(seed)
+        done = errors = 0
+        while not stop.is_set():
+            try:
+                read_once(rng, users)
+                done += 1
+            except sqlite3.OperationalError:
+                errors += 1
+        with lock:
+            counts['reads'] += done
+            counts['errors'] += errors
+        close_thread_connection()
+
+    def writer():
+        rng = random.Random(-1)
+        done = errors = 0
+        while not stop.is_set():
+            try:
+                database.insert_login_activities([random_row(rng, users)])
+                done += 1
+            except sqlite3.OperationalError:
+                errors += 1
+        with lock:
+            counts['writes'] += done
+            counts['errors'] += errors
+        close_thread_connection()
+
+    threads = [threading.Thread(target=reader, args=(i,)) for i in range(readers)]
+    threads.append(threading.Thread(target=writer))
+    for thread in threads:
+        thread.start()
+    time.sleep(seconds)
+    stop.set()
+    for thread in threads:
+        thread.join()
+    return counts
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--readers', type=int, default=20)
+    parser.add_argument('--seconds', type=float, default=10)
+    parser.add_argument('--rows', type=int, default=50000)
+    parser.add_argument('--users', type=int, default=2000)
+    args = parser.parse_args()
+    # Time the queries, not cache hits
+    set_cache_enabled(False)
+
+    pooled_get_connection = database.get_connection
+    with tempfile.TemporaryDirectory() as workdir:
+        database.DATABASE_PATH = os.path.join(workdir, 'bench.db')
+        populate(args.rows, args.users)
+        close_thread_connection()
+
+        # Before: a fresh default connection per helper call, rollback journal
+        conn = sqlite3.connect(database.DATABASE_PATH)
+        conn.execute('PRAGMA journal_mode = DELETE')
+        conn.close()
+        database.get_connection = lambda: sqlite3.connect(database.DATABASE_PATH)
+        before = run(args.readers, args.seconds, args.users)
+
+        # After: per-thread pooled connections in WAL mode
+        database.get_connection = pooled_get_connection
+        after = run(args.readers, args.seconds, args.users)
+
+    for label, counts in (('per-call connections', before), ('pooled WAL connections', after)):
+        print(f"{label:<24} reads {counts['reads'] / args.seconds:>9,.0f}/s  "
+              f"writes {counts['writes'] / args.seconds:>7,.0f}/s  lock errors {counts['errors']}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,165 @@
+# benchmarks/bench_epoch_timestamps.py
+"""
+Per-user risk trends, profile timeline and false-positive count with login
+times stored as text (schema version 8) vs. epoch milliseconds (version 9).
+
+    python benchmarks/bench_epoch_timestamps.py [--rows 10000000] [--users 2000] [--samples 200]
+"""
+import argparse
+import os
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+
+import pandas as pd
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils import database
+from utils.cache import set_cache_enabled
+from utils.connection import close_thread_connection, connect
+from utils.counters import create_counter_triggers, rebuild_counters
+from utils.migrations import migrate
+from utils.rollups import create_rollup_triggers, rebuild_rollups
+
+# One year of logins, 2% of them reviewed as false positives
+GENERATE_SQL = '''
+    WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n WHERE i < ?)
+    INSERT INTO login_activities
+    (user_id, login_timestamp, country, city, time_diff_hrs, distance_km, device_type, latency_ms,
+     login_successful, is_attack_ip, risk_score, risk_percentage, risk_classification, recommended_action,
+     recommendation_text, factor_codes, warning_mask, behavior_consistency, location_context, admin_action)
+    SELECT printf('U_%05d', abs(random()) % ?), datetime(?, '-' || (abs(random()) % 31536000) || ' seconds'),
+           'Philippines', 'Manila', 12.0, 50, 'mobile', 120, 1, 0, 0.2, abs(random()) % 10000 / 100.0, 'LOW',
+           'ALLOW', 'ALLOW: Legitimate travel with consistent behavior.', 0, 0, 90, 'Domestic location',
+           CASE WHEN abs(random()) % 50 = 0 THEN 'False Positive' ELSE 'Pending Review' END
+    FROM n
+'''
+
+# The version 8 helpers
+TEXT_TRENDS_SQL = '''
+    SELECT DATE(login_timestamp) as date, AVG(risk_percentage) as avg_risk,
+           AVG(behavior_consistency) as avg_behavior, COUNT(*) as login_count
+    FROM login_activities
+    WHERE user_id = ? AND login_timestamp >= datetime('now', '-30 days')
+    GROUP BY DATE(login_timestamp)
+    ORDER BY date
+'''
+
+TEXT_TIMELINE_SQL = '''
+    SELECT login_timestamp, country, city, risk_percentage
+    FROM login_activities WHERE user_id = ? ORDER BY login_timestamp ASC
+'''
+
+EPOCH_TIMELINE_SQL = '''
+    SELECT login_ts, utc_offset, country, city, risk_percentage
+    FROM login_activities WHERE user_id = ? ORDER BY login_ts ASC
+'''
+
+TEXT_FALSE_POSITIVES_SQL = "SELECT COALESCE(SUM(count), 0) FROM false_positive_daily WHERE day >= DATE('now', '-7 days')"
+
+
+def populate(path, rows, users):
+    conn = connect(path)
+    migrate(conn, target=8)
+    # Bulk load without the counter/rollup triggers, then recount once
+    for table in ('counters', 'login_rollup_hourly', 'login_rollup_daily'):
+        for event in ('insert', 'delete', 'update'):
+            conn.execute(f'DROP TRIGGER IF EXISTS trg_{table}_{event}')
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    for start in range(0, rows, 1000000):
+        with conn:
+            conn.execute(GENERATE_SQL, (min(1000000, rows - start), users, now))
+    with conn:
+        create_counter_triggers(conn)
+        create_rollup_triggers(conn)
+        rebuild_counters(conn)
+        rebuild_rollups(conn)
+    conn.close()
+
+
+def mean_ms(samples, call):
+    """Mean time per call once the pages the samples touch are cached"""
+    for sample in samples:
+        call(sample)
+    started = time.perf_counter()
+    for sample in samples:
+        call(sample)
+    return (time.perf_counter() - started) / len(samples) * 1000
+
+
+def text_trends(conn, user_id):
+    df = pd.read_sql_query(TEXT_TRENDS_SQL, conn, params=[user_id])
+    df['date'] = pd.to_datetime(df['date'])
+    return df
+
+
+def text_timeline(conn, user_id):
+    df = pd.read_sql_query(TEXT_TIMELINE_SQL, conn, params=[user_id])
+    df['login_timestamp'] = pd.to_datetime(df['login_timestamp'])
+    return df
+
+
+def epoch_timeline(conn, user_id):
+    from utils.timestamps import local_datetimes
+
+    df = pd.read_sql_query(EPOCH_TIMELINE_SQL, conn, params=[user_id])
+    df.insert(0, 'login_timestamp', local_datetimes(df.pop('login_ts'), df.pop('utc_offset')))
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=10000000)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--samples', type=int, default=200)
+    args = parser.parse_args()
+    # Time the queries, not cache hits
+    set_cache_enabled(False)
+
+    rng = random.Random(0)
+    users = [f'U_{rng.randrange(args.users):05d}' for _ in range(args.samples)]
+
+    with tempfile.TemporaryDirectory() as workdir:
+        before_path = os.path.join(workdir, 'text.db')
+        after_path = os.path.join(workdir, 'epoch.db')
+
+        started = time.perf_counter()
+        populate(before_path, args.rows, args.users)
+        print(f"{args.rows:,} rows generated in {time.perf_counter() - started:.0f}s")
+        shutil.copy(before_path, after_path)
+
+        conn = connect(before_path)
+        before = {
+            'get_user_risk_trends': mean_ms(users, lambda user_id: text_trends(conn, user_id)),
+            'timeline (profile view)': mean_ms(users, lambda user_id: text_timeline(conn, user_id)),
+            'get_false_positives_count': mean_ms(users, lambda _: conn.execute(TEXT_FALSE_POSITIVES_SQL).fetchone()),
+        }
+        conn.close()
+
+        conn = connect(after_path)
+        started = time.perf_counter()
+        migrate(conn)
+        print(f"Migration to epoch timestamps took {time.perf_counter() - started:.1f}s")
+        conn.execute('VACUUM')
+        conn.close()
+
+        database.DATABASE_PATH = after_path
+        conn = database.get_connection()
+        after = {
+            'get_user_risk_trends': mean_ms(users, database.get_user_risk_trends),
+            'timeline (profile view)': mean_ms(users, lambda user_id: epoch_timeline(conn, user_id)),
+            'get_false_positives_count': mean_ms(users, lambda _: database.get_false_positives_count()),
+        }
+        close_thread_connection()
+
+    print(f"{'mean per call':<28} {'text':>10} {'epoch ms':>10}")
+    for name in before:
+        print(f"{name:<28} {before[name]:>8.2f}ms {after[name]:>8.2f}ms")
+
+
+if __name__ == '__main__':
+    main()
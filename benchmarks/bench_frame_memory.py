@@ -0,0 +1,121 @@
+# benchmarks/bench_frame_memory.py
+"""
+Memory per row of the full login-activity listing with object columns and
+broadcast Python lists (before) vs. the compact dtypes of
+utils.activities.COLUMN_DTYPES and Arrow list columns (after).
+
+    python benchmarks/bench_frame_memory.py [--rows 1000000] [--repeat 3]
+
+"retained" is what the loaded frame keeps allocated: Python/NumPy memory
+seen by tracemalloc plus Arrow's memory pool. "deep" is pandas'
+memory_usage(deep=True), which counts a shared Python list once per row.
+"""
+import argparse
+import gc
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_coded_storage import JSON_INSERT_SQL, random_row
+from utils.activities import ACTIVITY_COLUMNS, query_login_activities
+from utils.analysis_codes import PARAMETER_COLUMNS, _dictionary, _factor_list, _warning_list
+from utils.connection import connect
+from utils.migrations import migrate
+
+
+def _broadcast(keys, build):
+    """One Python list per distinct key, shared by every row with that key (the decoding before Arrow lists)"""
+    inverse, unique_keys = pd.factorize(keys)
+    lists = np.empty(len(unique_keys) + 1, dtype=object)
+    for i, key in enumerate(unique_keys):
+        lists[i] = build(key)
+    lists[-1] = []
+    return lists[inverse]
+
+
+def object_listing(conn):
+    """query_login_activities(limit=None) as it returned frames before compact dtypes"""
+    select = ', '.join(f'{column} AS "{name}"' for name, column in ACTIVITY_COLUMNS.items())
+    select += ''.join(f', la.{column} AS "_{column}"' for column in PARAMETER_COLUMNS)
+    df = pd.read_sql_query(f'SELECT {select} FROM login_activities la ORDER BY la.login_ts DESC, la.id DESC', conn)
+    dictionary = _dictionary(conn)
+    df['Analysis Factors'] = _broadcast(
+        pd.MultiIndex.from_arrays([df['Analysis Factors'].fillna(0).astype(np.int64)]
+                                  + [df.pop(f'_{column}') for column in PARAMETER_COLUMNS]),
+        lambda key: _factor_list(dictionary, key[0], key[1:]))
+    df['Warnings'] = _broadcast(df['Warnings'].fillna(0).astype(np.int64),
+                                lambda mask: _warning_list(dictionary, int(mask)))
+    return df
+
+
+def retained(load):
+    """(frame, bytes it keeps allocated)"""
+    gc.collect()
+    arrow_before = pa.total_allocated_bytes()
+    tracemalloc.start()
+    df = load()
+    gc.collect()
+    python = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    return df, python + pa.total_allocated_bytes() - arrow_before
+
+
+def best_of(repeat, load):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        load()
+        timings.append(time.perf_counter() - started)
+    return min(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=1000000)
+    parser.add_argument('--users', type=int, default=2000)
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        conn = connect(os.path.join(workdir, 'bantai.db'))
+        migrate(conn, target=7)
+        rng = random.Random(0)
+        for start in range(0, args.rows, 10000):
+            with conn:
+                conn.executemany(JSON_INSERT_SQL, [random_row(rng, args.users)
+                                                   for _ in range(min(10000, args.rows - start))])
+        migrate(conn)
+
+        loads = {
+            'object (before)': lambda: object_listing(conn),
+            'compact (after)': lambda: query_login_activities(conn, limit=None)[0],
+        }
+        results = {}
+        for name, load in loads.items():
+            df, size = retained(load)
+            results[name] = (size, df.memory_usage(deep=True, index=False), best_of(args.repeat, load))
+            del df
+        conn.close()
+
+    print(f"{args.rows:,} rows")
+    print(f"{'':<18} {'retained/row':>13} {'deep/row':>10} {'load':>9}")
+    for name, (size, deep, seconds) in results.items():
+        print(f"{name:<18} {size / args.rows:>11.1f} B {deep.sum() / args.rows:>8.1f} B {seconds:>8.2f}s")
+
+    (_, before, _), (_, after, _) = results.values()
+    print(f"\n{'deep bytes/row':<26} {'before':>8} {'after':>8}")
+    for column in before.index:
+        print(f"{column:<26} {before[column] / args.rows:>8.1f} {after[column] / args.rows:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,76 @@
+# benchmarks/bench_ingest.py
+"""
+Time a login spends storing its row, one INSERT transaction per login
+(BANTAI_INGEST=sync) vs. the write-behind queue (BANTAI_INGEST=queue).
+
+    python benchmarks/bench_ingest.py [--logins 5000] [--sessions 8]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+
+import numpy as np
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_db_concurrency import random_row
+from utils import database, ingest
+from utils.connection import close_thread_connection
+
+
+def run(logins, sessions, users):
+    """Per-login store latencies (ms) and total seconds until every row is committed"""
+    latencies = []
+    lock = threading.Lock()
+
+    def session(seed):
+        rng = random.Random(seed)
+        rows = [random_row(rng, users) for _ in range(logins // sessions)]
+        timings = []
+        for row in rows:
+            started = time.perf_counter()
+            database.store_login_activities([row])
+            timings.append((time.perf_counter() - started) * 1000)
+        with lock:
+            latencies.extend(timings)
+        close_thread_connection()
+
+    started = time.perf_counter()
+    threads = [threading.Thread(target=session, args=(i,)) for i in range(sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    ingest.flush_all()
+    return np.array(latencies), time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--logins', type=int, default=5000)
+    parser.add_argument('--sessions', type=int, default=8)
+    parser.add_argument('--users', type=int, default=2000)
+    args = parser.parse_args()
+
+    results = {}
+    with tempfile.TemporaryDirectory() as workdir:
+        database.DATABASE_PATH = os.path.join(workdir, 'bench.db')
+        database.initialize_database()
+        for mode in ('sync', 'queue'):
+            ingest.set_ingest_enabled(mode == 'queue')
+            results[mode] = run(args.logins, args.sessions, args.users)
+        ingest.set_ingest_enabled(False)
+        stored = database.get_connection().execute('SELECT COUNT(*) FROM login_activities').fetchone()[0]
+
+    print(f"{stored:,} rows stored")
+    for mode, (latencies, seconds) in results.items():
+        print(f"{mode:<6} p50 {np.percentile(latencies, 50):7.3f} ms  p99 {np.percentile(latencies, 99):7.3f} ms  "
+              f"{len(latencies) / seconds:>8,.0f} logins/s committed")
+
+
+if __name__ == '__main__':
+    main()
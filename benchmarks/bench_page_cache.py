@@ -0,0 +1,127 @@
+# benchmarks/bench_page_cache.py
+"""
+User Profile page loads from many concurrent sessions, with and without the
+shared result cache (utils.cache), while logins are reviewed in the
+background.
+
+    python benchmarks/bench_page_cache.py [--rows 200000] [--sessions 50] [--reruns 10] [--users 20]
+
+Each session thread reruns the page's data loads for users from a small hot
+set, as admins triaging the same flagged accounts do. A writer marks one
+login of the hot set reviewed every --write-ms, which invalidates the
+listing and that user's profile results.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_coded_storage import JSON_INSERT_SQL, random_row
+from utils import database
+from utils.cache import clear_cache, set_cache_enabled
+from utils.connection import connect
+from utils.metrics import metrics_snapshot, reset_metrics
+from utils.migrations import migrate
+
+
+# Reads per rerun of the page
+PAGE_READS = 7
+
+
+def profile_page(user_id):
+    """The reads pages/9_User Profile.py makes on every rerun"""
+    database.get_users()
+    database.get_user_info(user_id)
+    database.get_user_stats(user_id)
+    database.get_user_timeline_data(user_id)
+    database.get_user_location_patterns(user_id)
+    database.get_user_device_patterns(user_id)
+    database.get_user_risk_trends(user_id)
+
+
+def run(args, users, ids, enabled):
+    set_cache_enabled(enabled)
+    reset_metrics()
+    clear_cache()
+    renders = []
+    done = threading.Event()
+
+    def session(seed):
+        rng = random.Random(seed)
+        for _ in range(args.reruns):
+            started = time.perf_counter()
+            profile_page(rng.choice(users))
+            renders.append(time.perf_counter() - started)
+
+    def writer():
+        rng = random.Random(0)
+        while not done.wait(args.write_ms / 1000):
+            database.update_admin_action(rng.choice(ids), 'False Positive')
+
+    writer_thread = threading.Thread(target=writer)
+    writer_thread.start()
+    started = time.perf_counter()
+    threads = [threading.Thread(target=session, args=(seed,)) for seed in range(args.sessions)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+    done.set()
+    writer_thread.join()
+
+    counters = metrics_snapshot()['counters']
+    renders.sort()
+    return {
+        'elapsed': elapsed,
+        'p50': statistics.median(renders) * 1000,
+        'p95': renders[int(len(renders) * 0.95)] * 1000,
+        # Every read is a query when the cache is off
+        'queries': counters.get('cache_misses', 0) if enabled else len(renders) * PAGE_READS,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=200000)
+    parser.add_argument('--sessions', type=int, default=50)
+    parser.add_argument('--reruns', type=int, default=10)
+    parser.add_argument('--users', type=int, default=20, help="hot set the sessions look at")
+    parser.add_argument('--write-ms', type=int, default=100)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        database.DATABASE_PATH = os.path.join(workdir, 'bantai.db')
+        conn = connect(database.DATABASE_PATH)
+        migrate(conn, target=7)
+        rng = random.Random(0)
+        for start in range(0, args.rows, 10000):
+            with conn:
+                conn.executemany(JSON_INSERT_SQL, [random_row(rng, 2000) for _ in range(min(10000, args.rows - start))])
+        migrate(conn)
+        users = [f'U_{i:05d}' for i in rng.sample(range(2000), args.users)]
+        ids = [row[0] for row in conn.execute('SELECT id FROM login_activities WHERE user_id IN ({}) '
+                                              .format(', '.join('?' * len(users))), users)]
+        conn.close()
+
+        results = {}
+        for name, enabled in (('no cache', False), ('shared cache', True)):
+            results[name] = run(args, users, ids, enabled)
+
+    renders = args.sessions * args.reruns
+    print(f"{args.sessions} sessions x {args.reruns} reruns over {args.users} users, "
+          f"one review every {args.write_ms} ms, {args.rows:,} rows")
+    print(f"{'':<14} {'SQL reads':>10} {'per render':>11} {'p50':>9} {'p95':>9} {'wall':>8}")
+    for name, result in results.items():
+        print(f"{name:<14} {result['queries']:>10,} {result['queries'] / renders:>11.2f} {result['p50']:>7.1f}ms "
+              f"{result['p95']:>7.1f}ms {result['elapsed']:>7.1f}s")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,101 @@
+# benchmarks/bench_review_queue.py
+"""
+Claiming from the review queue as the pending backlog grows: claim_next
+(an index seek on idx_review_queue) vs. the same query left to the
+planner, which filters on idx_login_admin_action and sorts every pending row.
+
+    python benchmarks/bench_review_queue.py [--rows 100000 1000000] [--claims 50] [--batch 10] [--threads 8]
+
+Afterwards --threads analysts claim concurrently until --claims batches each
+are done, and every claimed id is checked to be claimed once.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_coded_storage import JSON_INSERT_SQL, random_row
+from utils import database
+from utils.connection import close_thread_connection, connect, get_thread_connection
+from utils.migrations import migrate
+from utils.review_queue import CLAIM_SQL, claim_next
+from utils.timestamps import now_ms
+
+# The claim query without the index hint
+PLANNER_CLAIM_SQL = CLAIM_SQL.replace('INDEXED BY idx_review_queue', '')
+
+
+def median_ms(runs, run):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        run()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def concurrent_claims(path, threads, claims, batch):
+    """Claim from several threads at once -> (claimed ids, duplicates)"""
+    claimed = []
+    lock = threading.Lock()
+
+    def analyst(name):
+        conn = get_thread_connection(path)
+        for _ in range(claims):
+            ids = claim_next(conn, batch, name)
+            with lock:
+                claimed.extend(ids)
+        close_thread_connection(path)
+
+    workers = [threading.Thread(target=analyst, args=(f'analyst{i}',)) for i in range(threads)]
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    return len(claimed), len(claimed) - len(set(claimed))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--claims', type=int, default=50)
+    parser.add_argument('--batch', type=int, default=10, help="logins per claim")
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    results = []
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as workdir:
+            path = os.path.join(workdir, 'bantai.db')
+            conn = connect(path)
+            # Old-format rows, then the migrations
+            migrate(conn, target=7)
+            rng = random.Random(0)
+            for start in range(0, rows, 10000):
+                with conn:
+                    conn.executemany(JSON_INSERT_SQL, [random_row(rng, 2000) for _ in range(min(10000, rows - start))])
+            migrate(conn)
+            pending = conn.execute(
+                "SELECT COUNT(*) FROM login_activities WHERE admin_action = 'Pending Review'").fetchone()[0]
+
+            claim = median_ms(args.claims, lambda: claim_next(conn, args.batch, 'bench'))
+            planner = median_ms(args.claims, lambda: conn.execute(PLANNER_CLAIM_SQL, (now_ms(), args.batch)).fetchall())
+            claimed, duplicates = concurrent_claims(path, args.threads, args.claims, args.batch)
+            conn.close()
+        results.append((rows, pending, claim, planner, claimed, duplicates))
+
+    print(f"{args.batch} logins per claim, median of {args.claims} claims")
+    print(f"{'rows':>12} {'pending':>10} {'claim_next':>11} {'planner':>9} {'concurrent':>22}")
+    for rows, pending, claim, planner, claimed, duplicates in results:
+        print(f"{rows:>12,} {pending:>10,} {claim:>9.2f}ms {planner:>7.1f}ms "
+              f"{claimed:>8,} claimed, {duplicates} dup")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,68 @@
+# benchmarks/bench_service.py
+"""
+Open-loop latency test for the scoring service (utils/service.py).
+
+    uvicorn utils.service:app --port 8000 &
+    python benchmarks/bench_service.py --rps 1000 --seconds 30
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import httpx
+import numpy as np
+
+SCENARIOS = [
+    {'country': 'Philippines', 'city': 'Manila', 'time_diff': 2.0, 'distance': 15, 'device_type': 'mobile',
+     'latency': 45, 'is_attack_ip': False, 'login_successful': True},
+    {'country': 'United Arab Emirates', 'city': 'Dubai', 'time_diff': 12.0, 'distance': 8500,
+     'device_type': 'mobile', 'latency': 180, 'is_attack_ip': False, 'login_successful': True},
+    {'country': 'Russia', 'city': 'Moscow', 'time_diff': 0.5, 'distance': 12000, 'device_type': 'desktop',
+     'latency': 2200, 'is_attack_ip': True, 'login_successful': False},
+]
+
+
+async def fire(client, url, latencies, errors):
+    payload = dict(random.choice(SCENARIOS), user_id=f"U_BENCH_{random.randint(0, 9999):04d}")
+    started = time.perf_counter()
+    try:
+        response = await client.post(url, json=payload)
+        response.raise_for_status()
+        latencies.append(time.perf_counter() - started)
+    except Exception:
+        errors.append(1)
+
+
+async def run(url, rps, seconds):
+    latencies, errors, tasks = [], [], []
+    limits = httpx.Limits(max_connections=1000, max_keepalive_connections=1000)
+    async with httpx.AsyncClient(limits=limits, timeout=30) as client:
+        started = time.perf_counter()
+        for i in range(int(rps * seconds)):
+            # Open loop: send on schedule regardless of how fast responses come back
+            delay = started + i / rps - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            tasks.append(asyncio.create_task(fire(client, url, latencies, errors)))
+        await asyncio.gather(*tasks)
+        elapsed = time.perf_counter() - started
+
+    ms = np.array(latencies) * 1000
+    print(f"sent {len(tasks):,} requests in {elapsed:.1f}s ({len(tasks) / elapsed:,.0f} req/s), errors: {len(errors)}")
+    if len(ms):
+        print(f"p50 {np.percentile(ms, 50):.1f} ms  p90 {np.percentile(ms, 90):.1f} ms  "
+              f"p99 {np.percentile(ms, 99):.1f} ms  max {ms.max():.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default='http://127.0.0.1:8000/v1/score')
+    parser.add_argument('--rps', type=float, default=1000)
+    parser.add_argument('--seconds', type=float, default=30)
+    args = parser.parse_args()
+    asyncio.run(run(args.url, args.rps, args.seconds))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,116 @@
+# benchmarks/bench_similarity.py
+"""
+Similar-incident lookups through the grid indexes (utils.similarity) vs. an
+exact search that reads every login of the city and device, as the table grows.
+
+    python benchmarks/bench_similarity.py [--rows 100000 1000000] [--lookups 200] [--inserts 20000]
+
+The neighbours and close matches found through the index are checked
+against the exact search (recall), and the cost of keeping the indexes is
+measured by inserting --inserts logins with and without them.
+"""
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bench_coded_storage import JSON_INSERT_SQL, random_row
+from bench_db_concurrency import random_row as scored_row
+from utils import database
+from utils.cache import set_cache_enabled
+from utils.connection import close_thread_connection, connect
+from utils.migrations import migrate
+from utils.similarity import (
+    CREATE_SIMILARITY_INDEXES_SQL, FEATURE_COLUMNS, MATCH_DISTANCE, _login, _ranked, close_matches, similar_incidents
+)
+
+SCAN_SQL = f'''
+    SELECT id, user_id, {", ".join(FEATURE_COLUMNS)}, admin_action FROM login_activities NOT INDEXED
+    WHERE city = ? AND device_type = ?
+'''
+
+
+def exact_search(conn, activity_id):
+    """(k nearest, close matches) of activity_id ranked over every login of its city and device"""
+    login = _login(conn, activity_id)
+    rows = conn.execute(SCAN_SQL, (login[1], login[2])).fetchall()
+    ranked = _ranked(login, activity_id, [row[:-1] for row in rows])
+    pending = {row[0] for row in rows if row[1] == login[0] and row[-1] == 'Pending Review'}
+    matches = [(i, distance) for i, distance in ranked if i in pending and distance <= MATCH_DISTANCE]
+    return ranked[:10], matches
+
+
+def median_ms(ids, run):
+    timings = []
+    for activity_id in ids:
+        started = time.perf_counter()
+        run(activity_id)
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def insert_ms(rng, inserts):
+    started = time.perf_counter()
+    for start in range(0, inserts, 1000):
+        database.insert_login_activities([scored_row(rng, 2000) for _ in range(min(1000, inserts - start))])
+    return (time.perf_counter() - started) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000, 1000000])
+    parser.add_argument('--lookups', type=int, default=200)
+    parser.add_argument('--inserts', type=int, default=20000)
+    args = parser.parse_args()
+    # Time the queries, not cache hits
+    set_cache_enabled(False)
+
+    results = []
+    for rows in args.rows:
+        with tempfile.TemporaryDirectory() as workdir:
+            database.DATABASE_PATH = os.path.join(workdir, 'bantai.db')
+            conn = connect(database.DATABASE_PATH)
+            # Old-format rows, then the migrations
+            migrate(conn, target=7)
+            rng = random.Random(0)
+            for start in range(0, rows, 10000):
+                with conn:
+                    conn.executemany(JSON_INSERT_SQL, [random_row(rng, 2000) for _ in range(min(10000, rows - start))])
+            migrate(conn)
+            ids = rng.sample(range(1, rows + 1), args.lookups)
+
+            similar = median_ms(ids, lambda i: similar_incidents(conn, i))
+            matches = median_ms(ids, lambda i: close_matches(conn, i))
+            scan = median_ms(ids[:20], lambda i: exact_search(conn, i))
+            hits = total = found = expected = 0
+            for activity_id in ids:
+                nearest, exact = exact_search(conn, activity_id)
+                total += len(nearest)
+                hits += len(set(nearest) & set(similar_incidents(conn, activity_id)))
+                expected += len(exact)
+                found += len(set(exact) & set(close_matches(conn, activity_id)))
+
+            indexed_insert = insert_ms(rng, args.inserts)
+            for sql in CREATE_SIMILARITY_INDEXES_SQL:
+                conn.execute(f"DROP INDEX {sql.split()[5]}")
+            plain_insert = insert_ms(rng, args.inserts)
+            conn.close()
+            close_thread_connection(database.DATABASE_PATH)
+        results.append((rows, similar, matches, scan, hits / total, found, expected, indexed_insert, plain_insert))
+
+    print(f"median of {args.lookups} lookups (exact scan: 20)")
+    print(f"{'rows':>12} {'similar':>9} {'matches':>9} {'exact scan':>11} {'recall@10':>10} {'matches found':>14} "
+          f"{'insert indexed':>15} {'plain':>9}")
+    for rows, similar, matches, scan, recall, found, expected, indexed_insert, plain_insert in results:
+        print(f"{rows:>12,} {similar:>7.2f}ms {matches:>7.2f}ms {scan:>9.1f}ms {recall:>10.1%} {found:>7}/{expected:<6} "
+              f"{indexed_insert:>13.0f}ms {plain_insert:>7.0f}ms")
+    print(f"(inserting {args.inserts:,} logins in batches of 1,000)")
+
+
+if __name__ == '__main__':
+    main()
@@ -4,16 +4,16 @@ from datetime import datetime
 import sys
 import os
 import json
+import time
+import pandas as pd
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.style import inject_custom_css
-from utils.charts import login_attempts_vs_flags_chart, top_risk_reasons_chart, login_outcomes_pie_chart
-from utils.database import (
-    get_login_activities_enhanced, 
-    get_dashboard_metrics_enhanced, 
-    get_detection_accuracy, 
-    get_false_positives_count
+from utils.charts import (
+    login_attempts_vs_flags_chart, top_risk_reasons_chart, login_outcomes_pie_chart, window_rollup, CHART_WINDOWS
 )
+from utils.database import poll_dashboard_feed, start_dashboard_feed
+from utils.feed import LOCATION_COUNTS
 
 # Page Configuration
 st.set_page_config(page_title="BantAI Dashboard", page_icon="icons/bantai_logo.png", layout="wide")
@@ -21,6 +21,26 @@ st.set_page_config(page_title="BantAI Dashboard", page_icon="icons/bantai_logo.p
 # Inject the css
 inject_custom_css()
 
+# Seconds between polls for new logins and reviews
+REFRESH_INTERVALS = {'Off': None, 'Every 5 seconds': 5, 'Every 15 seconds': 15, 'Every minute': 60}
+
+# Rollups are per minute, so the charts never refresh more often
+CHART_REFRESH_SECONDS = 60
+
+# Activity cards shown from the feed
+CARD_COUNT = 5
+
+# Shown when the database cannot be read
+FALLBACK_FEED = {
+    'rows': None,
+    'numbers': {
+        'totals': {'total_attempts': 15, 'high_risk': 3, 'blocked': 1, 'otp_required': 2, 'attack_ips': 1},
+        'accuracy': 94,
+        'false_positives': 12,
+        'locations': {label: 0 for label in LOCATION_COUNTS},
+    },
+}
+
 # Header
 col_header1, col_header2 = st.columns([3, 1])
 with col_header1:
@@ -31,242 +51,296 @@ with col_header2:
     formatted_date = current_datetime.strftime("%B %d, %Y")
     formatted_time = current_datetime.strftime("%I:%M %p")
     st.markdown(f"**{formatted_date}**  \n{formatted_time}")
-
-# Get real-time data from enhanced database
-try:
-    df = get_login_activities_enhanced()
-    metrics = get_dashboard_metrics_enhanced()
-    detection_accuracy = get_detection_accuracy()
-    false_positives_count = get_false_positives_count()
-    
-    # Enhanced metrics from new database structure
-    total_attempts = metrics['total_attempts']
-    high_risk = metrics['high_risk']
-    blocked_attempts = metrics['blocked']
-    otp_required = metrics['otp_required']
-    attack_ips = metrics['attack_ips']
+    refresh_label = st.selectbox("Auto-refresh", list(REFRESH_INTERVALS), key="dashboard_refresh",
+                                 help="Poll for new logins and reviews; only the dashboard sections update")
+refresh_seconds = REFRESH_INTERVALS[refresh_label]
+
+def bump_versions(parts):
+    """New versions for the feed parts ('rows', 'numbers') that changed"""
+    versions = st.session_state.setdefault('dashboard_versions', {'rows': 0, 'numbers': 0})
+    for part in parts:
+        versions[part] += 1
+
+def load_feed():
+    """This session's live feed, polled at most once per refresh tick
+
+    Every section is a fragment on the refresh timer and calls this first; the first one
+    to run in a tick polls, the others draw the feed it left in session state.
+    """
+    try:
+        feed = st.session_state.get('dashboard_feed')
+        now = time.time()
+        if feed is None:
+            feed = st.session_state['dashboard_feed'] = start_dashboard_feed()
+            st.session_state['dashboard_polled_at'] = now
+            bump_versions(('rows', 'numbers'))
+        elif refresh_seconds and now - st.session_state['dashboard_polled_at'] >= refresh_seconds / 2:
+            st.session_state['dashboard_polled_at'] = now
+            bump_versions(poll_dashboard_feed(feed))
+        return feed
+    except Exception as e:
+        st.error(f"Database connection error: {e}")
+        return FALLBACK_FEED
+
+def chart_rollup(chart_window):
+    """Rollup behind the charts, read again only for a new window or after a poll found new rows
+    (and then at most once per CHART_REFRESH_SECONDS, rollups being per minute)"""
+    rows_version = st.session_state.get('dashboard_versions', {}).get('rows', 0)
+    charts = st.session_state.get('dashboard_charts')
+    now = time.time()
+    if (charts is None or charts['window'] != chart_window
+            or (charts['rows_version'] != rows_version and now - charts['read_at'] >= CHART_REFRESH_SECONDS)):
+        charts = st.session_state['dashboard_charts'] = {
+            'window': chart_window, 'rows_version': rows_version, 'read_at': now,
+            'rollup': window_rollup(chart_window),
+        }
+    return charts['rollup']
+
+# Sections redraw on the refresh timer from the session's feed; only a due poll reads the database
+@st.fragment(run_every=refresh_seconds)
+def kpi_section():
+    """KPI metrics and the AI decision summary, from the trigger-maintained counters"""
+    totals = load_feed()['numbers']['totals']
+    total_attempts = totals['total_attempts']
+    high_risk = totals['high_risk']
+    blocked_attempts = totals['blocked']
+    otp_required = totals['otp_required']
+
+    # Enhanced KPI Metrics showing AI actions
+    col1, col2, col3, col4 = st.columns(4)
     
-except Exception as e:
-    st.error(f"Database connection error: {e}")
-    # Fallback to dummy data
-    total_attempts = 15
-    high_risk = 3
-    blocked_attempts = 1
-    otp_required = 2
-    attack_ips = 1
-    detection_accuracy = 94
-    false_positives_count = 12
-
-# Enhanced KPI Metrics showing AI actions
-col1, col2, col3, col4 = st.columns(4)
-
-with col1:
-    st.metric(
-        label="Total Login Attempts",
-        value=f"{total_attempts:,}",
-        help="Total login attempts analyzed by BantAI"
-    )
-
-with col2:
-    st.metric(
-        label="High-Risk Detected",
-        value=f"{high_risk:,}",
-        delta=f"{high_risk/total_attempts*100:.1f}% of total" if total_attempts > 0 else "0%",
-        help="Activities flagged as high-risk (≥70%)"
-    )
-
-with col3:
-    st.metric(
-        label="Blocked by AI",
-        value=f"{blocked_attempts:,}",
-        delta="Prevented" if blocked_attempts > 0 else "None",
-        help="Login attempts automatically blocked"
-    )
-
-with col4:
-    st.metric(
-        label="OTP Required",
-        value=f"{otp_required:,}",
-        delta="Additional Auth" if otp_required > 0 else "None",
-        help="Logins requiring SMS OTP verification"
-    )
-
-st.markdown("---")
-
-# AI Actions Overview
-st.subheader("AI Decision Summary")
-
-if total_attempts > 0:
-    action_col1, action_col2, action_col3 = st.columns(3)
-    
-    with action_col1:
-        allowed = total_attempts - blocked_attempts - otp_required
+    with col1:
         st.metric(
-            label="✅ ALLOW",
-            value=f"{allowed:,}",
-            delta=f"{allowed/total_attempts*100:.1f}%",
-            help="Automatically approved logins"
+            label="Total Login Attempts",
+            value=f"{total_attempts:,}",
+            help="Total login attempts analyzed by BantAI"
         )
     
-    with action_col2:
+    with col2:
         st.metric(
-            label="🔐 ALLOW_WITH_OTP", 
-            value=f"{otp_required:,}",
-            delta=f"{otp_required/total_attempts*100:.1f}%",
-            help="Approved with SMS verification"
+            label="High-Risk Detected",
+            value=f"{high_risk:,}",
+            delta=f"{high_risk/total_attempts*100:.1f}% of total" if total_attempts > 0 else "0%",
+            help="Activities flagged as high-risk (≥70%)"
         )
     
-    with action_col3:
+    with col3:
         st.metric(
-            label="🚫 BLOCK",
+            label="Blocked by AI",
             value=f"{blocked_attempts:,}",
-            delta=f"{blocked_attempts/total_attempts*100:.1f}%",
-            help="Denied access - high risk"
+            delta="Prevented" if blocked_attempts > 0 else "None",
+            help="Login attempts automatically blocked"
         )
+    
+    with col4:
+        st.metric(
+            label="OTP Required",
+            value=f"{otp_required:,}",
+            delta="Additional Auth" if otp_required > 0 else "None",
+            help="Logins requiring SMS OTP verification"
+        )
+    
+    st.markdown("---")
+    
+    # AI Actions Overview
+    st.subheader("AI Decision Summary")
+    
+    if total_attempts > 0:
+        action_col1, action_col2, action_col3 = st.columns(3)
+        
+        with action_col1:
+            allowed = total_attempts - blocked_attempts - otp_required
+            st.metric(
+                label="✅ ALLOW",
+                value=f"{allowed:,}",
+                delta=f"{allowed/total_attempts*100:.1f}%",
+                help="Automatically approved logins"
+            )
+        
+        with action_col2:
+            st.metric(
+                label="🔐 ALLOW_WITH_OTP", 
+                value=f"{otp_required:,}",
+                delta=f"{otp_required/total_attempts*100:.1f}%",
+                help="Approved with SMS verification"
+            )
+        
+        with action_col3:
+            st.metric(
+                label="🚫 BLOCK",
+                value=f"{blocked_attempts:,}",
+                delta=f"{blocked_attempts/total_attempts*100:.1f}%",
+                help="Denied access - high risk"
+            )
+    
+    st.markdown("---")
 
-st.markdown("---")
+kpi_section()
 
 # Charts section
-chart_col1, chart_col2 = st.columns(2)
-
-with chart_col1:
-    st.subheader("Login Attempts vs. High-Risk Flags")
-    login_attempts_vs_flags_chart()
+chart_window = st.selectbox("Chart window", list(CHART_WINDOWS), key="chart_window")
+
+@st.fragment(run_every=refresh_seconds)
+def chart_section(chart_window):
+    """Rollup charts for the chosen window"""
+    load_feed()
+    rollup = chart_rollup(chart_window)
+    chart_col1, chart_col2 = st.columns(2)
+    
+    with chart_col1:
+        st.subheader("Login Attempts vs. High-Risk Flags")
+        login_attempts_vs_flags_chart(chart_window, rollup)
+    
+    with chart_col2:
+        st.subheader("Top Risk Reasons")
+        top_risk_reasons_chart(chart_window, rollup)
+    
+    st.markdown("---")
 
-with chart_col2:
-    st.subheader("Top Risk Reasons")
-    top_risk_reasons_chart()
+chart_section(chart_window)
 
-st.markdown("---")
+@st.fragment(run_every=refresh_seconds)
+def recent_section():
+    """Activity cards from the session's feed window, plus system performance"""
+    feed = load_feed()
+    numbers = feed['numbers']
+    df = feed['rows'] if feed['rows'] is not None else pd.DataFrame()
 
-# Enhanced Recent Activities with AI Analysis
-recent_col1, recent_col2 = st.columns([3, 1])
+    # Enhanced Recent Activities with AI Analysis
+    recent_col1, recent_col2 = st.columns([3, 1])
 
-with recent_col1:
-    st.subheader("Recent AI Analysis")
-    
-    if len(df) > 0:
-        # Show last 5 activities with enhanced details
-        for index, row in df.head(5).iterrows():
-            with st.container():
-                # Create activity card
-                risk_color = "🔴" if row['Risk %'] >= 70 else "🟡" if row['Risk %'] >= 30 else "🟢"
-                action_icon = "🚫" if row['AI Action'] == 'BLOCK' else "🔐" if row['AI Action'] == 'ALLOW_WITH_OTP' else "✅"
-                
-                col_a, col_b, col_c = st.columns([2, 2, 1])
-                
-                with col_a:
-                    st.markdown(f"**{row['User ID']}** from {row['Country']}")
-                    st.caption(f"{row['Login Timestamp (UTC+8)']} • {row['device_type']}")
-                
-                with col_b:
-                    st.markdown(f"{risk_color} **{row['Risk %']:.1f}% Risk** ({row['Classification']})")
-                    st.caption(f"{action_icon} AI Action: **{row['AI Action']}**")
-                
-                with col_c:
-                    if row['Admin Action'] == 'Pending Review':
-                        st.markdown("🔄 Pending")
-                    else:
-                        st.markdown("✓ Reviewed")
-                
-                # Show AI recommendation
-                st.markdown(f"💡 **Recommendation:** {row['AI Recommendation']}")
-                
-                # Show analysis factors
-                if row['Analysis Factors']:
-                    factors = row['Analysis Factors'] if isinstance(row['Analysis Factors'], list) else []
+    with recent_col1:
+        st.subheader("Recent AI Analysis")
+        
+        if len(df) > 0:
+            # Show the newest activities with enhanced details
+            for index, row in df.head(CARD_COUNT).iterrows():
+                with st.container():
+                    # Create activity card
+                    risk_color = "🔴" if row['Risk %'] >= 70 else "🟡" if row['Risk %'] >= 30 else "🟢"
+                    action_icon = "🚫" if row['AI Action'] == 'BLOCK' else "🔐" if row['AI Action'] == 'ALLOW_WITH_OTP' else "✅"
+                    
+                    col_a, col_b, col_c = st.columns([2, 2, 1])
+                    
+                    with col_a:
+                        st.markdown(f"**{row['User ID']}** from {row['Country']}")
+                        st.caption(f"{row['Login Timestamp (UTC+8)']} • {row['device_type']}")
+                    
+                    with col_b:
+                        st.markdown(f"{risk_color} **{row['Risk %']:.1f}% Risk** ({row['Classification']})")
+                        st.caption(f"{action_icon} AI Action: **{row['AI Action']}**")
+                    
+                    with col_c:
+                        if row['Admin Action'] == 'Pending Review':
+                            st.markdown("🔄 Pending")
+                        else:
+                            st.markdown("✓ Reviewed")
+                    
+                    # Show AI recommendation
+                    st.markdown(f"💡 **Recommendation:** {row['AI Recommendation']}")
+                    
+                    # Show analysis factors (Arrow list columns come back as arrays)
+                    factors = list(row['Analysis Factors'])
                     if factors:
                         with st.expander("📊 Analysis Details", expanded=False):
                             for factor in factors:
                                 st.markdown(f"• {factor}")
                             
                             # Show warnings if any
-                            if row['Warnings']:
-                                warnings = row['Warnings'] if isinstance(row['Warnings'], list) else []
-                                if warnings:
-                                    for warning in warnings:
-                                        st.markdown(f"{warning}")
-                
-                st.markdown("---")
+                            for warning in row['Warnings']:
+                                st.markdown(f"{warning}")
+                    
+                    st.markdown("---")
+            
+            # Link to full analysis page
+            if st.button("🔍 View All Activities & Take Actions"):
+                st.switch_page("pages/3_Recent Login Activities.py")
+        else:
+            st.info("No recent login activities to display")
+
+    with recent_col2:
+        st.subheader("System Performance")
         
-        # Link to full analysis page
-        if st.button("🔍 View All Activities & Take Actions"):
-            st.switch_page("pages/3_Recent Login Activities.py")
-    else:
-        st.info("No recent login activities to display")
-
-with recent_col2:
-    st.subheader("System Performance")
-    
-    # Detection accuracy
-    accuracy_color = "🟢" if detection_accuracy >= 95 else "🟡" if detection_accuracy >= 85 else "🔴"
-    st.metric(
-        label=f"{accuracy_color} Detection Accuracy",
-        value=f"{detection_accuracy}%",
-        help="AI model accuracy based on admin feedback"
-    )
-    
-    # False positives
-    st.metric(
-        label="False Positives (7d)",
-        value=f"{false_positives_count}",
-        help="Admin corrections in last 7 days"
-    )
-    
-    # Login outcome pie chart
-    st.subheader("Login Outcomes")
-    login_outcomes_pie_chart()
-    
-    # Filipino context insights
-    if len(df) > 0:
-        st.subheader("🇵🇭 Filipino Context")
+        # Detection accuracy
+        detection_accuracy = numbers['accuracy']
+        accuracy_color = "🟢" if detection_accuracy >= 95 else "🟡" if detection_accuracy >= 85 else "🔴"
+        st.metric(
+            label=f"{accuracy_color} Detection Accuracy",
+            value=f"{detection_accuracy}%",
+            help="AI model accuracy based on admin feedback"
+        )
         
-        # Count OFW-related logins
-        ofw_locations = df[df['Location Context'].str.contains('OFW', na=False)]
-        domestic_locations = df[df['Location Context'].str.contains('Domestic', na=False)]
+        # False positives
+        st.metric(
+            label="False Positives (7d)",
+            value=f"{numbers['false_positives']}",
+            help="Admin corrections in last 7 days"
+        )
         
-        st.metric("OFW Hub Logins", len(ofw_locations))
-        st.metric("Domestic Logins", len(domestic_locations))
-
-# System Status with Enhanced Indicators
-st.markdown("---")
-st.subheader("🔍 System Status")
-
-status_col1, status_col2, status_col3, status_col4 = st.columns(4)
-
-with status_col1:
-    if total_attempts > 0:
-        st.success("✅ AI Model Active")
-        st.caption(f"Analyzed {total_attempts} attempts")
-    else:
-        st.warning("⚠️ No Recent Activity")
-
-with status_col2:
-    if detection_accuracy >= 95:
-        st.success(f"✅ Excellent Accuracy")
-        st.caption(f"{detection_accuracy}% detection rate")
-    elif detection_accuracy >= 85:
-        st.warning(f"⚠️ Good Accuracy")
-        st.caption(f"{detection_accuracy}% detection rate")
-    else:
-        st.error(f"❌ Needs Improvement")
-        st.caption(f"{detection_accuracy}% detection rate")
-
-with status_col3:
-    if blocked_attempts == 0:
-        st.success("✅ No Threats Blocked")
-    elif blocked_attempts <= 2:
-        st.warning(f"⚠️ {blocked_attempts} Threat(s) Blocked")
-    else:
-        st.error(f"🚨 {blocked_attempts} Threats Blocked")
-    st.caption("Automatic protection active")
-
-with status_col4:
-    if attack_ips == 0:
-        st.success("✅ No Attack IPs")
-    else:
-        st.error(f"🚨 {attack_ips} Attack IP(s)")
-    st.caption("Threat intelligence active")
+        # Login outcome pie chart
+        st.subheader("Login Outcomes")
+        login_outcomes_pie_chart(chart_window, chart_rollup(chart_window))
+        
+        # Filipino context insights
+        if len(df) > 0:
+            st.subheader("🇵🇭 Filipino Context")
+            
+            # Trigger-maintained counters, like the KPIs
+            for label, count in numbers['locations'].items():
+                st.metric(label, count)
+
+recent_section()
+
+@st.fragment(run_every=refresh_seconds)
+def status_section():
+    """System status indicators from the counters"""
+    numbers = load_feed()['numbers']
+    total_attempts = numbers['totals']['total_attempts']
+    blocked_attempts = numbers['totals']['blocked']
+    attack_ips = numbers['totals']['attack_ips']
+    detection_accuracy = numbers['accuracy']
+
+    # System Status with Enhanced Indicators
+    st.markdown("---")
+    st.subheader("🔍 System Status")
+
+    status_col1, status_col2, status_col3, status_col4 = st.columns(4)
+
+    with status_col1:
+        if total_attempts > 0:
+            st.success("✅ AI Model Active")
+            st.caption(f"Analyzed {total_attempts} attempts")
+        else:
+            st.warning("⚠️ No Recent Activity")
+
+    with status_col2:
+        if detection_accuracy >= 95:
+            st.success(f"✅ Excellent Accuracy")
+            st.caption(f"{detection_accuracy}% detection rate")
+        elif detection_accuracy >= 85:
+            st.warning(f"⚠️ Good Accuracy")
+            st.caption(f"{detection_accuracy}% detection rate")
+        else:
+            st.error(f"❌ Needs Improvement")
+            st.caption(f"{detection_accuracy}% detection rate")
+
+    with status_col3:
+        if blocked_attempts == 0:
+            st.success("✅ No Threats Blocked")
+        elif blocked_attempts <= 2:
+            st.warning(f"⚠️ {blocked_attempts} Threat(s) Blocked")
+        else:
+            st.error(f"🚨 {blocked_attempts} Threats Blocked")
+        st.caption("Automatic protection active")
+
+    with status_col4:
+        if attack_ips == 0:
+            st.success("✅ No Attack IPs")
+        else:
+            st.error(f"🚨 {attack_ips} Attack IP(s)")
+        st.caption("Threat intelligence active")
+
+status_section()
 
 # Quick Actions
 st.markdown("---")
@@ -276,6 +350,8 @@ action_col1, action_col2, action_col3 = st.columns(3)
 
 with action_col1:
     if st.button("🔄 Refresh Dashboard", use_container_width=True):
+        # Reload the whole window instead of polling
+        st.session_state.pop('dashboard_feed', None)
         st.rerun()
 
 with action_col2:
@@ -287,4 +363,12 @@ with action_col3:
         st.switch_page("pages/8_Export Report.py")
 
 # Real-time updates indicator
-st.caption(f"📡 Last updated: {datetime.now().strftime('%H:%M:%S')} • BantAI v1.0 • Real-time monitoring active")
\ No newline at end of file
+@st.fragment(run_every=refresh_seconds)
+def feed_ticker():
+    """Time of the last poll of the feed"""
+    load_feed()
+    polled_at = datetime.fromtimestamp(st.session_state.get('dashboard_polled_at', time.time()))
+    mode = f"Auto-refresh {refresh_label.lower()}" if refresh_seconds else "Real-time monitoring active"
+    st.caption(f"📡 Last updated: {polled_at.strftime('%H:%M:%S')} • BantAI v1.0 • {mode}")
+
+feed_ticker()
\ No newline at end of file
@@ -4,7 +4,7 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.style import inject_custom_css
-from utils.database import get_login_activities, update_action
+from utils.database import get_login_activities_page, count_activities, update_admin_actions_bulk
 
 st.set_page_config(page_title="Recent Login Activities", layout="wide")
 inject_custom_css()
@@ -12,38 +12,109 @@ inject_custom_css()
 st.title("Recent Login Activities")
 st.markdown("Filtered view of recent login attempts with admin actions.")
 
-# Get data from database instead of hardcoded data
-df = get_login_activities()
+PAGE_SIZES = [25, 50, 100]
 
-# Display the dataframe
-st.dataframe(df, use_container_width=True, hide_index=True)
+# Matching rows are counted up to this many, so the count costs no more than a few pages
+COUNT_LIMIT = 1000
 
-# Add admin action buttons for each row
+# Columns of the review grid
+GRID_COLUMNS = [
+    '#', 'User ID', 'Login Timestamp (UTC+8)', 'Country', 'City', 'device_type', 'Risk %',
+    'Classification', 'AI Action', 'Location Context', 'Admin Action',
+]
+
+# Button label -> admin action
+BULK_ACTIONS = {
+    "✅ False Positive": 'False Positive',
+    "❌ True Positive": 'True Positive - Blocked',
+    "🔒 Require OTP": 'Require OTP',
+}
+
+SORT_OPTIONS = {"Newest first": 'login_timestamp', "Highest risk first": 'risk_percentage'}
+
+# Result of the last bulk action, shown after the rerun
+notice = st.session_state.pop('activity_notice', None)
+if notice:
+    st.success(notice)
+
+# Filters are applied in the query, one page of rows is loaded at a time
+filter_col1, filter_col2, filter_col3, filter_col4 = st.columns(4)
+with filter_col1:
+    classification = st.multiselect("Classification", ["HIGH", "MEDIUM", "LOW"])
+with filter_col2:
+    action = st.multiselect("AI Action", ["BLOCK", "ALLOW_WITH_OTP", "ALLOW"])
+with filter_col3:
+    review_status = st.selectbox("Review Status", ["All", "Pending", "Reviewed"])
+with filter_col4:
+    min_risk = st.slider("Minimum Risk %", 0, 100, 0, step=5)
+
+option_col1, option_col2 = st.columns(2)
+with option_col1:
+    sort_label = st.selectbox("Sort by", list(SORT_OPTIONS))
+with option_col2:
+    page_size = st.selectbox("Rows per page", PAGE_SIZES)
+
+filters = {
+    'classification': classification,
+    'action': action,
+    'review_status': None if review_status == "All" else review_status.lower(),
+    'min_risk': min_risk or None,
+}
+
+# Cursors of the pages visited so far; reset whenever the filters, order or page size change
+filter_key = repr((sorted(filters.items()), sort_label, page_size))
+if st.session_state.get('activity_filters') != filter_key:
+    st.session_state.activity_filters = filter_key
+    st.session_state.activity_cursors = [None]
+
+cursors = st.session_state.activity_cursors
+df, next_cursor = get_login_activities_page(GRID_COLUMNS, order_by=SORT_OPTIONS[sort_label],
+                                            limit=page_size, cursor=cursors[-1], **filters)
+total = count_activities(limit=COUNT_LIMIT, **filters)
+total_label = f"{COUNT_LIMIT:,}+" if total >= COUNT_LIMIT else f"{total:,}"
+
+st.caption(f"Page {len(cursors)} · {total_label} matching activities")
+
+# Review grid: tick rows, then apply an action to all of them at once
+select_all = st.checkbox("Select all on this page", key=f"select_all_{filter_key}_{len(cursors)}")
+grid = df.copy()
+grid.insert(0, 'Select', select_all)
+edited = st.data_editor(
+    grid,
+    # A new key per page, select-all state and bulk action starts with a fresh selection
+    key=f"activity_grid_{filter_key}_{len(cursors)}_{select_all}_{st.session_state.get('activity_grid_version', 0)}",
+    use_container_width=True,
+    hide_index=True,
+    disabled=GRID_COLUMNS,
+    column_config={
+        'Select': st.column_config.CheckboxColumn("Select", help="Include in the bulk action"),
+        'Risk %': st.column_config.NumberColumn("Risk %", format="%.1f"),
+    },
+)
+selected_ids = edited.loc[edited['Select'], '#'].tolist()
+
+page_col1, page_col2 = st.columns(2)
+with page_col1:
+    if st.button("⬅ Previous page", disabled=len(cursors) == 1):
+        cursors.pop()
+        st.rerun()
+with page_col2:
+    if st.button("Next page ➡", disabled=next_cursor is None):
+        cursors.append(next_cursor)
+        st.rerun()
+
+# Bulk admin actions for the selected rows
 st.markdown("### Admin Actions")
+st.caption(f"{len(selected_ids)} selected")
 
-for index, row in df.iterrows():
-    col1, col2, col3, col4 = st.columns([4, 1, 1, 1])
-    
-    with col1:
-       risk_level = "HIGH RISK" if row['Risk %'] >= 70 else "LOW RISK"
-    st.write(f"**{row['User ID']}** - {risk_level} ({row['Risk %']}%) - {row['Country']}")
-    
-    with col2:
-        if st.button("✅ False Positive", key=f"fp_{row['#']}"):
-            update_action(row['#'], 'False Positive')
-            st.success("Marked as False Positive")
-            st.rerun()
-    
-    with col3:
-        if st.button("❌ True Positive", key=f"tp_{row['#']}"):
-            update_action(row['#'], 'True Positive - Blocked')
-            st.success("Marked as True Positive")
-            st.rerun()
-    
-    with col4:
-        if st.button("🔒 Require OTP", key=f"otp_{row['#']}"):
-            update_action(row['#'], 'Require OTP')
-            st.success("OTP Required")
+admin_user = st.text_input("Reviewer", value="admin", key="activity_reviewer")
+action_cols = st.columns(len(BULK_ACTIONS))
+for col, (label, admin_action) in zip(action_cols, BULK_ACTIONS.items()):
+    with col:
+        if st.button(label, disabled=not selected_ids, use_container_width=True):
+            updated, skipped = update_admin_actions_bulk(selected_ids, admin_action, admin_user or "admin")
+            st.session_state.activity_notice = f"Marked {updated} activities as {admin_action}" + (
+                f" · skipped {len(skipped)} claimed by another reviewer: "
+                + ", ".join(f"#{activity_id}" for activity_id in skipped) if skipped else "")
+            st.session_state.activity_grid_version = st.session_state.get('activity_grid_version', 0) + 1
             st.rerun()
-    
-    st.markdown("---")
\ No newline at end of file
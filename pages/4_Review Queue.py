@@ -0,0 +1,159 @@
+import streamlit as st
+import sys
+import os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.style import inject_custom_css
+from utils.database import (
+    claim_reviews,
+    get_claimed_reviews,
+    get_close_matches,
+    get_review_queue_stats,
+    get_similar_incidents,
+    release_reviews,
+    renew_reviews,
+    update_admin_actions_bulk
+)
+from utils.review_queue import LEASE_SECONDS
+from utils.similarity import MATCH_DISTANCE
+
+st.set_page_config(page_title="Review Queue", layout="wide")
+inject_custom_css()
+
+st.title("Review Queue")
+st.markdown("Claim the riskiest pending logins. Claimed logins are hidden from other analysts "
+            f"for {LEASE_SECONDS // 60} minutes, or until you review or release them.")
+
+# Columns shown for claimed logins
+CLAIM_COLUMNS = [
+    '#', 'User ID', 'Login Timestamp (UTC+8)', 'Country', 'City', 'device_type', 'Risk %',
+    'Classification', 'AI Action', 'Warnings', 'Location Context',
+]
+
+# Columns shown for similar incidents and close matches
+SIMILAR_COLUMNS = [
+    '#', 'Distance', 'User ID', 'Login Timestamp (UTC+8)', 'City', 'device_type', 'time_diff (hrs)',
+    'distance (km)', 'latency (ms)', 'Risk %', 'Admin Action',
+]
+
+# Button label -> admin action
+REVIEW_ACTIONS = {
+    "✅ False Positive": 'False Positive',
+    "❌ True Positive": 'True Positive - Blocked',
+    "✔️ Confirmed Correct": 'Confirmed Correct',
+    "🔒 Require OTP": 'Require OTP',
+}
+
+# Result of the last action, shown after the rerun
+notice = st.session_state.pop('queue_notice', None)
+if notice:
+    st.success(notice)
+
+# Queue health
+stats = get_review_queue_stats()
+stat_col1, stat_col2, stat_col3, stat_col4 = st.columns(4)
+with stat_col1:
+    st.metric("Pending Reviews", f"{stats['depth']:,}")
+with stat_col2:
+    st.metric("Claimed", f"{stats['leased']:,}", help="Logins with a live lease")
+with stat_col3:
+    st.metric("Oldest Pending", f"{stats['oldest_age_seconds'] / 3600:,.1f} h")
+with stat_col4:
+    st.metric("Queue Head Age", f"{stats['head_age_seconds'] / 3600:,.1f} h",
+              help="Age of the next login to be claimed")
+
+st.markdown("---")
+
+claim_col1, claim_col2, claim_col3 = st.columns([2, 1, 1])
+with claim_col1:
+    admin_user = st.text_input("Reviewer", value="admin", key="queue_reviewer") or "admin"
+with claim_col2:
+    claim_count = st.number_input("Logins to claim", min_value=1, max_value=100, value=10)
+with claim_col3:
+    st.write("")
+    if st.button("🎯 Claim Next", use_container_width=True):
+        claimed = claim_reviews(int(claim_count), admin_user)
+        st.session_state.queue_notice = (f"Claimed {len(claimed)} logins" if claimed
+                                         else "Nothing to claim: every pending login is reviewed or claimed")
+        st.rerun()
+
+# This reviewer's claimed logins
+df = get_claimed_reviews(admin_user)[CLAIM_COLUMNS]
+st.subheader(f"Claimed by {admin_user} ({len(df)})")
+
+if len(df) > 0:
+    select_all = st.checkbox("Select all", value=True, key="queue_select_all")
+    grid = df.copy()
+    grid.insert(0, 'Select', select_all)
+    edited = st.data_editor(
+        grid,
+        key=f"queue_grid_{select_all}_{st.session_state.get('queue_grid_version', 0)}",
+        use_container_width=True,
+        hide_index=True,
+        disabled=CLAIM_COLUMNS,
+        column_config={
+            'Select': st.column_config.CheckboxColumn("Select"),
+            'Risk %': st.column_config.NumberColumn("Risk %", format="%.1f"),
+        },
+    )
+    selected_ids = edited.loc[edited['Select'], '#'].tolist()
+
+    # Opt-in: the decision also goes to pending logins nearly identical to a selected one
+    include_matches = st.checkbox(
+        "Also apply to close matches",
+        help=f"Pending logins of the same user, city and device within distance {MATCH_DISTANCE} "
+             "of a selected login. Logins claimed by other reviewers are left alone.")
+    if include_matches and selected_ids:
+        # A preview; the matches are looked up again when the decision is written
+        matched = {match_id for activity_id in selected_ids
+                   for match_id in get_close_matches(activity_id, admin_user)['#']}
+        st.caption(f"{len(matched - set(selected_ids))} close matches will be included")
+
+    action_cols = st.columns(len(REVIEW_ACTIONS))
+    for col, (label, admin_action) in zip(action_cols, REVIEW_ACTIONS.items()):
+        with col:
+            if st.button(label, disabled=not selected_ids, use_container_width=True):
+                # Reviewing drops the leases
+                updated, skipped = update_admin_actions_bulk(selected_ids, admin_action, admin_user,
+                                                             include_matches=include_matches)
+                st.session_state.queue_notice = f"Marked {updated} logins as {admin_action}" + (
+                    f" · skipped {len(skipped)} claimed by another reviewer: "
+                    + ", ".join(f"#{activity_id}" for activity_id in skipped) if skipped else "")
+                st.session_state.queue_grid_version = st.session_state.get('queue_grid_version', 0) + 1
+                st.rerun()
+
+    lease_col1, lease_col2 = st.columns(2)
+    with lease_col1:
+        if st.button("⏳ Extend Lease", disabled=not selected_ids, use_container_width=True):
+            renewed = renew_reviews(selected_ids, admin_user)
+            st.session_state.queue_notice = f"Extended {renewed} leases by {LEASE_SECONDS // 60} minutes"
+            st.rerun()
+    with lease_col2:
+        if st.button("↩️ Release", disabled=not selected_ids, use_container_width=True):
+            released = release_reviews(selected_ids, admin_user)
+            st.session_state.queue_notice = f"Returned {released} logins to the queue"
+            st.session_state.queue_grid_version = st.session_state.get('queue_grid_version', 0) + 1
+            st.rerun()
+
+    # Similar incidents of one claimed login, and how they were decided
+    st.markdown("### Similar Incidents")
+    inspected = st.selectbox(
+        "Login", df['#'].tolist(),
+        format_func=lambda activity_id: f"#{activity_id} · " + " · ".join(
+            str(value) for value in df.loc[df['#'] == activity_id, ['User ID', 'City', 'device_type']].iloc[0]))
+    similar = get_similar_incidents(int(inspected))
+    if len(similar) > 0:
+        st.dataframe(similar[SIMILAR_COLUMNS], use_container_width=True, hide_index=True)
+        decided = similar[similar['Admin Action'] != 'Pending Review']
+        if len(decided) > 0:
+            st.caption("Past decisions: " + ", ".join(
+                f"{action} ×{count}" for action, count in decided['Admin Action'].value_counts()[lambda counts: counts > 0].items()))
+    else:
+        st.info("No similar incidents in the same city on the same device.")
+
+    matches = get_close_matches(int(inspected), admin_user)
+    st.caption(f"{len(matches)} pending close matches of #{inspected}")
+    if len(matches) > 0:
+        st.dataframe(matches[SIMILAR_COLUMNS], use_container_width=True, hide_index=True)
+else:
+    st.info("No claimed logins. Claim the next ones from the queue above.")
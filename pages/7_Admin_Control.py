@@ -4,7 +4,13 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.style import inject_custom_css
-from utils.database import add_login_activity_enhanced, get_login_activities_enhanced
+from utils.database import add_login_activity_enhanced, get_login_activities_page
+from utils.model_manager import get_model, get_model_status
+from utils.metrics import metrics_snapshot, metrics_enabled, set_metrics_enabled, reset_metrics
+from utils.ingest import ingest_enabled, set_ingest_enabled
+from utils.cache import cache_enabled, cache_stats, clear_cache, set_cache_enabled
+import pandas as pd
+import json
 from datetime import datetime
 
 st.set_page_config(page_title="Admin Control", layout="wide")
@@ -17,7 +23,16 @@ st.markdown("Simulate login attempts and test BantAI's AI security analysis")
 col_status1, col_status2, col_status3 = st.columns(3)
 
 with col_status1:
-    st.metric("🤖 AI Model", "Active", help="BantAI model is running")
+    get_model()
+    model_status = get_model_status()
+    if model_status['model_available']:
+        st.metric("🤖 AI Model", "Active", delta=f"v{model_status['version']}",
+                  help=f"Loaded {model_status['loaded_at']} in {model_status['load_seconds']:.2f}s")
+    else:
+        st.metric("🤖 AI Model", "Unavailable", delta="Fallback predictions", delta_color="inverse",
+                  help="Model file missing or failed to load")
+    if model_status['last_reload_status'] == 'failed':
+        st.error(f"❌ Last model reload failed: {model_status['last_reload_error']}")
 with col_status2:
     st.metric("🛡️ Protection", "Enabled", help="Real-time threat detection active")
 with col_status3:
@@ -52,6 +67,8 @@ with st.form("simulate_login"):
         distance = st.number_input("Distance (km)", 
                                   min_value=0, max_value=20000, value=100, step=10,
                                   help="Distance from last login location")
+        derive_features = st.checkbox("Derive time & distance from last login",
+                                      help="Ignore the two values above and compute them from the user's previous login")
         latency = st.number_input("Network Latency (ms)", 
                                  min_value=10, max_value=5000, value=50, step=10,
                                  help="Network response time")
@@ -116,8 +133,8 @@ if simulate_button:
                 user_id=user_id,
                 country=country, 
                 city=city,
-                time_diff=time_diff,
-                distance=distance,
+                time_diff=None if derive_features else time_diff,
+                distance=None if derive_features else distance,
                 device_type=device_type,
                 latency=latency,
                 is_attack_ip=is_attack_ip,
@@ -189,11 +206,13 @@ st.markdown("---")
 st.subheader("📈 Recent Simulations")
 
 try:
-    df = get_login_activities_enhanced()
+    # Show last 3 simulations
+    recent_df, _ = get_login_activities_page(
+        columns=['User ID', 'Login Timestamp (UTC+8)', 'Country', 'City', 'device_type', 'Risk %',
+                 'Classification', 'AI Action', 'AI Recommendation', 'Location Context', 'Admin Action'],
+        limit=3)
     
-    if len(df) > 0:
-        # Show last 3 simulations
-        recent_df = df.head(3)
+    if len(recent_df) > 0:
         
         for index, row in recent_df.iterrows():
             with st.expander(f"🔍 {row['User ID']} from {row['Country']} - {row['Classification']} Risk", expanded=False):
@@ -217,6 +236,85 @@ try:
 except Exception as e:
     st.error(f"Unable to load recent simulations: {e}")
 
+# Prediction pipeline latency
+st.markdown("---")
+st.subheader("⏱️ Pipeline Latency")
+
+snapshot = metrics_snapshot()
+counters = snapshot['counters']
+predictions_total = counters.get('predictions', 0)
+fallbacks = counters.get('fallback_predictions', 0)
+
+latency_col1, latency_col2, latency_col3 = st.columns(3)
+with latency_col1:
+    st.metric("Predictions", f"{predictions_total:,}", help="Predictions made by this server process")
+with latency_col2:
+    st.metric(
+        "Fallback Predictions",
+        f"{fallbacks:,}",
+        delta=f"{fallbacks / predictions_total * 100:.1f}% of total" if predictions_total else None,
+        delta_color="inverse",
+        help="Dummy 0.25 MEDIUM predictions used because the model was missing or failed"
+    )
+with latency_col3:
+    timing_on = st.toggle("Stage timing", value=metrics_enabled(), help="Record per-stage latency histograms")
+    if timing_on != metrics_enabled():
+        set_metrics_enabled(timing_on)
+
+gauges = snapshot['gauges']
+ingest_col1, ingest_col2, ingest_col3 = st.columns(3)
+with ingest_col1:
+    queue_on = st.toggle("Write-behind ingestion", value=ingest_enabled(),
+                         help="Return login decisions before the row is stored; a writer thread commits in batches")
+    if queue_on != ingest_enabled():
+        set_ingest_enabled(queue_on)
+with ingest_col2:
+    st.metric("Ingest Queue Depth", f"{gauges.get('ingest_queue_depth', 0):,}",
+              help=f"{gauges.get('ingest_spill_rows', 0):,} rows waiting in the spill file")
+with ingest_col3:
+    st.metric("Last Commit Batch", f"{gauges.get('ingest_last_batch_size', 0):,}",
+              help=f"{counters.get('ingest_rows', 0):,} rows in {counters.get('ingest_batches', 0):,} batches")
+
+cache_col1, cache_col2, cache_col3 = st.columns(3)
+with cache_col1:
+    cache_on = st.toggle("Shared result cache", value=cache_enabled(),
+                         help="Reuse page query results across sessions until the next write")
+    if cache_on != cache_enabled():
+        set_cache_enabled(cache_on)
+with cache_col2:
+    hits, misses = counters.get('cache_hits', 0), counters.get('cache_misses', 0)
+    st.metric("Cache Hit Rate", f"{hits / (hits + misses) * 100:.0f}%" if hits + misses else "–",
+              help=f"{hits:,} hits, {misses:,} misses, {counters.get('cache_invalidations', 0):,} invalidating writes")
+with cache_col3:
+    stats = cache_stats()
+    st.metric("Cached Results", f"{stats['entries']:,}", help=f"{stats['bytes'] / 2**20:.1f} MiB")
+    if st.button("🧹 Clear Cache", use_container_width=True):
+        clear_cache()
+        st.rerun()
+
+if snapshot['histograms']:
+    latency_df = pd.DataFrame([
+        {'Stage': stage, **{k: v for k, v in hist.items() if k != 'buckets'}}
+        for stage, hist in snapshot['histograms'].items()
+    ])
+    st.dataframe(latency_df, use_container_width=True, hide_index=True)
+else:
+    st.info("No timings recorded yet. Run an AI analysis above.")
+
+dump_col1, dump_col2 = st.columns(2)
+with dump_col1:
+    st.download_button(
+        "⬇️ Download Metrics Snapshot (JSON)",
+        data=json.dumps(snapshot, indent=2),
+        file_name=f"bantai_metrics_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+        mime="application/json",
+        use_container_width=True
+    )
+with dump_col2:
+    if st.button("♻️ Reset Metrics", use_container_width=True):
+        reset_metrics()
+        st.rerun()
+
 # Quick actions
 st.markdown("---")
 st.subheader("⚡ Quick Actions")
@@ -6,8 +6,11 @@ import pandas as pd
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.style import inject_custom_css
-from utils.database import get_login_activities, get_dashboard_metrics, get_detection_accuracy, get_false_positives_count
+from utils.database import get_login_activities_page, get_login_history, get_dashboard_metrics, get_detection_accuracy, get_false_positives_count
 from utils.pdf_generator import generate_audit_report
+from utils.activities import ACTIVITY_COLUMNS, CODED_COLUMNS
+
+EXPORT_COLUMNS = [name for name in ACTIVITY_COLUMNS if name not in CODED_COLUMNS]
 
 # Page Configuration
 st.set_page_config(page_title="Export Reports", page_icon="📊", layout="wide")
@@ -82,6 +85,8 @@ with col1:
 with col2:
     include_sensitive = st.checkbox("Include Sensitive Data", value=False, help="Include full user details")
     report_format = st.selectbox("Export Format", ["PDF", "PDF + CSV Data"], index=0)
+    include_archive = st.checkbox("Include Archived History", value=False,
+                                  help="Also read logins moved to the Parquet archive (python -m utils.archive)")
 
 st.markdown("---")
 
@@ -90,15 +95,15 @@ st.subheader("📊 Report Preview")
 
 # Get data for preview - SINGLE data loading block
 try:
-    df = get_login_activities()
+    # Date range filtered in the query; the analysis factor/warning lists are not exported
+    if include_archive:
+        filtered_df = get_login_history(columns=EXPORT_COLUMNS, since=start_date, until=end_date)
+    else:
+        filtered_df, _ = get_login_activities_page(columns=EXPORT_COLUMNS, limit=None, since=start_date, until=end_date)
     metrics = get_dashboard_metrics()
     detection_accuracy = get_detection_accuracy()
     false_positives_count = get_false_positives_count()
     
-    # Filter data by date range
-    df['date'] = pd.to_datetime(df['Login Timestamp (UTC+8)']).dt.date
-    filtered_df = df[(df['date'] >= start_date) & (df['date'] <= end_date)]
-    
     # Map column names for PDF generator
     if len(filtered_df) > 0:
         filtered_df = filtered_df.rename(columns={
@@ -4,8 +4,9 @@ import os
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 from utils.style import inject_custom_css
+from utils.cache import clear_cache
 from utils.database import (
-    get_user_timeline_data, get_user_info, get_user_stats, 
+    get_users, get_user_timeline_data, get_user_info, get_user_stats, 
     get_user_location_patterns, get_user_device_patterns, get_user_risk_trends
 )
 import pandas as pd
@@ -21,16 +22,7 @@ st.title("👤 User Profile & Timeline Analysis")
 st.markdown("Visualize user behavior patterns and AI learning over time")
 
 # Get list of users for dropdown
-try:
-    conn = st.connection('sql', type='sqlite3', url='bantai_security.db')
-    users_query = "SELECT user_id, username FROM users ORDER BY username"
-    users_df = conn.query(users_query)
-except:
-    # Fallback to direct database connection
-    import sqlite3
-    conn_db = sqlite3.connect('bantai_security.db')
-    users_df = pd.read_sql_query("SELECT user_id, username FROM users ORDER BY username", conn_db)
-    conn_db.close()
+users_df = get_users()
 
 if users_df.empty:
     st.error("❌ No users found in database. Please initialize the database first.")
@@ -49,7 +41,11 @@ with col1:
 
 with col2:
     if st.button("🔄 Refresh Data", type="secondary", use_container_width=True):
+        # Also picks up writes made by other processes before the cache expires
+        clear_cache()
         st.rerun()
+    include_archive = st.checkbox("Include archived history", value=False,
+                                  help="Also read logins moved to the Parquet archive")
 
 with col3:
     if st.button("⚙️ Admin Control", type="primary", use_container_width=True):
@@ -64,7 +60,7 @@ with st.spinner("📊 Loading user profile data..."):
     try:
         user_info = get_user_info(selected_user_id)
         user_stats = get_user_stats(selected_user_id)
-        timeline_df = get_user_timeline_data(selected_user_id)
+        timeline_df = get_user_timeline_data(selected_user_id, include_archive=include_archive)
         
         if user_info is None:
             st.error(f"❌ User {selected_user_id} not found!")
@@ -237,7 +233,7 @@ with chart_col1:
     st.subheader("📍 Login Locations")
     
     # Location frequency analysis
-    location_counts = timeline_df.groupby(['country', 'city']).size().reset_index(name='count')
+    location_counts = timeline_df.groupby(['country', 'city'], observed=True).size().reset_index(name='count')
     location_counts['location'] = location_counts['city'] + ', ' + location_counts['country']
     
     if not location_counts.empty:
@@ -0,0 +1,62 @@
+# tests/test_activities.py
+"""Keyset pagination of the login activity listing (utils.activities.query_login_activities)"""
+import pytest
+
+from utils.activities import SORT_KEYS, query_login_activities
+from utils.connection import connect
+from utils.migrations import migrate
+
+BASE_TS = 1767225600000
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = connect(str(tmp_path / 'bantai.db'))
+    migrate(conn)
+    # 100 logins on 10 distinct timestamps and 5 distinct risks, so every sort key has long runs of ties
+    with conn:
+        conn.executemany('INSERT INTO login_activities (user_id, login_ts, utc_offset, risk_percentage) '
+                         'VALUES (?, ?, 480, ?)',
+                         [(f'U_{i % 4}', BASE_TS + (i * 7 % 10) * 60000, (i * 3 % 5) * 20.0) for i in range(100)])
+    yield conn
+    conn.close()
+
+
+def walk(conn, limit, **query):
+    """Ids of every page in turn"""
+    ids, cursor = [], None
+    while True:
+        page, cursor = query_login_activities(conn, ['#'], limit=limit, cursor=cursor, **query)
+        ids.extend(page['#'].tolist())
+        if cursor is None:
+            return ids
+
+
+@pytest.mark.parametrize('order_by', list(SORT_KEYS))
+@pytest.mark.parametrize('descending', [True, False])
+@pytest.mark.parametrize('limit', [1, 7, 10, 99, 100])
+def test_pages_return_every_row_once(conn, order_by, descending, limit):
+    everything, _ = query_login_activities(conn, ['#'], order_by=order_by, descending=descending, limit=None)
+    ids = walk(conn, limit, order_by=order_by, descending=descending)
+    assert ids == everything['#'].tolist()
+    assert sorted(ids) == list(range(1, 101))
+
+
+def test_filtered_pages_return_every_matching_row_once(conn):
+    ids = walk(conn, 6, user_id='U_1', min_risk=40)
+    expected = [row[0] for row in conn.execute(
+        'SELECT id FROM login_activities WHERE user_id = ? AND risk_percentage >= 40 ORDER BY login_ts DESC, id DESC',
+        ('U_1',))]
+    assert ids == expected
+
+
+def test_new_logins_do_not_shift_later_pages(conn):
+    first, cursor = query_login_activities(conn, ['#'], limit=30)
+    with conn:
+        conn.execute("INSERT INTO login_activities (user_id, login_ts, utc_offset) VALUES ('U_9', ?, 480)",
+                     (BASE_TS + 3600000,))
+    rest = []
+    while cursor is not None:
+        page, cursor = query_login_activities(conn, ['#'], limit=30, cursor=cursor)
+        rest.extend(page['#'].tolist())
+    assert sorted(first['#'].tolist() + rest) == list(range(1, 101))
@@ -0,0 +1,42 @@
+# tests/test_cache.py
+"""Tag-versioned result cache (utils.cache)"""
+import pytest
+
+from utils import cache
+
+
+@pytest.fixture(autouse=True)
+def fresh_cache():
+    cache.set_cache_enabled(True)
+    cache.clear_cache()
+    yield
+    cache.clear_cache()
+
+
+def test_hit_until_a_write_bumps_its_tag():
+    calls = []
+
+    @cache.cached(lambda: 'test.db', tags=lambda user_id: [f'user:{user_id}'])
+    def load(user_id):
+        calls.append(user_id)
+        return [user_id]
+
+    assert load('U_1') == load('U_1') == ['U_1']
+    assert calls == ['U_1']
+    cache.bump_data_version('test.db', ['user:U_2'])
+    load('U_1')
+    assert calls == ['U_1']
+    cache.bump_data_version('test.db', ['user:U_1'])
+    load('U_1')
+    assert calls == ['U_1', 'U_1']
+
+
+def test_failed_loads_leave_no_lock_behind():
+    @cache.cached(lambda: 'test.db')
+    def load(n):
+        raise RuntimeError(n)
+
+    for n in range(20):
+        with pytest.raises(RuntimeError):
+            load(n)
+    assert cache._loading == {}
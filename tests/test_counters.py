@@ -0,0 +1,73 @@
+# tests/test_counters.py
+"""Trigger-maintained dashboard counters (utils.counters) against a full recount"""
+import random
+
+import pytest
+
+from utils import database
+from utils.connection import close_thread_connection, connect
+from utils.counters import check_counters, counter_totals
+from utils.migrations import migrate
+
+CONTEXTS = [('Philippines', 'Manila', 'Domestic location'), ('Philippines', 'Cebu', 'Domestic location'),
+            ('United Arab Emirates', 'Dubai', 'OFW hub (UAE)'), ('Russia', 'Moscow', 'Foreign location')]
+
+
+def random_row(rng):
+    country, city, context = rng.choice(CONTEXTS)
+    risk_score = rng.random()
+    level = 0 if risk_score < 0.3 else 1 if risk_score < 0.7 else 2
+    login_data = {'distance': rng.choice([5, 500, 12000]), 'device_type': 0, 'is_attack_ip': int(rng.random() < 0.2),
+                  'login_successful': int(rng.random() > 0.2), 'latency': rng.randint(10, 3000)}
+    prediction = {
+        'risk_score': risk_score, 'risk_percentage': risk_score * 100,
+        'classification': ['LOW', 'MEDIUM', 'HIGH'][level], 'action': ['ALLOW', 'ALLOW_WITH_OTP', 'BLOCK'][level],
+        'recommendation': 'ALLOW', 'analysis_factors': [], 'warnings': database.generate_warnings(login_data, risk_score),
+        'behavior_consistency': 85, 'location_context': context,
+    }
+    timestamp = f"2026-01-{rng.randint(1, 5):02d} {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00"
+    return database.login_activity_row(f"U_{rng.randrange(20)}", timestamp, country, city, 1.0,
+                                       login_data['distance'], 'mobile', login_data['latency'],
+                                       login_data['is_attack_ip'], login_data['login_successful'], prediction)
+
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    path = str(tmp_path / 'bantai.db')
+    setup = connect(path)
+    migrate(setup)
+    setup.close()
+    monkeypatch.setattr(database, 'DATABASE_PATH', path)
+    yield database.get_connection()
+    close_thread_connection(path)
+
+
+def test_counters_follow_inserts_updates_and_deletes(conn):
+    rng = random.Random(0)
+    database.insert_login_activities([random_row(rng) for _ in range(200)])
+    assert check_counters(conn) == []
+    assert counter_totals(conn)['total_attempts'] == 200
+
+    ids = [row[0] for row in conn.execute('SELECT id FROM login_activities')]
+    for action in ('False Positive', 'True Positive - Blocked', 'Confirmed Correct'):
+        database.update_admin_actions_bulk(rng.sample(ids, 40), action)
+    # Corrected decisions and a return to the queue
+    database.update_admin_actions_bulk(rng.sample(ids, 30), 'False Positive')
+    database.update_admin_actions_bulk(rng.sample(ids, 10), 'Pending Review')
+    assert check_counters(conn) == []
+    assert counter_totals(conn)['reviewed'] > 0
+
+    with conn:
+        for activity_id in rng.sample(ids, 60):
+            conn.execute('UPDATE login_activities SET risk_percentage = ?, recommended_action = ?, is_attack_ip = ?, '
+                         'location_context = ? WHERE id = ?',
+                         (rng.uniform(0, 100), rng.choice(['ALLOW', 'ALLOW_WITH_OTP', 'BLOCK']), rng.randint(0, 1),
+                          rng.choice(CONTEXTS)[2], activity_id))
+        # A different login day moves the false positive between days
+        conn.execute('UPDATE login_activities SET login_ts = login_ts + 86400000 WHERE id % 7 = 0')
+    assert check_counters(conn) == []
+
+    with conn:
+        conn.execute('DELETE FROM login_activities WHERE id % 3 = 0')
+    assert check_counters(conn) == []
+    assert counter_totals(conn)['total_attempts'] == conn.execute('SELECT COUNT(*) FROM login_activities').fetchone()[0]
@@ -0,0 +1,66 @@
+# tests/test_features.py
+"""Last-login store and derived time_diff/distance (utils.features)"""
+from datetime import datetime
+
+import pytest
+
+from utils import database, features
+from utils.connection import close_thread_connection, connect
+from utils.features import LastLoginStore, _latest_login_ts, _load_last_login, derive_login_features
+from utils.migrations import migrate
+from utils.timestamps import to_login_ts
+
+
+@pytest.fixture
+def db(tmp_path, monkeypatch):
+    path = str(tmp_path / 'bantai.db')
+    conn = connect(path)
+    migrate(conn)
+    monkeypatch.setattr(database, 'DATABASE_PATH', path)
+    yield conn
+    conn.close()
+    close_thread_connection(path)
+
+
+def store_login(conn, user_id, city, login_time, utc_offset=480):
+    """A login written by some other process"""
+    login_ts, _ = to_login_ts(login_time, utc_offset)
+    with conn:
+        conn.execute('INSERT INTO login_activities (user_id, login_ts, utc_offset, country, city, device_type) '
+                     'VALUES (?, ?, ?, ?, ?, ?)', (user_id, login_ts, utc_offset, 'Philippines', city, 'mobile'))
+
+
+def process_store():
+    return LastLoginStore(loader=_load_last_login, validator=_latest_login_ts)
+
+
+def test_logins_stored_elsewhere_replace_cached_ones(db, monkeypatch):
+    app, service = process_store(), process_store()
+    monkeypatch.setattr(features, '_store', app)
+    store_login(db, 'U_1', 'Manila', datetime(2026, 1, 1, 8, 0))
+    assert derive_login_features('U_1', 'Philippines', 'Manila', 'mobile', datetime(2026, 1, 1, 10, 0)) == (2.0, 0)
+
+    # The service stores a newer login in Cebu; the app's cached Manila login is stale
+    service.put('U_1', datetime(2026, 1, 1, 12, 0), features.location_coordinates('Philippines', 'Cebu'), 'mobile',
+                login_ts=to_login_ts(datetime(2026, 1, 1, 12, 0), 480)[0])
+    store_login(db, 'U_1', 'Cebu', datetime(2026, 1, 1, 12, 0))
+    time_diff, distance = derive_login_features('U_1', 'Philippines', 'Cebu', 'mobile', datetime(2026, 1, 1, 13, 0))
+    assert (time_diff, distance) == (1.0, 0)
+    assert app.stats()['stale'] == 1
+
+
+def test_users_without_logins_are_cached_until_their_first_login(db, monkeypatch):
+    app = process_store()
+    monkeypatch.setattr(features, '_store', app)
+    assert derive_login_features('U_2', 'Philippines', 'Manila', 'mobile', datetime(2026, 1, 1, 8, 0)) == (0.0, 0)
+    assert app.get('U_2') is None
+    assert app.stats()['hits'] == 1
+
+    store_login(db, 'U_2', 'Manila', datetime(2026, 1, 1, 8, 0))
+    assert derive_login_features('U_2', 'Philippines', 'Manila', 'mobile', datetime(2026, 1, 1, 9, 30)) == (1.5, 0)
+
+
+def test_previous_login_is_read_at_its_own_offset(db):
+    # 08:00 at UTC+9 is stored as 23:00 UTC; read back it is 08:00 again, not 07:00 at the server's offset
+    store_login(db, 'U_3', 'Tokyo', datetime(2026, 1, 1, 8, 0), utc_offset=540)
+    assert process_store().get('U_3')[0] == datetime(2026, 1, 1, 8, 0)
@@ -0,0 +1,118 @@
+# tests/test_inference.py
+"""Compiled models (utils.inference) against sklearn's predict_proba"""
+import numpy as np
+import pytest
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.tree import DecisionTreeClassifier
+
+from utils.inference import (
+    BATCH_CHUNK_ROWS, SINGLE_ROW_LOOP_MAX, CompiledForest, CompiledLinear, compile_model, load_compiled, save_compiled
+)
+
+N_FEATURES = 6
+
+
+def training_data(seed=0, rows=2000):
+    rng = np.random.default_rng(seed)
+    X = rng.normal(size=(rows, N_FEATURES)) * [10, 1000, 1, 1, 1, 500]
+    y = ((X[:, 0] > 2) ^ (X[:, 1] > 300) | (X[:, 5] > 700)).astype(int)
+    return X, y
+
+
+def probe_rows(compiled, n_rows=3000, seed=1):
+    """Inputs exactly on, just below and just above the forest's split points"""
+    rng = np.random.default_rng(seed)
+    columns = []
+    for f in range(N_FEATURES):
+        splits = compiled.threshold[(compiled.feature == f) & np.isfinite(compiled.threshold)]
+        if len(splits) == 0:
+            columns.append(rng.normal(size=n_rows))
+            continue
+        picks = rng.choice(splits, n_rows)
+        columns.append(picks + rng.choice([-1e-3, 0.0, 1e-3], n_rows) * np.maximum(1.0, np.abs(picks)))
+    return np.column_stack(columns)
+
+
+def with_nans(X, seed=2, fraction=0.2):
+    X = X.copy()
+    X[np.random.default_rng(seed).random(X.shape) < fraction] = np.nan
+    return X
+
+
+def assert_parity(compiled, model, X):
+    expected = model.predict_proba(X)
+    # Batches (chunked beyond BATCH_CHUNK_ROWS), small batches and single rows take different kernels
+    np.testing.assert_allclose(compiled.predict_proba(X), expected, rtol=0, atol=1e-12)
+    np.testing.assert_allclose(compiled.predict_proba(X[:SINGLE_ROW_LOOP_MAX]), expected[:SINGLE_ROW_LOOP_MAX],
+                               rtol=0, atol=1e-12)
+    for i in range(50):
+        np.testing.assert_allclose(compiled.predict_proba(X[i]), expected[i:i + 1], rtol=0, atol=1e-12)
+
+
+FORESTS = [
+    DecisionTreeClassifier(random_state=0),
+    RandomForestClassifier(n_estimators=25, max_depth=8, random_state=0),
+    ExtraTreesClassifier(n_estimators=25, random_state=0),
+]
+
+
+@pytest.fixture(params=FORESTS, ids=lambda model: type(model).__name__)
+def forest(request):
+    X, y = training_data()
+    model = request.param.fit(X, y)
+    compiled = compile_model(model)
+    assert isinstance(compiled, CompiledForest)
+    return model, compiled
+
+
+def test_forest_matches_sklearn(forest):
+    model, compiled = forest
+    X = probe_rows(compiled, n_rows=BATCH_CHUNK_ROWS + 500)
+    assert_parity(compiled, model, X)
+
+
+def test_forest_routes_nan_like_sklearn(forest):
+    model, compiled = forest
+    assert_parity(compiled, model, with_nans(probe_rows(compiled)))
+
+
+def test_forest_trained_with_missing_values():
+    X, y = training_data()
+    model = RandomForestClassifier(n_estimators=25, random_state=0).fit(with_nans(X, seed=3, fraction=0.1), y)
+    compiled = compile_model(model)
+    assert_parity(compiled, model, with_nans(probe_rows(compiled)))
+
+
+def test_forest_without_missing_routes_rejects_nan(forest):
+    model, compiled = forest
+    legacy = CompiledForest(compiled.feature, compiled.threshold, compiled.children, compiled.value,
+                            compiled.roots, compiled.max_depth, compiled.classes_)
+    with pytest.raises(ValueError):
+        legacy.predict_proba(with_nans(probe_rows(compiled, n_rows=10)))
+
+
+def test_linear_matches_sklearn():
+    X, y = training_data()
+    model = LogisticRegression(max_iter=1000).fit(X, y)
+    compiled = compile_model(model)
+    assert isinstance(compiled, CompiledLinear)
+    assert_parity(compiled, model, np.random.default_rng(1).normal(scale=100.0, size=(500, N_FEATURES)))
+
+
+def test_linear_rejects_nan_like_sklearn():
+    X, y = training_data()
+    model = LogisticRegression(max_iter=1000).fit(X, y)
+    compiled = compile_model(model)
+    X = with_nans(X[:10])
+    with pytest.raises(ValueError):
+        model.predict_proba(X)
+    with pytest.raises(ValueError):
+        compiled.predict_proba(X)
+
+
+def test_saved_forest_keeps_missing_routes(forest, tmp_path):
+    model, compiled = forest
+    path = tmp_path / 'model.npz'
+    save_compiled(compiled, path)
+    assert_parity(load_compiled(path), model, with_nans(probe_rows(compiled, n_rows=200)))
@@ -0,0 +1,99 @@
+# tests/test_ingest.py
+"""Write-behind ingestion (utils.ingest.IngestQueue): group commits, spill file and replay"""
+import json
+import os
+import threading
+from collections import Counter
+
+import pytest
+
+from utils.ingest import IngestQueue
+
+
+class Store:
+    """Insert function recording its batches; fails the first `failures` commits"""
+
+    def __init__(self, failures=0):
+        self.batches = []
+        self.failures = failures
+        self.release = threading.Event()
+        self.release.set()
+
+    def insert(self, batch):
+        self.release.wait(5)
+        if self.failures:
+            self.failures -= 1
+            raise RuntimeError("database is locked")
+        self.batches.append(list(batch))
+
+    def rows(self):
+        return [row for batch in self.batches for row in batch]
+
+
+def rows(n, start=0):
+    return [(i, f'U_{i % 7}', i * 1.5) for i in range(start, start + n)]
+
+
+def assert_written_once(store, expected):
+    written = Counter(store.rows())
+    assert [row for row, count in written.items() if count > 1] == []
+    assert set(written) == set(expected)
+
+
+@pytest.fixture
+def spill_path(tmp_path):
+    return str(tmp_path / 'bantai.db.spill.jsonl')
+
+
+def test_rows_are_written_in_group_commits(spill_path):
+    store = Store()
+    ingest = IngestQueue(store.insert, spill_path, max_size=1000, batch_size=10, flush_ms=20)
+    ingest.start()
+    ingest.submit(rows(95))
+    ingest.stop(5)
+    assert_written_once(store, rows(95))
+    assert max(len(batch) for batch in store.batches) <= 10
+    assert len(store.batches) < 95
+    assert not os.path.exists(spill_path)
+
+
+def test_overflow_is_spilled_and_replayed(spill_path):
+    store = Store()
+    store.release.clear()
+    ingest = IngestQueue(store.insert, spill_path, max_size=5, batch_size=4, flush_ms=10)
+    ingest.start()
+    # The writer is stuck on its first batch, so the queue fills and the rest goes to disk
+    ingest.submit(rows(50))
+    assert ingest.spill_rows > 0
+    with open(spill_path, encoding='utf-8') as spill:
+        assert len(spill.readlines()) == ingest.spill_rows
+    store.release.set()
+    ingest.stop(5)
+    assert_written_once(store, rows(50))
+    assert ingest.spill_rows == 0
+    assert not os.path.exists(spill_path)
+
+
+def test_failed_commits_are_retried_from_the_spill_file(spill_path):
+    store = Store(failures=2)
+    ingest = IngestQueue(store.insert, spill_path, max_size=1000, batch_size=10, flush_ms=10)
+    ingest.start()
+    ingest.submit(rows(30))
+    ingest.stop(10)
+    assert store.failures == 0
+    assert_written_once(store, rows(30))
+
+
+def test_spill_left_by_a_crash_is_replayed_at_start(spill_path):
+    # Half replayed when the process died, half never started
+    with open(spill_path + '.replay', 'w', encoding='utf-8') as replay:
+        replay.writelines(json.dumps(row) + '\n' for row in rows(10))
+    with open(spill_path, 'w', encoding='utf-8') as spill:
+        spill.writelines(json.dumps(row) + '\n' for row in rows(10, start=10))
+    store = Store()
+    ingest = IngestQueue(store.insert, spill_path, batch_size=4, flush_ms=10)
+    ingest.start()
+    ingest.submit(rows(5, start=20))
+    ingest.stop(5)
+    assert_written_once(store, rows(25))
+    assert not os.path.exists(spill_path) and not os.path.exists(spill_path + '.replay')
@@ -0,0 +1,64 @@
+# tests/test_migrations.py
+"""Schema migrations (utils.migrations) on a fresh database and the plans of the hot queries"""
+import json
+
+import pytest
+
+from utils.analysis_codes import FACTOR_CODE_BITS, FIRST_DYNAMIC_FACTOR
+from utils.connection import connect
+from utils.migrations import (
+    LATEST_VERSION, MIGRATIONS, ORDERED_SCAN_INDEXES, _uses_index, check_query_plans, current_version, migrate,
+    query_plan
+)
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = connect(str(tmp_path / 'bantai.db'))
+    yield conn
+    conn.close()
+
+
+def test_migrates_fresh_database_to_latest(conn):
+    assert migrate(conn) == LATEST_VERSION
+    # Re-running applies nothing
+    assert migrate(conn) == LATEST_VERSION
+
+
+def test_hot_queries_search_an_index(conn):
+    migrate(conn)
+    failures = check_query_plans(conn)
+    assert failures == [], "\n".join(f"{number}: {query.strip()}\n    {plan}" for number, query, plan in failures)
+
+
+def test_ordered_scans_are_limited(conn):
+    migrate(conn)
+    for number, _, _, checks in MIGRATIONS:
+        for query, params in checks:
+            if any(step.startswith('SCAN') for step in query_plan(conn, query, params)):
+                assert 'LIMIT' in query, f"migration {number} walks a whole index: {query.strip()}"
+
+
+def test_full_index_scan_is_rejected(conn):
+    migrate(conn)
+    plan = query_plan(conn, 'SELECT COUNT(*) FROM login_activities WHERE risk_percentage + 0 >= 70')
+    assert any(step.startswith('SCAN') for step in plan)
+    assert not _uses_index(plan)
+    assert not _uses_index(['SCAN login_activities'])
+    assert _uses_index([f'SCAN login_activities USING INDEX {ORDERED_SCAN_INDEXES[0]}'])
+
+
+def test_coded_analysis_fails_before_running_out_of_codes(conn):
+    migrate(conn, target=7)
+    too_many = (1 << FACTOR_CODE_BITS) - FIRST_DYNAMIC_FACTOR + 1
+    with conn:
+        conn.executemany(
+            'INSERT INTO login_activities (user_id, login_timestamp, analysis_factors, warnings) VALUES (?, ?, ?, ?)',
+            [('U_1', '2025-01-01 08:00:00', json.dumps([f"Decided by rule: rule_{i}"]), '[]')
+             for i in range(too_many)])
+
+    with pytest.raises(ValueError, match=f"{too_many} new factor texts"):
+        migrate(conn)
+    assert current_version(conn) == 7
+    assert conn.execute('SELECT COUNT(*) FROM login_activities WHERE analysis_factors IS NOT NULL').fetchone()[0] \
+        == too_many
@@ -0,0 +1,51 @@
+# tests/test_review_queue.py
+"""Claims, leases and guarded reviews of the review queue (utils.review_queue)"""
+import pytest
+
+from utils.connection import connect
+from utils.migrations import migrate
+from utils.review_queue import PENDING, claim_next, release_leases, review_logins
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = connect(str(tmp_path / 'bantai.db'))
+    migrate(conn)
+    with conn:
+        conn.executemany('INSERT INTO login_activities (user_id, login_ts, utc_offset, risk_percentage) '
+                         'VALUES (?, ?, 480, ?)',
+                         [(f'U_{i}', 1767225600000 + i * 60000, risk) for i, risk in enumerate([95, 80, 60, 40, 10])])
+    yield conn
+    conn.close()
+
+
+def admin_actions(conn):
+    return dict(conn.execute('SELECT id, admin_action FROM login_activities'))
+
+
+def test_claims_riskiest_first_and_never_twice(conn):
+    alice = claim_next(conn, 2, 'alice')
+    bob = claim_next(conn, 2, 'bob')
+    assert alice == [1, 2]
+    assert bob == [3, 4]
+
+
+def test_review_skips_other_admins_leases(conn):
+    alice = claim_next(conn, 2, 'alice')
+    bob = claim_next(conn, 1, 'bob')
+
+    assert review_logins(conn, alice + bob + [5], 'False Positive', 'alice', '2026-01-01 08:00:00') == ([1, 2, 5], bob)
+    # A decided login can be corrected, by anyone
+    assert review_logins(conn, [1, 5], 'True Positive - Blocked', 'bob', '2026-01-01 08:01:00') == ([1, 5], [])
+    assert admin_actions(conn) == {1: 'True Positive - Blocked', 2: 'False Positive', 3: PENDING, 4: PENDING,
+                                   5: 'True Positive - Blocked'}
+    assert conn.execute('SELECT reviewed_by FROM login_activities WHERE id = 1').fetchone()[0] == 'bob'
+    # Reviewing drops the lease
+    assert conn.execute('SELECT activity_id FROM review_leases').fetchall() == [(3,)]
+
+
+def test_released_logins_can_be_reviewed_by_anyone(conn):
+    bob = claim_next(conn, 1, 'bob')
+    assert review_logins(conn, bob, 'Confirmed Correct', 'alice', '2026-01-01 08:00:00') == ([], bob)
+    release_leases(conn, bob, 'bob')
+    assert review_logins(conn, bob, 'Confirmed Correct', 'alice', '2026-01-01 08:00:00') == (bob, [])
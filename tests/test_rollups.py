@@ -0,0 +1,63 @@
+# tests/test_rollups.py
+"""Trigger-maintained hourly and daily login rollups (utils.rollups) against a full recount"""
+import random
+
+import pytest
+
+from utils import database
+from utils.connection import close_thread_connection, connect
+from utils.migrations import migrate
+from utils.rollups import check_rollups, live_rollups
+
+PREDICTION = {
+    'risk_score': 0.45, 'risk_percentage': 45.0, 'classification': 'MEDIUM', 'action': 'ALLOW_WITH_OTP',
+    'recommendation': 'ALLOW with SMS OTP', 'analysis_factors': [], 'warnings': [],
+    'behavior_consistency': 85, 'location_context': 'Domestic location',
+}
+
+
+def random_row(rng):
+    risk_score = rng.random()
+    login_data = {'distance': rng.choice([5, 500, 12000]), 'is_attack_ip': int(rng.random() < 0.2),
+                  'login_successful': int(rng.random() > 0.2), 'latency': rng.randint(10, 3000)}
+    prediction = dict(PREDICTION, risk_score=risk_score, risk_percentage=risk_score * 100,
+                      warnings=database.generate_warnings(login_data, risk_score))
+    timestamp = f"2026-01-{rng.randint(1, 3):02d} {rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}:00"
+    return database.login_activity_row(f"U_{rng.randrange(20)}", timestamp, 'Philippines', 'Manila', 1.0,
+                                       login_data['distance'], 'mobile', login_data['latency'],
+                                       login_data['is_attack_ip'], login_data['login_successful'], prediction)
+
+
+@pytest.fixture
+def conn(tmp_path, monkeypatch):
+    path = str(tmp_path / 'bantai.db')
+    setup = connect(path)
+    migrate(setup)
+    setup.close()
+    monkeypatch.setattr(database, 'DATABASE_PATH', path)
+    yield database.get_connection()
+    close_thread_connection(path)
+
+
+def test_rollups_follow_inserts_updates_and_deletes(conn):
+    rng = random.Random(0)
+    database.insert_login_activities([random_row(rng) for _ in range(200)])
+    assert check_rollups(conn) == []
+    assert sum(bucket['attempts'] for bucket in live_rollups(conn, 'daily').values()) == 200
+
+    ids = [row[0] for row in conn.execute('SELECT id FROM login_activities')]
+    with conn:
+        # warning_mask: any combination of the five generate_warnings() flags
+        for activity_id in rng.sample(ids, 60):
+            conn.execute('UPDATE login_activities SET risk_percentage = ?, login_successful = ?, warning_mask = ? '
+                         'WHERE id = ?', (rng.uniform(0, 100), rng.randint(0, 1), rng.randrange(1 << 5), activity_id))
+        # Moves rows to another hour, and some to another day
+        conn.execute('UPDATE login_activities SET login_ts = login_ts + 5400000 WHERE id % 5 = 0')
+        conn.execute('UPDATE login_activities SET utc_offset = utc_offset - 600 WHERE id % 7 = 0')
+    assert check_rollups(conn) == []
+
+    with conn:
+        conn.execute('DELETE FROM login_activities WHERE id % 3 = 0')
+    assert check_rollups(conn) == []
+    assert sum(bucket['attempts'] for bucket in live_rollups(conn, 'hourly').values()) \
+        == conn.execute('SELECT COUNT(*) FROM login_activities').fetchone()[0]
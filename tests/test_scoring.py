@@ -0,0 +1,71 @@
+# tests/test_scoring.py
+"""Batch scoring (utils.scoring.score_logins_batch) against the single-row path"""
+import numpy as np
+import pandas as pd
+import pytest
+from sklearn.ensemble import RandomForestClassifier
+
+from utils import database, scoring
+from utils.connection import close_thread_connection, connect
+from utils.migrations import migrate
+from utils.rules import rules_enabled, set_rules_enabled
+
+LOCATIONS = [
+    ('Philippines', 'Manila'), ('Philippines', 'Cebu'), ('United Arab Emirates', 'Dubai'),
+    ('Singapore', 'Singapore'), ('Russia', 'Moscow'), ('Nigeria', 'Lagos'), ('Japan', 'Tokyo'),
+]
+
+
+def make_events(n, seed=0):
+    rng = np.random.default_rng(seed)
+    loc = rng.integers(0, len(LOCATIONS), n)
+    return pd.DataFrame({
+        'time_diff': rng.exponential(12, n).round(2),
+        'distance': rng.choice([5, 50, 500, 2400, 8500, 12000, 15000], n),
+        'device_type': rng.integers(0, 3, n),
+        'is_attack_ip': (rng.random(n) < 0.1).astype(int),
+        'login_successful': (rng.random(n) > 0.1).astype(int),
+        'latency': rng.integers(10, 3000, n),
+        'country': [LOCATIONS[i][0] for i in loc],
+        'city': [LOCATIONS[i][1] for i in loc],
+    })
+
+
+@pytest.fixture
+def model(tmp_path, monkeypatch):
+    """A small forest in place of the model file, and an empty database"""
+    path = str(tmp_path / 'bantai.db')
+    conn = connect(path)
+    migrate(conn)
+    conn.close()
+    monkeypatch.setattr(database, 'DATABASE_PATH', path)
+
+    events = make_events(2000, seed=3)
+    X = scoring.build_feature_matrix(events)
+    y = ((X[:, 1] > 2000) | (X[:, 3] == 1) | (X[:, 5] > 2500)).astype(int)
+    forest = RandomForestClassifier(n_estimators=10, max_depth=6, random_state=0).fit(X, y)
+    monkeypatch.setattr(scoring, 'get_scorer', lambda n_rows=1: forest)
+    monkeypatch.setattr(database, 'get_scorer', lambda n_rows=1: forest)
+    yield forest
+    close_thread_connection(path)
+
+
+@pytest.fixture(params=[False, True], ids=['model only', 'rules first'])
+def rules(request):
+    enabled = rules_enabled()
+    set_rules_enabled(request.param)
+    yield request.param
+    set_rules_enabled(enabled)
+
+
+def test_batch_equals_single_rows(model, rules):
+    events = make_events(300, seed=1)
+    batch = scoring.score_logins_batch(events)
+    assert len(batch) == len(events)
+    for i, event in enumerate(events.to_dict('records')):
+        single = database.get_full_model_prediction('U_1', event)
+        assert {key: batch.at[i, key] for key in single} == single, f"row {i}"
+
+
+def test_empty_batch(model):
+    assert scoring.score_logins_batch([]).empty
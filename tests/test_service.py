@@ -0,0 +1,45 @@
+# tests/test_service.py
+"""Micro-batching of the scoring service (utils.service.MicroBatcher)"""
+import asyncio
+import threading
+
+import pytest
+
+from utils.service import MicroBatcher
+
+
+def test_requests_are_batched():
+    async def run():
+        batcher = MicroBatcher(lambda items: [item * 2 for item in items], max_batch_size=8, max_wait_ms=20)
+        batcher.start()
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+        await batcher.stop()
+        return results, batcher.batches
+
+    results, batches = asyncio.run(run())
+    assert results == [0, 2, 4, 6, 8]
+    assert batches == 1
+
+
+def test_stop_fails_queued_and_in_flight_requests():
+    release = threading.Event()
+
+    def handler(items):
+        release.wait(5)
+        return items
+
+    async def run():
+        batcher = MicroBatcher(handler, max_batch_size=1, max_wait_ms=0)
+        batcher.start()
+        requests = [asyncio.ensure_future(batcher.submit(i)) for i in range(3)]
+        # The first request is with the handler, the others are queued
+        await asyncio.sleep(0.05)
+        await asyncio.wait_for(batcher.stop(), 1)
+        outcomes = await asyncio.wait_for(asyncio.gather(*requests, return_exceptions=True), 1)
+        with pytest.raises(RuntimeError):
+            await batcher.submit(3)
+        release.set()
+        return outcomes
+
+    outcomes = asyncio.run(run())
+    assert all(isinstance(outcome, RuntimeError) for outcome in outcomes)
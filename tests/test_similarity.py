@@ -0,0 +1,77 @@
+# tests/test_similarity.py
+"""Close matches for bulk decisions (utils.similarity.close_matches)"""
+import random
+
+import numpy as np
+import pytest
+
+from utils.connection import connect
+from utils.migrations import migrate
+from utils.review_queue import PENDING, claim_next
+from utils.similarity import MATCH_DISTANCE, close_matches, normalized_features
+
+BASE_TS = 1767225600000
+
+INSERT_SQL = '''
+    INSERT INTO login_activities (user_id, login_ts, utc_offset, city, device_type, time_diff_hrs, distance_km,
+                                  latency_ms, is_attack_ip, login_successful, risk_percentage, admin_action)
+    VALUES (?, ?, 480, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+'''
+
+
+@pytest.fixture
+def conn(tmp_path):
+    conn = connect(str(tmp_path / 'bantai.db'))
+    migrate(conn)
+    yield conn
+    conn.close()
+
+
+def insert(conn, user_id='U_1', city='Manila', device='mobile', features=(1.0, 5, 100, 0, 1), risk=50,
+           action=PENDING):
+    with conn:
+        return conn.execute(INSERT_SQL, (user_id, BASE_TS, city, device, *features, risk, action)).lastrowid
+
+
+def test_only_pending_logins_of_the_same_user_city_and_device(conn):
+    login = insert(conn)
+    match = insert(conn, features=(1.05, 5, 105, 0, 1))
+    insert(conn, features=(1.05, 5, 105, 0, 1), action='False Positive')
+    insert(conn, user_id='U_2')
+    insert(conn, city='Cebu')
+    insert(conn, device='desktop')
+    # Far off on latency, and a known attack IP
+    insert(conn, features=(1.0, 5, 2500, 0, 1))
+    insert(conn, features=(1.0, 5, 100, 1, 1))
+
+    assert [i for i, _ in close_matches(conn, login)] == [match]
+    assert close_matches(conn, match)[0][0] == login
+    assert close_matches(conn, 999) == []
+
+
+def test_other_admins_leases_are_left_out(conn):
+    login = insert(conn, risk=10)
+    bobs = insert(conn, features=(1.0, 5, 101, 0, 1), risk=95)
+    assert claim_next(conn, 1, 'bob') == [bobs]
+
+    assert close_matches(conn, login, admin='alice') == []
+    assert [i for i, _ in close_matches(conn, login, admin='bob')] == [bobs]
+
+
+def test_matches_equal_a_brute_force_search(conn):
+    rng = random.Random(0)
+    rows = [(rng.uniform(0, 4), rng.choice([5, 8, 20, 60]), rng.randint(80, 160), 0, 1) for _ in range(300)]
+    ids = [insert(conn, features=row, action=rng.choice([PENDING, PENDING, 'Confirmed Correct'])) for row in rows]
+    pending = {i for i, action in conn.execute('SELECT id, admin_action FROM login_activities') if action == PENDING}
+    vectors = normalized_features(*zip(*rows))
+
+    matched = 0
+    for index in rng.sample(range(len(ids)), 30):
+        distance = np.sqrt(((vectors - vectors[index]) ** 2).sum(axis=1))
+        expected = {ids[j] for j in np.flatnonzero(distance <= MATCH_DISTANCE)
+                    if j != index and ids[j] in pending}
+        found = close_matches(conn, ids[index])
+        assert {i for i, _ in found} == expected
+        matched += len(expected)
+        assert [d for _, d in found] == sorted(d for _, d in found)
+    assert matched > 30
@@ -0,0 +1,221 @@
+# utils/activities.py
+"""
+Paged login-activity listings with filters pushed down to SQL.
+
+query_login_activities selects only the requested columns, filters in the
+WHERE clause, orders on an indexed column and pages by keyset: each call
+returns at most `limit` rows plus a cursor, (sort value, id) of the last
+row, that the next call continues from. Cost depends on the page size, not
+on how many logins the table holds.
+
+Frames come back with compact dtypes (COLUMN_DTYPES): categoricals for the
+repeated strings, sized numbers, Arrow strings for the local time and Arrow
+list arrays for the analysis factors and warnings (see utils.analysis_codes).
+"""
+import pandas as pd
+
+from utils.analysis_codes import PARAMETER_COLUMNS, decode_factors, decode_warnings
+from utils.review_queue import PENDING
+from utils.timestamps import local_time_sql, timestamp_bound
+
+# Display name -> column, in the order the pages show them
+ACTIVITY_COLUMNS = {
+    '#': 'la.id',
+    'User ID': 'la.user_id',
+    'Login Timestamp (UTC+8)': local_time_sql('la'),
+    'Country': 'la.country',
+    'City': 'la.city',
+    'time_diff (hrs)': 'la.time_diff_hrs',
+    'distance (km)': 'la.distance_km',
+    'device_type': 'la.device_type',
+    'latency (ms)': 'la.latency_ms',
+    'login_successful': 'la.login_successful',
+    'is_attack_ip': 'la.is_attack_ip',
+    'risk_score': 'la.risk_score',
+    'Risk %': 'la.risk_percentage',
+    'Classification': 'la.risk_classification',
+    'AI Action': 'la.recommended_action',
+    'AI Recommendation': 'la.recommendation_text',
+    'Analysis Factors': 'la.factor_codes',
+    'Warnings': 'la.warning_mask',
+    'Behavior %': 'la.behavior_consistency',
+    'Location Context': 'la.location_context',
+    'Admin Action': 'la.admin_action',
+}
+
+# Stored coded, returned as lists of text (see utils.analysis_codes)
+CODED_COLUMNS = ('Analysis Factors', 'Warnings')
+
+# Sort key -> indexed column
+SORT_KEYS = {
+    'login_timestamp': 'la.login_ts',
+    'risk_percentage': 'la.risk_percentage',
+    'id': 'la.id',
+}
+
+# login_activities column -> dtype of the frames the read helpers return. Nullable ints
+# keep NULLs of rows written before a column existed; measurements and scores stay
+# float64 so thresholds and exports see the stored values exactly.
+COLUMN_DTYPES = {
+    'id': 'int64',
+    'user_id': 'category',
+    'login_timestamp': 'string[pyarrow]',
+    'utc_offset': 'Int16',
+    'country': 'category',
+    'city': 'category',
+    'time_diff_hrs': 'float64',
+    'distance_km': 'float64',
+    'device_type': 'category',
+    'latency_ms': 'float64',
+    'login_successful': 'Int8',
+    'is_attack_ip': 'Int8',
+    'risk_score': 'float64',
+    'risk_percentage': 'float64',
+    'risk_classification': 'category',
+    'recommended_action': 'category',
+    'recommendation_text': 'category',
+    'behavior_consistency': 'Int16',
+    'location_context': 'category',
+    'admin_action': 'category',
+    'reviewed_by': 'category',
+    'model_version': 'category',
+}
+
+REVIEW_STATUSES = ('pending', 'reviewed')
+
+DEFAULT_PAGE_SIZE = 50
+
+
+def source_column(name):
+    """ACTIVITY_COLUMNS display name -> login_activities column ('login_timestamp' for the local time)"""
+    column = ACTIVITY_COLUMNS[name]
+    return column.removeprefix('la.') if column.startswith('la.') else 'login_timestamp'
+
+
+def compact_dtypes(df, columns=None):
+    """Cast a frame's columns to COLUMN_DTYPES in place; columns maps frame column -> login_activities column"""
+    columns = columns or {name: name for name in df.columns}
+    for name, column in columns.items():
+        if name in df.columns and column in COLUMN_DTYPES:
+            df[name] = df[name].astype(COLUMN_DTYPES[column])
+    return df
+
+
+def _values(value):
+    return [value] if isinstance(value, str) else list(value)
+
+
+def _where(since=None, until=None, user_id=None, classification=None, action=None,
+           review_status=None, location_context=None, min_risk=None, ids=None, after_id=None):
+    """WHERE clauses and parameters for the listing filters"""
+    clauses, params = [], []
+    if since is not None:
+        bound, op = timestamp_bound(since)
+        clauses.append(f'la.login_ts {op} ?')
+        params.append(bound)
+    if until is not None:
+        bound, op = timestamp_bound(until, end=True)
+        clauses.append(f'la.login_ts {op} ?')
+        params.append(bound)
+    if user_id is not None:
+        clauses.append('la.user_id = ?')
+        params.append(user_id)
+    for column, value in (('la.risk_classification', classification), ('la.recommended_action', action)):
+        if value:
+            values = _values(value)
+            clauses.append(f'{column} IN ({", ".join("?" * len(values))})')
+            params.extend(values)
+    if review_status is not None:
+        if review_status not in REVIEW_STATUSES:
+            raise ValueError(f"review_status must be one of {REVIEW_STATUSES}, got {review_status!r}")
+        # The review queue migration left no NULL admin_action, so idx_login_admin_action applies
+        clauses.append(f"la.admin_action {'=' if review_status == 'pending' else '!='} ?")
+        params.append(PENDING)
+    if location_context:
+        clauses.append("la.location_context LIKE '%' || ? || '%'")
+        params.append(location_context)
+    if min_risk is not None:
+        clauses.append('la.risk_percentage >= ?')
+        params.append(min_risk)
+    if ids is not None:
+        ids = list(ids)
+        clauses.append(f'la.id IN ({", ".join("?" * len(ids))})')
+        params.extend(ids)
+    if after_id is not None:
+        clauses.append('la.id > ?')
+        params.append(after_id)
+    return clauses, params
+
+
+def query_login_activities(conn, columns=None, order_by='login_timestamp', descending=True,
+                           limit=DEFAULT_PAGE_SIZE, cursor=None, **filters):
+    """
+    One page of login activities -> (DataFrame, cursor for the next page or None).
+
+    columns: display names from ACTIVITY_COLUMNS (default all)
+    order_by: a SORT_KEYS key; ties are broken by id
+    limit: page size, None for every matching row
+    cursor: the cursor returned by the previous page
+    filters: since, until, user_id, classification, action, review_status, location_context,
+             min_risk, ids, after_id
+    """
+    columns = list(columns or ACTIVITY_COLUMNS)
+    unknown = [name for name in columns if name not in ACTIVITY_COLUMNS]
+    if unknown:
+        raise ValueError(f"Unknown activity columns: {unknown}")
+    if order_by not in SORT_KEYS:
+        raise ValueError(f"order_by must be one of {list(SORT_KEYS)}, got {order_by!r}")
+    sort_column = SORT_KEYS[order_by]
+
+    # The cursor needs the sort value and id of the last row even if they were not requested
+    selected = columns if '#' in columns else columns + ['#']
+    select = ', '.join(f'{ACTIVITY_COLUMNS[name]} AS "{name}"' for name in selected) + f', {sort_column} AS "_sort"'
+    if 'Analysis Factors' in columns:
+        # Values substituted into the factor templates
+        select += ''.join(f', la.{column} AS "_{column}"' for column in PARAMETER_COLUMNS)
+
+    clauses, params = _where(**filters)
+    if cursor is not None:
+        clauses.append(f'({sort_column}, la.id) {"<" if descending else ">"} (?, ?)')
+        params.extend(cursor)
+
+    direction = 'DESC' if descending else 'ASC'
+    query = f'SELECT {select} FROM login_activities la'
+    if clauses:
+        query += ' WHERE ' + ' AND '.join(clauses)
+    query += f' ORDER BY {sort_column} {direction}, la.id {direction}'
+    if limit is not None:
+        # One extra row tells whether another page follows
+        query += ' LIMIT ?'
+        params.append(limit + 1)
+
+    df = pd.read_sql_query(query, conn, params=params)
+
+    next_cursor = None
+    if limit is not None and len(df) > limit:
+        df = df.iloc[:limit].copy()
+        last = df.iloc[-1]
+        sort_value = last['_sort']
+        # Plain Python values so the cursor binds as a query parameter and fits in session state
+        next_cursor = (sort_value.item() if hasattr(sort_value, 'item') else sort_value, int(last['#']))
+
+    if 'Analysis Factors' in columns:
+        df['Analysis Factors'] = decode_factors(conn, df['Analysis Factors'],
+                                                *(df[f'_{column}'] for column in PARAMETER_COLUMNS))
+    if 'Warnings' in columns:
+        df['Warnings'] = decode_warnings(conn, df['Warnings'])
+
+    compact_dtypes(df, {name: source_column(name) for name in columns})
+    return df[columns], next_cursor
+
+
+def count_login_activities(conn, limit=None, **filters):
+    """Number of login activities matching the listing filters; stops counting at limit (None: count all)"""
+    clauses, params = _where(**filters)
+    query = 'SELECT 1 FROM login_activities la'
+    if clauses:
+        query += ' WHERE ' + ' AND '.join(clauses)
+    if limit is not None:
+        query += ' LIMIT ?'
+        params.append(limit)
+    return conn.execute(f'SELECT COUNT(*) FROM ({query})', params).fetchone()[0]
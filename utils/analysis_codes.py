@@ -0,0 +1,280 @@
+# utils/analysis_codes.py
+"""
+Coded storage for the analysis factors and warnings of each login.
+
+Instead of a JSON array of sentences per row, login_activities stores
+
+    factor_codes  - up to MAX_FACTORS factor codes packed FACTOR_CODE_BITS
+                    bits each, in order (0 ends the list)
+    warning_mask  - one bit per warning: a row keeps the set of its warnings,
+                    so duplicates collapse and they decode in bit order
+
+and the analysis_texts table holds the text for every code. The three
+parameterised factors ("Behavior consistency: 90%", "Location: ...",
+"Device type: ...") are stored as a template code; their value comes back
+from the row's behavior_consistency, location_context and device_type
+columns. Any text without a code yet (rule names, legacy rows) gets one the
+first time it is written.
+
+Decoding builds each distinct list once and broadcasts it back to the rows
+as an Arrow list array of dictionary-encoded texts: a row costs its list
+offset and a 4-byte index per item instead of a Python list.
+"""
+import numpy as np
+import pandas as pd
+import pyarrow as pa
+
+FACTOR_CODE_BITS = 8
+MAX_FACTORS = 7
+MAX_WARNING_BITS = 62
+
+# (code, text, parameter column) - codes are part of the stored data, never renumber
+FIXED_FACTORS = [
+    (1, "Behavior consistency: {}%", 'behavior_consistency'),
+    (2, "Location: {}", 'location_context'),
+    (3, "Device type: {}", 'device_type'),
+    (4, "Travel is plausible (Same location or local area)", None),
+    (5, "Travel is plausible (Domestic travel)", None),
+    (6, "Long-distance travel detected", None),
+    (7, "Model not loaded - using fallback prediction", None),
+    (8, "Model prediction error - using fallback", None),
+    (9, "Manual verification recommended", None),
+]
+
+# Factor texts first seen at runtime are numbered from here
+FIRST_DYNAMIC_FACTOR = 32
+
+# Bit position = index; the first five follow generate_warnings()
+WARNING_TEXTS = [
+    "⚠ Known attack IP",
+    "⚠ Failed login attempt",
+    "⚠ Abnormal latency",
+    "⚠ Impossible travel distance",
+    "⚠ High risk score",
+    "⚠ Model unavailable",
+    "⚠ Model prediction failed",
+]
+
+PARAMETER_COLUMNS = ('behavior_consistency', 'location_context', 'device_type')
+
+CREATE_ANALYSIS_TEXTS_SQL = '''
+    CREATE TABLE IF NOT EXISTS analysis_texts (
+        kind VARCHAR(10) NOT NULL,  -- 'factor' or 'warning'
+        code INTEGER NOT NULL,  -- factor code, or warning bit position
+        text TEXT NOT NULL,
+        param_column VARCHAR(50),  -- column substituted into a factor template
+        PRIMARY KEY (kind, code),
+        UNIQUE (kind, text)
+    )
+'''
+
+# Database file -> loaded dictionary
+_dictionaries = {}
+
+
+def create_analysis_texts(conn):
+    """Dictionary table with the fixed codes (used by the schema migration)"""
+    conn.execute(CREATE_ANALYSIS_TEXTS_SQL)
+    conn.executemany('INSERT OR IGNORE INTO analysis_texts (kind, code, text, param_column) VALUES (?, ?, ?, ?)',
+                     [('factor', code, text, column) for code, text, column in FIXED_FACTORS]
+                     + [('warning', bit, text, None) for bit, text in enumerate(WARNING_TEXTS)])
+
+
+def _param_text(value):
+    """Parameter as it appears in factor text (integral floats read back from pandas lose their .0)"""
+    if isinstance(value, (float, np.floating)) and float(value).is_integer():
+        return str(int(value))
+    return str(value)
+
+
+def _database_key(conn):
+    return conn.execute('PRAGMA database_list').fetchone()[2]
+
+
+def _load_dictionary(conn):
+    dictionary = {'factor': {}, 'factor_text': {}, 'templates': [], 'warning': {}, 'warning_text': {}}
+    for kind, code, text, column in conn.execute('SELECT kind, code, text, param_column FROM analysis_texts'):
+        if kind == 'warning':
+            dictionary['warning'][text] = code
+            dictionary['warning_text'][code] = text
+            continue
+        dictionary['factor_text'][code] = (text, column)
+        if column is None:
+            dictionary['factor'][text] = code
+        else:
+            prefix, suffix = text.split('{}')
+            dictionary['templates'].append((code, prefix, suffix, PARAMETER_COLUMNS.index(column)))
+    _dictionaries[_database_key(conn)] = dictionary
+    return dictionary
+
+
+def _dictionary(conn):
+    return _dictionaries.get(_database_key(conn)) or _load_dictionary(conn)
+
+
+def _code_range(kind):
+    """(first, last) code handed out to new texts of kind"""
+    if kind == 'factor':
+        return FIRST_DYNAMIC_FACTOR, (1 << FACTOR_CODE_BITS) - 1
+    return len(WARNING_TEXTS), MAX_WARNING_BITS
+
+
+def _free_codes(conn, kind):
+    first, last = _code_range(kind)
+    highest = conn.execute('SELECT MAX(code) FROM analysis_texts WHERE kind = ? AND code >= ?',
+                           (kind, first)).fetchone()[0]
+    return last - (first - 1 if highest is None else highest)
+
+
+def _register(conn, kind, texts):
+    """Give new texts the next free codes; commits unless the caller has a transaction open"""
+    first, last = _code_range(kind)
+    # MAX(code) + 1 must not be read by two writers at once: take the write lock first
+    in_transaction = conn.in_transaction
+    if not in_transaction:
+        conn.execute('BEGIN IMMEDIATE')
+    try:
+        for text in texts:
+            if conn.execute('SELECT 1 FROM analysis_texts WHERE kind = ? AND text = ?', (kind, text)).fetchone():
+                continue
+            code = conn.execute('SELECT COALESCE(MAX(code) + 1, ?) FROM analysis_texts WHERE kind = ? AND code >= ?',
+                                (first, kind, first)).fetchone()[0]
+            if code > last:
+                raise ValueError(f"No {kind} codes left for {text!r}")
+            conn.execute('INSERT INTO analysis_texts (kind, code, text) VALUES (?, ?, ?)', (kind, code, text))
+        if not in_transaction:
+            conn.commit()
+    except Exception:
+        if not in_transaction:
+            conn.rollback()
+        raise
+    return _load_dictionary(conn)
+
+
+def check_code_space(conn, factor_texts, warning_texts):
+    """Raise ValueError unless every text without a code yet can still get one"""
+    for kind, texts in (('factor', factor_texts), ('warning', warning_texts)):
+        free = _free_codes(conn, kind)
+        if len(texts) > free:
+            raise ValueError(f"{len(texts):,} new {kind} texts but only {free} {kind} codes left "
+                             f"(e.g. {sorted(texts)[:3]!r})")
+
+
+def _factor_code(dictionary, text, params):
+    code = dictionary['factor'].get(text)
+    if code is not None:
+        return code
+    for code, prefix, suffix, param in dictionary['templates']:
+        if text.startswith(prefix) and text.endswith(suffix) \
+                and text[len(prefix):len(text) - len(suffix)] == _param_text(params[param]):
+            return code
+    return None
+
+
+def unknown_texts(conn, factor_lists, warning_lists, consistency, location_context, device_type):
+    """Factor and warning texts encode_analysis would have to register -> (factor set, warning set)"""
+    dictionary = _dictionary(conn)
+    factors, warnings, seen = set(), set(), set()
+    for factor_list, warning_list, *params in zip(factor_lists, warning_lists, consistency, location_context,
+                                                  device_type):
+        key = (tuple(factor_list or ()), *params)
+        if key not in seen:
+            seen.add(key)
+            factors.update(text for text in key[0] if _factor_code(dictionary, text, params) is None)
+        warnings.update(text for text in warning_list or () if text not in dictionary['warning'])
+    return factors, warnings
+
+
+def encode_analysis(conn, factor_lists, warning_lists, consistency, location_context, device_type):
+    """Lists of factor/warning texts per row -> (factor_codes, warning_masks)
+
+    A warning mask holds the set of a row's warnings; they decode once each, in bit order.
+    """
+    dictionary = _dictionary(conn)
+    factor_cache, warning_cache = {}, {}
+    factor_codes, warning_masks = [], []
+
+    for factors, warnings, *params in zip(factor_lists, warning_lists, consistency, location_context, device_type):
+        factors = tuple(factors or ())
+        if len(factors) > MAX_FACTORS:
+            raise ValueError(f"At most {MAX_FACTORS} analysis factors can be stored, got {len(factors)}")
+        key = (factors, *params)
+        packed = factor_cache.get(key)
+        if packed is None:
+            codes = [_factor_code(dictionary, text, params) for text in factors]
+            if None in codes:
+                dictionary = _register(conn, 'factor', [text for text, code in zip(factors, codes) if code is None])
+                codes = [_factor_code(dictionary, text, params) for text in factors]
+            packed = factor_cache[key] = sum(code << (FACTOR_CODE_BITS * i) for i, code in enumerate(codes))
+        factor_codes.append(packed)
+
+        warnings = tuple(warnings or ())
+        mask = warning_cache.get(warnings)
+        if mask is None:
+            unknown = [text for text in warnings if text not in dictionary['warning']]
+            if unknown:
+                dictionary = _register(conn, 'warning', unknown)
+            mask = warning_cache[warnings] = sum(1 << dictionary['warning'][text] for text in set(warnings))
+        warning_masks.append(mask)
+
+    return factor_codes, warning_masks
+
+
+def _factor_list(dictionary, packed, params):
+    factors = []
+    while packed:
+        text, column = dictionary['factor_text'][packed & ((1 << FACTOR_CODE_BITS) - 1)]
+        factors.append(text if column is None else text.format(_param_text(params[PARAMETER_COLUMNS.index(column)])))
+        packed >>= FACTOR_CODE_BITS
+    return factors
+
+
+def _list_array(lists, inverse):
+    """Distinct text lists and each row's index into them (-1: empty) -> Arrow list<dictionary<int32, string>> array"""
+    texts, codes = {}, []
+    for text_list in lists:
+        codes.append([texts.setdefault(text, len(texts)) for text in text_list])
+    codes.append([])
+    rows = pa.array(codes, type=pa.list_(pa.int32())).take(pa.array(np.where(inverse < 0, len(lists), inverse)))
+    values = pa.DictionaryArray.from_arrays(rows.values, pa.array(list(texts), type=pa.string()))
+    return pd.arrays.ArrowExtensionArray(pa.ListArray.from_arrays(rows.offsets, values))
+
+
+def decode_factors(conn, factor_codes, consistency, location_context, device_type):
+    """Packed factor codes (plus the parameter columns) -> Arrow array of factor lists"""
+    if len(factor_codes) == 0:
+        return _list_array([], np.empty(0, dtype=np.intp))
+    keys = pd.MultiIndex.from_arrays([
+        pd.Series(factor_codes).fillna(0).astype(np.int64), pd.Series(consistency),
+        pd.Series(location_context), pd.Series(device_type)])
+    inverse, unique_keys = pd.factorize(keys)
+
+    dictionary = _dictionary(conn)
+    lists = []
+    for packed, *params in unique_keys:
+        try:
+            lists.append(_factor_list(dictionary, packed, params))
+        except KeyError:
+            # Written by another process since the dictionary was loaded
+            dictionary = _load_dictionary(conn)
+            lists.append(_factor_list(dictionary, packed, params))
+    return _list_array(lists, inverse)
+
+
+def _warning_list(dictionary, mask):
+    return [dictionary['warning_text'][bit] for bit in range(mask.bit_length()) if mask >> bit & 1]
+
+
+def decode_warnings(conn, warning_masks):
+    """Warning bitmasks -> Arrow array of warning lists"""
+    inverse, unique_masks = pd.factorize(pd.Series(warning_masks).fillna(0).astype(np.int64))
+
+    dictionary = _dictionary(conn)
+    lists = []
+    for mask in unique_masks:
+        try:
+            lists.append(_warning_list(dictionary, int(mask)))
+        except KeyError:
+            dictionary = _load_dictionary(conn)
+            lists.append(_warning_list(dictionary, int(mask)))
+    return _list_array(lists, inverse)
@@ -0,0 +1,258 @@
+# utils/archive.py
+"""
+Monthly Parquet archive of cold login history.
+
+    python -m utils.archive [--database bantai_security.db] [--older-than-days 365] [--status]
+
+moves login_activities rows whose login is older than the horizon
+(BANTAI_ARCHIVE_AFTER_DAYS, default 365) into
+
+    <archive dir>/month=YYYY-MM/part-<first id>-<last id>.parquet
+
+zstd-compressed and sorted by user_id and login_ts, so row-group statistics
+let a scan skip row groups that cannot match a user or time filter. Each
+batch's files are written and fsynced before the transaction that records
+them in archive_files and deletes their rows commits; a file without a
+record (a crash in between) is removed by the next run. The archive lives in
+BANTAI_ARCHIVE_DIR, default <database name>_archive next to the database.
+
+read_archive() and read_login_history() read it back: months are picked
+from archive_files, the date and user filters are pushed down into the
+Parquet scan, and only the requested columns are read.
+
+The dashboard counters and rollups describe the rows still in SQLite;
+archiving takes rows out of them like any other delete.
+"""
+import argparse
+import functools
+import operator
+import os
+from datetime import datetime
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.dataset as ds
+import pyarrow.parquet as pq
+
+from utils.activities import ACTIVITY_COLUMNS, compact_dtypes, query_login_activities, source_column
+from utils.analysis_codes import PARAMETER_COLUMNS, decode_factors, decode_warnings
+from utils.timestamps import DAY_MS, TIMESTAMP_FORMAT, local_datetimes, now_ms, timestamp_bound
+
+ARCHIVE_AFTER_DAYS = int(os.environ.get('BANTAI_ARCHIVE_AFTER_DAYS', '365'))
+BATCH_SIZE = 50000
+ROW_GROUP_SIZE = 10000
+
+# Every login_activities column, as typed in the Parquet files. distance_km and latency_ms are
+# float64: the scoring API accepts fractions and SQLite keeps them in the INTEGER columns.
+ARCHIVE_SCHEMA = pa.schema([
+    ('id', pa.int64()),
+    ('user_id', pa.string()),
+    ('login_ts', pa.int64()),
+    ('utc_offset', pa.int16()),
+    ('country', pa.string()),
+    ('city', pa.string()),
+    ('time_diff_hrs', pa.float64()),
+    ('distance_km', pa.float64()),
+    ('device_type', pa.string()),
+    ('latency_ms', pa.float64()),
+    ('login_successful', pa.int8()),
+    ('is_attack_ip', pa.int8()),
+    ('risk_score', pa.float64()),
+    ('risk_percentage', pa.float64()),
+    ('risk_classification', pa.string()),
+    ('recommended_action', pa.string()),
+    ('recommendation_text', pa.string()),
+    ('factor_codes', pa.int64()),
+    ('warning_mask', pa.int64()),
+    ('behavior_consistency', pa.int16()),
+    ('location_context', pa.string()),
+    ('admin_action', pa.string()),
+    ('reviewed_at', pa.string()),
+    ('reviewed_by', pa.string()),
+    ('model_version', pa.string()),
+])
+
+ARCHIVE_COLUMNS = ARCHIVE_SCHEMA.names
+
+CREATE_ARCHIVE_FILES_SQL = '''
+    CREATE TABLE IF NOT EXISTS archive_files (
+        path TEXT PRIMARY KEY,  -- relative to the archive directory
+        month VARCHAR(7) NOT NULL,
+        first_id INTEGER NOT NULL,
+        last_id INTEGER NOT NULL,
+        row_count INTEGER NOT NULL,
+        min_login_ts INTEGER NOT NULL,
+        max_login_ts INTEGER NOT NULL,
+        archived_at TIMESTAMP NOT NULL
+    )
+'''
+
+
+def archive_dir(database_path):
+    return os.environ.get('BANTAI_ARCHIVE_DIR') or os.path.splitext(database_path)[0] + '_archive'
+
+
+def _write_file(table, path):
+    """Write, fsync, then move into place so a partial file never has the final name"""
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    partial = path + '.tmp'
+    pq.write_table(table, partial, compression='zstd', row_group_size=ROW_GROUP_SIZE)
+    with open(partial, 'rb') as f:
+        os.fsync(f.fileno())
+    os.replace(partial, path)
+
+
+def remove_orphans(conn, directory):
+    """Delete files archive_files does not list (left by an interrupted run) -> number removed"""
+    known = {row[0] for row in conn.execute('SELECT path FROM archive_files')}
+    removed = 0
+    for root, _, names in os.walk(directory):
+        for name in names:
+            path = os.path.relpath(os.path.join(root, name), directory)
+            if name.endswith(('.parquet', '.tmp')) and path not in known:
+                os.remove(os.path.join(directory, path))
+                removed += 1
+    return removed
+
+
+def archive_logins(conn, directory, older_than_days=ARCHIVE_AFTER_DAYS, batch_size=BATCH_SIZE):
+    """Move rows logged before the horizon to Parquet, one batch per transaction -> rows archived"""
+    cutoff = now_ms() - older_than_days * DAY_MS
+    if remove_orphans(conn, directory):
+        print("⚠ Removed archive files left by an interrupted run")
+
+    select = (f'SELECT {", ".join(ARCHIVE_COLUMNS)} FROM login_activities '
+              'WHERE login_ts < ? ORDER BY login_ts, id LIMIT ?')
+    archived = 0
+    while True:
+        rows = conn.execute(select, (cutoff, batch_size)).fetchall()
+        if not rows:
+            break
+        values = list(zip(*rows))
+        batch = pa.Table.from_arrays([pa.array(column, type=field.type) for column, field in zip(values, ARCHIVE_SCHEMA)],
+                                     schema=ARCHIVE_SCHEMA)
+        months = local_datetimes(batch['login_ts'].to_numpy(), batch['utc_offset'].to_numpy()).dt.strftime('%Y-%m')
+
+        records = []
+        archived_at = datetime.now().strftime(TIMESTAMP_FORMAT)
+        for month in sorted(months.unique()):
+            part = batch.filter(pa.array(months == month)).sort_by([('user_id', 'ascending'), ('login_ts', 'ascending')])
+            ids, login_ts = part['id'].to_numpy(), part['login_ts'].to_numpy()
+            path = os.path.join(f'month={month}', f'part-{ids.min()}-{ids.max()}.parquet')
+            _write_file(part, os.path.join(directory, path))
+            records.append((path, month, int(ids.min()), int(ids.max()), part.num_rows,
+                            int(login_ts.min()), int(login_ts.max()), archived_at))
+
+        with conn:
+            conn.executemany('INSERT INTO archive_files (path, month, first_id, last_id, row_count, min_login_ts, '
+                             'max_login_ts, archived_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', records)
+            conn.executemany('DELETE FROM login_activities WHERE id = ?', [(row_id,) for row_id in values[0]])
+        archived += len(rows)
+        print(f"   ... {archived:,} rows archived")
+    return archived
+
+
+def read_archive(conn, directory, columns=None, since=None, until=None, user_id=None):
+    """Archived rows matching the filters -> DataFrame of login_activities columns"""
+    columns = list(columns or ARCHIVE_COLUMNS)
+    clauses, params, filters = [], [], []
+    if since is not None:
+        bound, _ = timestamp_bound(since)
+        clauses.append('max_login_ts >= ?')
+        params.append(bound)
+        filters.append(ds.field('login_ts') >= bound)
+    if until is not None:
+        bound, op = timestamp_bound(until, end=True)
+        clauses.append(f'min_login_ts {op} ?')
+        params.append(bound)
+        filters.append(ds.field('login_ts') < bound if op == '<' else ds.field('login_ts') <= bound)
+    if user_id is not None:
+        filters.append(ds.field('user_id') == user_id)
+
+    query = 'SELECT path FROM archive_files'
+    if clauses:
+        query += ' WHERE ' + ' AND '.join(clauses)
+    paths = [os.path.join(directory, row[0]) for row in conn.execute(query + ' ORDER BY min_login_ts', params)]
+    if not paths:
+        return ARCHIVE_SCHEMA.empty_table().select(columns).to_pandas()
+
+    dataset = ds.dataset(paths, schema=ARCHIVE_SCHEMA, format='parquet')
+    expression = functools.reduce(operator.and_, filters) if filters else None
+    return dataset.to_table(columns=columns, filter=expression).to_pandas()
+
+
+def _display_frame(conn, raw, columns):
+    """Archived rows -> the display columns query_login_activities returns"""
+    df = pd.DataFrame(index=raw.index)
+    for name in columns:
+        column = source_column(name)
+        if column == 'factor_codes':
+            df[name] = decode_factors(conn, raw['factor_codes'], *(raw[param] for param in PARAMETER_COLUMNS))
+        elif column == 'warning_mask':
+            df[name] = decode_warnings(conn, raw['warning_mask'])
+        elif column == 'login_timestamp':
+            df[name] = local_datetimes(raw['login_ts'], raw['utc_offset']).dt.strftime(TIMESTAMP_FORMAT)
+        else:
+            df[name] = raw[column]
+    return df
+
+
+def read_login_history(conn, directory, columns=None, since=None, until=None, user_id=None):
+    """Login activities still in SQLite followed by archived ones, newest first, as query_login_activities returns them"""
+    columns = list(columns or ACTIVITY_COLUMNS)
+    hot, _ = query_login_activities(conn, columns, limit=None, since=since, until=until, user_id=user_id)
+
+    sources = {name: source_column(name) for name in columns}
+    needed = {'id', 'login_ts', 'utc_offset', *sources.values()}
+    if 'factor_codes' in needed:
+        needed.update(PARAMETER_COLUMNS)
+    raw = read_archive(conn, directory, [column for column in ARCHIVE_COLUMNS if column in needed],
+                       since, until, user_id)
+    if raw.empty:
+        return hot
+    raw = raw.sort_values(['login_ts', 'id'], ascending=False, ignore_index=True)
+    df = _display_frame(conn, raw, columns)
+    if len(hot):
+        # The two parts have different categories, so the concatenation is cast again
+        df = pd.concat([hot, df], ignore_index=True)
+    return compact_dtypes(df, sources)
+
+
+def archive_status(conn):
+    """Rows and files per archived month -> DataFrame"""
+    return pd.read_sql_query('''
+        SELECT month, COUNT(*) AS files, SUM(row_count) AS rows, MAX(archived_at) AS last_archived
+        FROM archive_files GROUP BY month ORDER BY month
+    ''', conn)
+
+
+def main():
+    from utils import database
+
+    parser = argparse.ArgumentParser(description="Move old login history to monthly Parquet files")
+    parser.add_argument('--database', default=database.DATABASE_PATH)
+    parser.add_argument('--archive-dir', help="default BANTAI_ARCHIVE_DIR or <database name>_archive")
+    parser.add_argument('--older-than-days', type=int, default=ARCHIVE_AFTER_DAYS)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--status', action='store_true', help="list the archived months and exit")
+    args = parser.parse_args()
+
+    database.DATABASE_PATH = args.database
+    conn = database.get_connection()
+    directory = args.archive_dir or archive_dir(args.database)
+
+    if not args.status:
+        print(f"📦 Archiving logins older than {args.older_than_days} days to {directory}")
+        archived = archive_logins(conn, directory, args.older_than_days, args.batch_size)
+        print(f"✅ Archived {archived:,} rows" + (" (run python -m utils.migrations --vacuum to shrink the file)"
+                                                  if archived else ""))
+
+    status = archive_status(conn)
+    if status.empty:
+        print("Archive is empty")
+    else:
+        print(status.to_string(index=False))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,215 @@
+# utils/cache.py
+"""
+Shared, write-invalidated result cache for the database read helpers.
+
+    @cached(lambda: DATABASE_PATH, tags=lambda user_id: (f'user:{user_id}',))
+    def get_user_stats(user_id): ...
+
+Streamlit reruns the page script on every widget change, in every session.
+Results are kept once per process, so all sessions share them. The key is
+the helper, its arguments, the database file and the data version of each
+tag the helper depends on (default: 'login_activities'). After a write
+commits, utils.database calls bump_data_version() with the tags the write
+touched: 'login_activities' plus the 'user:<id>' of every user whose logins
+changed. The entries depending on those tags are dropped at once, so the
+next read sees the write. A review of one user's login leaves every other
+user's profile cached.
+
+Entries expire after BANTAI_CACHE_TTL_SECONDS (default 60). That bounds
+staleness when another process (the scoring API, the archive or rescore
+jobs) writes. The least recently used entries go once there are more than
+BANTAI_CACHE_MAX_ENTRIES (default 256) or BANTAI_CACHE_MAX_MB (default 256)
+of results. Concurrent misses for one key run the query once.
+
+Callers get copies of cached DataFrames, so changing a result never changes
+what the next session sees. BANTAI_CACHE=0 turns caching off.
+"""
+import functools
+import os
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+import pandas as pd
+
+from utils.metrics import increment, set_gauge
+
+TTL_SECONDS = float(os.environ.get('BANTAI_CACHE_TTL_SECONDS', '60'))
+MAX_ENTRIES = int(os.environ.get('BANTAI_CACHE_MAX_ENTRIES', '256'))
+MAX_BYTES = int(float(os.environ.get('BANTAI_CACHE_MAX_MB', '256')) * 2**20)
+
+DEFAULT_TAGS = ('login_activities',)
+
+_enabled = os.environ.get('BANTAI_CACHE', '1') != '0'
+_lock = threading.Lock()
+_entries = OrderedDict()  # (helper, database, args, kwargs, versions) -> (value, bytes, expires at, tags)
+_bytes = 0
+_versions = {}  # (database, tag) -> data version; (database, None) is bumped by writes of unknown scope
+_loading = {}  # key -> lock held by the thread running the query
+_MISSING = object()
+
+
+def cache_enabled():
+    return _enabled
+
+
+def set_cache_enabled(enabled):
+    global _enabled
+    _enabled = bool(enabled)
+    if not _enabled:
+        clear_cache()
+
+
+def data_version(database, tags=DEFAULT_TAGS):
+    """Versions of the tags (and of unscoped writes) a cached result depends on"""
+    return (_versions.get((database, None), 0),) + tuple(_versions.get((database, tag), 0) for tag in tags)
+
+
+def bump_data_version(database, tags=None):
+    """Record a committed write to database and drop the results depending on its tags (None: every result)"""
+    tags = None if tags is None else set(tags)
+    with _lock:
+        for tag in [None] if tags is None else tags:
+            _versions[(database, tag)] = _versions.get((database, tag), 0) + 1
+        for key, entry in list(_entries.items()):
+            if key[1] == database and (tags is None or tags.intersection(entry[3])):
+                _discard(key)
+        _update_gauges()
+    increment('cache_invalidations')
+
+
+def clear_cache():
+    with _lock:
+        for key in list(_entries):
+            _discard(key)
+        _update_gauges()
+
+
+def _discard(key):
+    global _bytes
+    _bytes -= _entries.pop(key)[1]
+
+
+def _update_gauges():
+    set_gauge('cache_entries', len(_entries))
+    set_gauge('cache_bytes', _bytes)
+
+
+def _size(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True))
+    if isinstance(value, (tuple, list)):
+        return sys.getsizeof(value) + sum(_size(item) for item in value)
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_size(item) for item in value.values())
+    return sys.getsizeof(value)
+
+
+def _copy(value):
+    """What a caller gets: frames are copied, Arrow buffers are shared (they are immutable)"""
+    if isinstance(value, (pd.DataFrame, pd.Series)):
+        return value.copy()
+    if isinstance(value, tuple):
+        return tuple(_copy(item) for item in value)
+    if isinstance(value, list):
+        return [_copy(item) for item in value]
+    if isinstance(value, dict):
+        return {name: _copy(item) for name, item in value.items()}
+    return value
+
+
+def _freeze(value):
+    """Hashable stand-in for an argument (lists -> tuples, dicts -> sorted items)"""
+    if isinstance(value, (list, tuple)):
+        return tuple(_freeze(item) for item in value)
+    if isinstance(value, dict):
+        return tuple(sorted((name, _freeze(item)) for name, item in value.items()))
+    if isinstance(value, set):
+        return frozenset(value)
+    return value
+
+
+def _get(key):
+    with _lock:
+        entry = _entries.get(key)
+        if entry is None:
+            return _MISSING
+        if entry[2] < time.monotonic():
+            _discard(key)
+            return _MISSING
+        _entries.move_to_end(key)
+        return entry[0]
+
+
+def _put(key, tags, value):
+    global _bytes
+    size = _size(value)
+    if size > MAX_BYTES:
+        return
+    with _lock:
+        if key[-1] != data_version(key[1], tags):
+            # A write committed while the query ran
+            return
+        if key in _entries:
+            _discard(key)
+        _entries[key] = (value, size, time.monotonic() + TTL_SECONDS, tags)
+        _bytes += size
+        while len(_entries) > MAX_ENTRIES or _bytes > MAX_BYTES:
+            _discard(next(iter(_entries)))
+            increment('cache_evictions')
+        _update_gauges()
+
+
+def cached(database, tags=None):
+    """
+    Decorator caching a read helper's results.
+
+    database: () -> the database file the helper reads
+    tags: (*args, **kwargs) -> the tags its result depends on (default DEFAULT_TAGS)
+    """
+    def decorate(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if not _enabled:
+                return func(*args, **kwargs)
+            path = database()
+            depends_on = tuple(tags(*args, **kwargs)) if tags else DEFAULT_TAGS
+            key = (func.__qualname__, path, _freeze(args), _freeze(kwargs), data_version(path, depends_on))
+            try:
+                hash(key)
+            except TypeError:
+                return func(*args, **kwargs)
+
+            value = _get(key)
+            if value is _MISSING:
+                with _lock:
+                    loading = _loading.setdefault(key, threading.Lock())
+                try:
+                    with loading:
+                        value = _get(key)
+                        if value is _MISSING:
+                            increment('cache_misses')
+                            value = func(*args, **kwargs)
+                            _put(key, depends_on, value)
+                        else:
+                            increment('cache_hits')
+                finally:
+                    # Also when func raised, or failing keys would pile up
+                    with _lock:
+                        _loading.pop(key, None)
+            else:
+                increment('cache_hits')
+            return _copy(value)
+
+        wrapper.uncached = func
+        return wrapper
+    return decorate
+
+
+def cache_stats():
+    """Number and size of the cached results"""
+    with _lock:
+        return {'enabled': _enabled, 'entries': len(_entries), 'bytes': _bytes}
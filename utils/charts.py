@@ -2,13 +2,34 @@
 import streamlit as st
 import altair as alt
 import pandas as pd
+from datetime import datetime, timedelta
 
-def login_attempts_vs_flags_chart():
-    """Create the line chart matching the Figma design"""
+from utils.database import get_login_rollup
+from utils.rollups import WARNING_COLUMNS
+
+# Window label -> (rollup granularity, length)
+CHART_WINDOWS = {
+    'Last 24 hours': ('hourly', timedelta(hours=24)),
+    'Last 7 days': ('daily', timedelta(days=7)),
+    'Last 30 days': ('daily', timedelta(days=30)),
+}
+
+DEFAULT_WINDOW = 'Last 24 hours'
+
+def window_rollup(window):
+    """Rollup rows covering a CHART_WINDOWS window, ending now"""
+    granularity, length = CHART_WINDOWS[window]
+    # Whole minutes, so reruns within a minute reuse the cached rollup
+    now = datetime.now().replace(second=0, microsecond=0)
+    return get_login_rollup(granularity, now - length, now)
+
+def login_attempts_vs_flags_chart(window=DEFAULT_WINDOW, rollup=None):
+    """Create the line chart matching the Figma design (rollup: window_rollup(window) read earlier)"""
+    rollup = window_rollup(window) if rollup is None else rollup
     df = pd.DataFrame({
-        'Time': list(range(10)),
-        'Login_Attempts': [0, 100, 90, 50, 80, 100, 10, 75, 50, 100],
-        'High_Risk_Flags': [0, 25, 10, 75, 25, 0, 25, 50, 25, 75]
+        'Time': rollup.index,
+        'Login_Attempts': rollup['attempts'].to_numpy(),
+        'High_Risk_Flags': rollup['high_risk'].to_numpy()
     })
     
     # Melt the dataframe for proper visualization
@@ -19,10 +40,9 @@ def login_attempts_vs_flags_chart():
         strokeWidth=2,
         point=True
     ).encode(
-        x=alt.X('Time:O', 
+        x=alt.X('Time:T',
                 axis=alt.Axis(title='', grid=True, gridColor='#f0f0f0', labelFontSize=12)),
         y=alt.Y('Count:Q', 
-                scale=alt.Scale(domain=[0, 100]),
                 axis=alt.Axis(title='', grid=True, gridColor='#f0f0f0', labelFontSize=12)),
         color=alt.Color(
             'Type:N',
@@ -47,15 +67,16 @@ def login_attempts_vs_flags_chart():
     # Use container width but with better sizing
     st.altair_chart(chart, use_container_width=True, theme=None)
 
-def top_risk_reasons_chart():
-    """Create the bar chart matching the Figma design"""
+def top_risk_reasons_chart(window=DEFAULT_WINDOW, rollup=None):
+    """Create the bar chart matching the Figma design (rollup: window_rollup(window) read earlier)"""
+    totals = (window_rollup(window) if rollup is None else rollup).sum()
     df = pd.DataFrame({
-        'Reason': ['Impossible Travel', 'Attack IP', 'Unusual Device', 'Failed OTP'],
-        'Count': [400, 500, 250, 950]
+        'Reason': list(WARNING_COLUMNS),
+        'Count': [int(totals[column]) for column in WARNING_COLUMNS.values()]
     })
     
     # Define colors for each bar to match Figma
-    colors = ['#17a2b8', '#ffc107', '#fd7e14', '#28a745']
+    colors = ['#17a2b8', '#ffc107', '#fd7e14', '#28a745', '#e74c3c']
     
     chart = alt.Chart(df).mark_bar(
         cornerRadiusTopLeft=3,
@@ -65,12 +86,11 @@ def top_risk_reasons_chart():
                 axis=alt.Axis(title='', labelAngle=0, labelFontSize=12),
                 sort='-y'),
         y=alt.Y('Count:Q', 
-                axis=alt.Axis(title='', grid=True, gridColor='#f0f0f0', labelFontSize=12),
-                scale=alt.Scale(domain=[0, 1000])),
+                axis=alt.Axis(title='', grid=True, gridColor='#f0f0f0', labelFontSize=12)),
         color=alt.Color(
             'Reason:N',
             scale=alt.Scale(
-                domain=['Impossible Travel', 'Attack IP', 'Unusual Device', 'Failed OTP'],
+                domain=list(WARNING_COLUMNS),
                 range=colors
             ),
             legend=None
@@ -82,11 +102,12 @@ def top_risk_reasons_chart():
     
     st.altair_chart(chart, use_container_width=True, theme=None)
 
-def login_outcomes_pie_chart():
-    """Create the pie chart matching the Figma design"""
+def login_outcomes_pie_chart(window=DEFAULT_WINDOW, rollup=None):
+    """Create the pie chart matching the Figma design (rollup: window_rollup(window) read earlier)"""
+    totals = (window_rollup(window) if rollup is None else rollup).sum()
     df = pd.DataFrame({
         'Outcome': ['Successful', 'Failed'],
-        'Count': [800, 200]
+        'Count': [int(totals['successful']), int(totals['failed'])]
     })
     
     chart = alt.Chart(df).mark_arc(
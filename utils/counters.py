@@ -0,0 +1,215 @@
+# utils/counters.py
+"""
+Dashboard KPIs kept current by triggers on login_activities.
+
+dashboard_counters holds a single row of running totals and
+false_positive_daily the false positives per login day, so the dashboard
+reads one primary key instead of scanning the table. Every insert, delete
+and relevant update adjusts them inside the same transaction.
+
+    python -m utils.counters [--database bantai_security.db] [--rebuild]
+
+compares the live counters with a from-scratch recount (and replaces them
+with the recount when --rebuild is given).
+"""
+import argparse
+import sys
+
+from utils.timestamps import epoch_timestamps, login_time_sql
+
+REVIEWED_ACTIONS = ('False Positive', 'True Positive - Blocked', 'Confirmed Correct')
+
+# Counter -> condition on a login_activities row ({r} is the row alias)
+COUNTER_CONDITIONS = {
+    'total_attempts': "1",
+    'high_risk': "{r}.risk_percentage >= 70",
+    'blocked': "{r}.recommended_action = 'BLOCK'",
+    'otp_required': "{r}.recommended_action = 'ALLOW_WITH_OTP'",
+    'attack_ips': "{r}.is_attack_ip = 1",
+    'reviewed': "{r}.admin_action IN (" + ", ".join(f"'{action}'" for action in REVIEWED_ACTIONS) + ")",
+    'correct': "(({r}.risk_percentage >= 70 AND {r}.admin_action = 'True Positive - Blocked')"
+               " OR ({r}.risk_percentage < 70 AND {r}.admin_action = 'False Positive')"
+               " OR {r}.admin_action = 'Confirmed Correct')",
+    'ofw_logins': "{r}.location_context LIKE '%OFW%'",
+    'domestic_logins': "{r}.location_context LIKE '%Domestic%'",
+}
+
+COUNTERS = list(COUNTER_CONDITIONS)
+
+# Columns whose change can move a row between counters (plus the login time, which picks the day)
+WATCHED_COLUMNS = ('risk_percentage', 'recommended_action', 'is_attack_ip', 'admin_action', 'location_context')
+
+CREATE_TABLES_SQL = [
+    '''
+    CREATE TABLE IF NOT EXISTS dashboard_counters (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        {}
+    )
+    '''.format(',\n        '.join(f'{name} INTEGER NOT NULL DEFAULT 0' for name in COUNTERS)),
+    '''
+    CREATE TABLE IF NOT EXISTS false_positive_daily (
+        day DATE PRIMARY KEY,
+        count INTEGER NOT NULL DEFAULT 0
+    )
+    ''',
+]
+
+
+def _flag(name, row):
+    return f"(CASE WHEN {COUNTER_CONDITIONS[name].format(r=row)} THEN 1 ELSE 0 END)"
+
+
+def _adjust_counters(sign, row):
+    assignments = ', '.join(f'{name} = {name} {sign} {_flag(name, row)}' for name in COUNTERS)
+    return f'UPDATE dashboard_counters SET {assignments} WHERE id = 1;'
+
+
+def _add_false_positive(row, login_time):
+    return f'''
+        INSERT INTO false_positive_daily (day, count)
+        SELECT DATE({login_time}), 1 WHERE {row}.admin_action = 'False Positive'
+        ON CONFLICT (day) DO UPDATE SET count = count + 1;'''
+
+
+def _remove_false_positive(row, login_time):
+    return f'''
+        UPDATE false_positive_daily SET count = count - 1
+        WHERE {row}.admin_action = 'False Positive' AND day = DATE({login_time});'''
+
+
+def _triggers_sql(conn):
+    new_time, old_time = login_time_sql(conn, 'NEW'), login_time_sql(conn, 'OLD')
+    time_columns = ('login_ts', 'utc_offset') if epoch_timestamps(conn) else ('login_timestamp',)
+    return [
+        f'''
+    CREATE TRIGGER IF NOT EXISTS trg_counters_insert AFTER INSERT ON login_activities
+    BEGIN
+        {_adjust_counters('+', 'NEW')}
+        {_add_false_positive('NEW', new_time)}
+    END
+    ''',
+        f'''
+    CREATE TRIGGER IF NOT EXISTS trg_counters_delete AFTER DELETE ON login_activities
+    BEGIN
+        {_adjust_counters('-', 'OLD')}
+        {_remove_false_positive('OLD', old_time)}
+    END
+    ''',
+        f'''
+    CREATE TRIGGER IF NOT EXISTS trg_counters_update
+    AFTER UPDATE OF {', '.join(WATCHED_COLUMNS + time_columns)} ON login_activities
+    BEGIN
+        {_adjust_counters('-', 'OLD')}
+        {_adjust_counters('+', 'NEW')}
+        {_remove_false_positive('OLD', old_time)}
+        {_add_false_positive('NEW', new_time)}
+    END
+    ''',
+    ]
+
+
+def create_counters(conn):
+    """Tables, triggers and initial values (used by the schema migrations; re-running adds new counters)"""
+    for sql in CREATE_TABLES_SQL:
+        conn.execute(sql)
+    create_counter_triggers(conn)
+    rebuild_counters(conn)
+
+
+def create_counter_triggers(conn):
+    """(Re)create the triggers for however login times are currently stored"""
+    # Counters added since the table was created start at 0 until rebuild_counters()
+    columns = [row[1] for row in conn.execute('PRAGMA table_info(dashboard_counters)')]
+    for name in COUNTERS:
+        if name not in columns:
+            conn.execute(f'ALTER TABLE dashboard_counters ADD COLUMN {name} INTEGER NOT NULL DEFAULT 0')
+    for event in ('insert', 'delete', 'update'):
+        conn.execute(f'DROP TRIGGER IF EXISTS trg_counters_{event}')
+    for sql in _triggers_sql(conn):
+        conn.execute(sql)
+
+
+def recount(conn):
+    """Counters recomputed from login_activities in one scan"""
+    sums = ', '.join(f'COALESCE(SUM({_flag(name, "login_activities")}), 0)' for name in COUNTERS)
+    totals = dict(zip(COUNTERS, conn.execute(f'SELECT {sums} FROM login_activities').fetchone()))
+    login_day = f'DATE({login_time_sql(conn)})'
+    daily = dict(conn.execute(f'''
+        SELECT {login_day}, COUNT(*) FROM login_activities
+        WHERE admin_action = 'False Positive'
+        GROUP BY {login_day}
+    ''').fetchall())
+    return totals, daily
+
+
+def counter_totals(conn):
+    """The running totals (one primary-key read)"""
+    row = conn.execute(f'SELECT {", ".join(COUNTERS)} FROM dashboard_counters WHERE id = 1').fetchone()
+    return dict(zip(COUNTERS, row)) if row else {name: 0 for name in COUNTERS}
+
+
+def live_counters(conn):
+    daily = dict(conn.execute('SELECT day, count FROM false_positive_daily WHERE count != 0').fetchall())
+    return counter_totals(conn), daily
+
+
+def false_positives_since(conn, day):
+    """False positives on login days from day (a date) on"""
+    return conn.execute('SELECT COALESCE(SUM(count), 0) FROM false_positive_daily WHERE day >= ?',
+                        [day.isoformat()]).fetchone()[0]
+
+
+def detection_accuracy(totals):
+    """Percentage of reviewed logins the model got right"""
+    if totals['reviewed'] == 0:
+        return 94  # Default accuracy for new system
+    return round(totals['correct'] / totals['reviewed'] * 100)
+
+
+def rebuild_counters(conn):
+    """Replace the live counters with a recount (caller commits)"""
+    totals, daily = recount(conn)
+    conn.execute(f'INSERT OR REPLACE INTO dashboard_counters (id, {", ".join(COUNTERS)}) '
+                 f'VALUES (1, {", ".join("?" * len(COUNTERS))})', [totals[name] for name in COUNTERS])
+    conn.execute('DELETE FROM false_positive_daily')
+    conn.executemany('INSERT INTO false_positive_daily (day, count) VALUES (?, ?)', daily.items())
+    return totals, daily
+
+
+def check_counters(conn):
+    """Differences between live and recounted values -> [(counter, live, expected)]"""
+    live_totals, live_daily = live_counters(conn)
+    totals, daily = recount(conn)
+    diffs = [(name, live_totals[name], totals[name]) for name in COUNTERS if live_totals[name] != totals[name]]
+    for day in sorted(set(live_daily) | set(daily), key=str):
+        if live_daily.get(day, 0) != daily.get(day, 0):
+            diffs.append((f'false_positives[{day}]', live_daily.get(day, 0), daily.get(day, 0)))
+    return diffs
+
+
+def main():
+    from utils import database
+
+    parser = argparse.ArgumentParser(description="Check the dashboard counters against a full recount")
+    parser.add_argument('--database', default=database.DATABASE_PATH)
+    parser.add_argument('--rebuild', action='store_true', help="replace the live counters with the recount")
+    args = parser.parse_args()
+
+    database.DATABASE_PATH = args.database
+    conn = database.get_connection()
+    diffs = check_counters(conn)
+    for name, live, expected in diffs:
+        print(f"❌ {name}: live {live}, recount {expected}")
+
+    if args.rebuild:
+        with conn:
+            rebuild_counters(conn)
+        print("✅ Counters rebuilt from login_activities")
+    elif diffs:
+        sys.exit(1)
+    else:
+        print("✅ Dashboard counters match a full recount")
+
+
+if __name__ == '__main__':
+    main()
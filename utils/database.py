@@ -1,58 +1,88 @@
 import sqlite3
 import pandas as pd
 import os
-import pickle
 import numpy as np
 from datetime import datetime, timedelta
 import json
+import threading
+
+from utils.activities import DEFAULT_PAGE_SIZE, compact_dtypes, count_login_activities, query_login_activities
+from utils.archive import archive_dir, read_archive, read_login_history
+from utils.feed import poll_feed, start_feed
+from utils.review_queue import claim_next, leased_ids, queue_stats, release_leases, renew_leases, review_logins
+from utils.similarity import MATCH_DISTANCE, NEIGHBOR_COUNT, close_matches, similar_incidents
+from utils.cache import bump_data_version, cached
+from utils.analysis_codes import PARAMETER_COLUMNS, decode_factors, decode_warnings, encode_analysis
+from utils.connection import get_thread_connection
+from utils.model_manager import get_model, get_scorer
+from utils.metrics import timed, increment
+from utils.features import derive_login_features, record_login
+from utils.ingest import get_ingest_queue, ingest_enabled
+from utils.rules import match_rule, rule_factor, rules_enabled
+from utils.counters import counter_totals, detection_accuracy, false_positives_since
+from utils.migrations import LATEST_VERSION, migrate
+from utils.rollups import get_rollup
+from utils.timestamps import DAY_MS, local_dates, local_datetimes, local_timestamp, local_today, now_ms, to_login_ts
+from utils.profiles import (
+    DEVICE_NAMES, MIN_PROFILE_LOGINS,
+    consistency_from_profile, load_user_profile, rebuild_user_profiles, update_user_profiles
+)
 
 DATABASE_PATH = 'bantai_security.db'
 
+# Read helpers share results across sessions until a write they depend on (see utils.cache)
+cached_read = cached(lambda: DATABASE_PATH)
+cached_user_read = cached(lambda: DATABASE_PATH, tags=lambda user_id, *args, **kwargs: (f'user:{user_id}',))
+cached_users_read = cached(lambda: DATABASE_PATH, tags=lambda: ('users',))
+
+def invalidate_logins(user_ids):
+    """Drop cached reads of the login listings and of these users after their logins changed"""
+    bump_data_version(DATABASE_PATH, ['login_activities', *(f'user:{user_id}' for user_id in set(user_ids))])
+
+_schema_ready = set()
+_schema_lock = threading.Lock()
+
 def get_connection():
-    """Get database connection"""
-    return sqlite3.connect(DATABASE_PATH)
+    """Get this thread's persistent database connection (do not close it)"""
+    conn = get_thread_connection(DATABASE_PATH)
+    if DATABASE_PATH not in _schema_ready:
+        ensure_schema(conn)
+    return conn
+
+def ensure_schema(conn):
+    """Apply pending migrations once per process and database file"""
+    with _schema_lock:
+        if DATABASE_PATH not in _schema_ready:
+            migrate(conn)
+            _schema_ready.add(DATABASE_PATH)
 
 def load_ml_model():
-    """Load the trained ML model"""
-    try:
-        with open('bantai_model.pkl', 'rb') as f:
-            model_data = pickle.load(f)
-        
-        print("✅ ML model loaded successfully")
-        print(f"   Model type: {type(model_data)}")
-        
-        # Check if it's a dictionary containing the model
-        if isinstance(model_data, dict):
-            # Try common dictionary keys where the model might be stored
-            if 'model' in model_data:
-                actual_model = model_data['model']
-                print(f"   Extracted model type: {type(actual_model)}")
-                return actual_model
-            elif 'classifier' in model_data:
-                actual_model = model_data['classifier']
-                print(f"   Extracted model type: {type(actual_model)}")
-                return actual_model
-            else:
-                print(f"   Available keys: {list(model_data.keys())}")
-                print("   Please check which key contains your trained model")
-                return None
-        else:
-            # It's already the model object
-            return model_data
-            
-    except FileNotFoundError:
-        print("⚠ Model file not found - using dummy predictions")
-        return None
+    """Return the shared ML model (loaded once per process, hot-reloaded on change)"""
+    return get_model()
 
 def get_full_model_prediction(user_id, current_login_data):
     """
     Get complete model prediction matching your notebook output
     Returns detailed analysis with Filipino-specific context
     """
-    model = load_ml_model()
+    increment('predictions')
+    
+    # Clear-cut events are decided by the rule cascade without touching the model
+    if rules_enabled():
+        with timed('rules'):
+            rule = match_rule(current_login_data)
+        if rule is not None:
+            increment('rule_decisions')
+            increment(f"rule_{rule['name']}")
+            return get_rule_prediction(user_id, current_login_data, rule)
+    
+    with timed('model_load'):
+        model = get_scorer()
     
     if model is None:
         # Enhanced dummy prediction for testing
+        increment('fallback_predictions')
+        increment('fallback_model_missing')
         return {
             'risk_score': 0.250,
             'risk_percentage': 25.0,
@@ -69,18 +99,20 @@ def get_full_model_prediction(user_id, current_login_data):
         }
     
     # Prepare features for your model (6 features as per your training)
-    features = np.array([[
-        current_login_data['time_diff'],
-        current_login_data['distance'],
-        current_login_data['device_type'],  # 0=mobile, 1=desktop, 2=tablet
-        current_login_data['is_attack_ip'],
-        current_login_data['login_successful'],
-        current_login_data['latency']
-    ]])
+    with timed('feature_prep'):
+        features = np.array([[
+            current_login_data['time_diff'],
+            current_login_data['distance'],
+            current_login_data['device_type'],  # 0=mobile, 1=desktop, 2=tablet
+            current_login_data['is_attack_ip'],
+            current_login_data['login_successful'],
+            current_login_data['latency']
+        ]])
     
     try:
         # Get model prediction
-        risk_probability = model.predict_proba(features)[0][1]
+        with timed('predict_proba'):
+            risk_probability = model.predict_proba(features)[0][1]
         risk_score = float(risk_probability)
         risk_percentage = risk_score * 100
         
@@ -96,17 +128,22 @@ def get_full_model_prediction(user_id, current_login_data):
             action = "BLOCK"
         
         # Generate Filipino-specific context
-        location_context = get_location_context(current_login_data['country'], current_login_data['city'])
-        behavior_consistency = calculate_behavior_consistency(user_id, current_login_data)
+        with timed('location_context'):
+            location_context = get_location_context(current_login_data['country'], current_login_data['city'])
+        with timed('behavior_consistency'):
+            behavior_consistency = calculate_behavior_consistency(user_id, current_login_data)
         
         # Generate analysis factors
-        analysis_factors = generate_analysis_factors(current_login_data, location_context, behavior_consistency)
+        with timed('analysis_factors'):
+            analysis_factors = generate_analysis_factors(current_login_data, location_context, behavior_consistency)
         
         # Generate warnings
-        warnings = generate_warnings(current_login_data, risk_score)
+        with timed('generate_warnings'):
+            warnings = generate_warnings(current_login_data, risk_score)
         
         # Generate recommendation
-        recommendation = generate_recommendation(action, analysis_factors, location_context)
+        with timed('recommendation'):
+            recommendation = generate_recommendation(action, analysis_factors, location_context)
         
         return {
             'risk_score': risk_score,
@@ -122,6 +159,8 @@ def get_full_model_prediction(user_id, current_login_data):
         
     except Exception as e:
         print(f"Error in model prediction: {e}")
+        increment('fallback_predictions')
+        increment('fallback_model_error')
         # Return dummy prediction instead of calling self again
         return {
             'risk_score': 0.250,
@@ -138,6 +177,27 @@ def get_full_model_prediction(user_id, current_login_data):
             'location_context': 'Unknown location context'
         }
 
+def get_rule_prediction(user_id, current_login_data, rule):
+    """Prediction for an event decided by a pre-model rule"""
+    risk_score = float(rule['risk_score'])
+    classification = 'HIGH' if rule['action'] == 'BLOCK' else 'LOW'
+    location_context = get_location_context(current_login_data['country'], current_login_data['city'])
+    behavior_consistency = calculate_behavior_consistency(user_id, current_login_data)
+    analysis_factors = generate_analysis_factors(current_login_data, location_context, behavior_consistency)
+    analysis_factors.append(rule_factor(rule))
+    
+    return {
+        'risk_score': risk_score,
+        'risk_percentage': risk_score * 100,
+        'classification': classification,
+        'action': rule['action'],
+        'recommendation': generate_recommendation(rule['action'], analysis_factors, location_context),
+        'analysis_factors': analysis_factors,
+        'warnings': generate_warnings(current_login_data, risk_score),
+        'behavior_consistency': behavior_consistency,
+        'location_context': location_context
+    }
+
 def get_location_context(country, city):
     """Provide Filipino-specific location context"""
     
@@ -171,15 +231,27 @@ def get_location_context(country, city):
         return "International location"
 
 def calculate_behavior_consistency(user_id, current_login_data):
-    """Calculate behavior consistency based on user history"""
-    # This would analyze historical patterns
-    # For now, return a reasonable estimate based on login characteristics
-    if current_login_data['device_type'] == 0:  # mobile
-        return 85  # Mobile is common
-    elif current_login_data['distance'] < 100:
-        return 95  # Local login
-    else:
-        return 70  # International login
+    """Calculate behavior consistency against the user's running profile"""
+    conn = get_connection()
+    profile = load_user_profile(conn, user_id)
+    
+    if profile is None or profile['login_count'] < MIN_PROFILE_LOGINS:
+        # Not enough history yet - estimate from login characteristics
+        if current_login_data['device_type'] == 0:  # mobile
+            return 85  # Mobile is common
+        elif current_login_data['distance'] < 100:
+            return 95  # Local login
+        else:
+            return 70  # International login
+    
+    return consistency_from_profile(
+        profile,
+        DEVICE_NAMES.get(current_login_data['device_type'], 'unknown'),
+        current_login_data['country'],
+        current_login_data['city'],
+        current_login_data['latency'],
+        current_login_data.get('login_time') or datetime.now()
+    )
 
 def generate_analysis_factors(login_data, location_context, behavior_consistency):
     """Generate detailed analysis factors"""
@@ -240,61 +312,28 @@ def update_action(activity_id, action):
     """Legacy function - redirects to enhanced version"""
     return update_admin_action(activity_id, action)
 
-def initialize_database():
-    """Create enhanced tables with realistic sample data"""
+def initialize_database(reset=False):
+    """Bring the schema up to date and add realistic sample data to an empty database
+    reset=True drops every table first (all stored history is lost)
+    """
     conn = get_connection()
     cursor = conn.cursor()
     
-    # Drop existing tables for fresh start
-    cursor.execute('DROP TABLE IF EXISTS login_activities')
-    cursor.execute('DROP TABLE IF EXISTS users')
-    
-    # Create users table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS users (
-            user_id VARCHAR(50) PRIMARY KEY,
-            username VARCHAR(100),
-            email VARCHAR(255),
-            home_locations TEXT,  -- JSON array
-            common_devices TEXT,  -- JSON array
-            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
-        )
-    ''')
-    
-    # Create enhanced login activities table
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS login_activities (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            user_id VARCHAR(50),
-            login_timestamp TIMESTAMP,
-            country VARCHAR(100),
-            city VARCHAR(100),
-            time_diff_hrs DECIMAL(10,2),
-            distance_km INTEGER,
-            device_type VARCHAR(50),
-            latency_ms INTEGER,
-            login_successful BOOLEAN,
-            is_attack_ip BOOLEAN,
-            
-            -- Enhanced model output fields
-            risk_score DECIMAL(10,6),
-            risk_percentage DECIMAL(5,2),
-            risk_classification VARCHAR(10),
-            recommended_action VARCHAR(20),
-            recommendation_text TEXT,
-            analysis_factors TEXT,  -- JSON array
-            warnings TEXT,  -- JSON array
-            behavior_consistency INTEGER,
-            location_context VARCHAR(100),
-            
-            -- Admin action
-            admin_action VARCHAR(100) DEFAULT 'Pending Review',
-            reviewed_at TIMESTAMP,
-            reviewed_by VARCHAR(100),
-            
-            FOREIGN KEY (user_id) REFERENCES users(user_id)
-        )
-    ''')
+    if reset:
+        tables = [row[0] for row in cursor.execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND name NOT LIKE 'sqlite_%'"
+        ).fetchall()]
+        for table in tables:
+            cursor.execute(f'DROP TABLE IF EXISTS {table}')
+        conn.commit()
+        _schema_ready.discard(DATABASE_PATH)
+        bump_data_version(DATABASE_PATH)
+    
+    ensure_schema(conn)
+    
+    if cursor.execute('SELECT COUNT(*) FROM users').fetchone()[0] > 0:
+        print(f"✅ Database schema is at version {LATEST_VERSION} - existing data kept")
+        return
     
     # Insert sample users with baseline data
     sample_users = [
@@ -423,95 +462,161 @@ def initialize_database():
          '[]', 88, 'Domestic location', 'Pending Review')
     ]
     
-    cursor.executemany('''
-        INSERT INTO login_activities 
-        (user_id, login_timestamp, country, city, time_diff_hrs, distance_km, 
-         device_type, latency_ms, login_successful, is_attack_ip,
-         risk_score, risk_percentage, risk_classification, recommended_action,
-         recommendation_text, analysis_factors, warnings, behavior_consistency,
-         location_context, admin_action)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', sample_activities)
+    # Sample analysis is written as JSON and times as text above; store them like every other row
+    cursor.executemany(INSERT_LOGIN_ACTIVITY_SQL, encode_login_rows(conn, [
+        row[:1] + to_login_ts(row[1]) + row[2:15] + (json.loads(row[15]), json.loads(row[16])) + row[17:]
+        for row in sample_activities
+    ]))
+    
+    # Per-user running behavior profiles, kept up to date on every insert
+    rebuild_user_profiles(conn)
     
     conn.commit()
-    conn.close()
-    print("✅ Fresh enhanced database initialized successfully!")
+    bump_data_version(DATABASE_PATH)
+    print("✅ Sample data added to the enhanced database!")
     print(f"✅ Added {len(sample_users)} users and {len(sample_activities)} login activities")
 
 def get_login_activities():
     """Get login activities with enhanced model output"""
+    return get_login_activities_page(limit=None)[0]
+
+@cached_read
+def get_login_activities_page(columns=None, order_by='login_timestamp', descending=True,
+                              limit=DEFAULT_PAGE_SIZE, cursor=None, **filters):
+    """One page of login activities and the cursor for the next one (see utils.activities)"""
     conn = get_connection()
-    query = '''
-        SELECT 
-            la.id as "#",
-            la.user_id as "User ID",
-            la.login_timestamp as "Login Timestamp (UTC+8)",
-            la.country as "Country",
-            la.city as "City",
-            la.time_diff_hrs as "time_diff (hrs)",
-            la.distance_km as "distance (km)",
-            la.device_type as "device_type",
-            la.latency_ms as "latency (ms)",
-            la.login_successful as "login_successful",
-            la.is_attack_ip as "is_attack_ip",
-            la.risk_score as "risk_score",
-            la.risk_percentage as "Risk %",
-            la.risk_classification as "Classification",
-            la.recommended_action as "AI Action",
-            la.recommendation_text as "AI Recommendation",
-            la.analysis_factors as "Analysis Factors",
-            la.warnings as "Warnings",
-            la.behavior_consistency as "Behavior %",
-            la.location_context as "Location Context",
-            la.admin_action as "Admin Action"
-        FROM login_activities la
-        ORDER BY la.login_timestamp DESC
-    '''
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-    
-    # Parse JSON fields
-    if len(df) > 0:
-        df['Analysis Factors'] = df['Analysis Factors'].apply(lambda x: json.loads(x) if x else [])
-        df['Warnings'] = df['Warnings'].apply(lambda x: json.loads(x) if x else [])
-    
-    return df
+    return query_login_activities(conn, columns, order_by, descending, limit, cursor, **filters)
+
+@cached_read
+def get_login_history(columns=None, **filters):
+    """Every login activity matching since/until/user_id, newest first, including rows moved to the Parquet archive"""
+    conn = get_connection()
+    return read_login_history(conn, archive_dir(DATABASE_PATH), columns, **filters)
+
+@cached_read
+def count_activities(limit=None, **filters):
+    """Number of login activities matching the listing filters (counting stops at limit)"""
+    conn = get_connection()
+    return count_login_activities(conn, limit, **filters)
 
 def get_dashboard_metrics():
     """Legacy function - redirects to enhanced version"""
     return get_dashboard_metrics_enhanced()
 
 def get_dashboard_metrics_enhanced():
-    """Get enhanced dashboard metrics"""
-    conn = get_connection()
-    
-    # Total login attempts
-    total_attempts = conn.execute('SELECT COUNT(*) FROM login_activities').fetchone()[0]
-    
-    # High-risk activities (>= 70% risk)
-    high_risk = conn.execute('SELECT COUNT(*) FROM login_activities WHERE risk_percentage >= 70').fetchone()[0]
-    
-    # Blocked activities
-    blocked = conn.execute("SELECT COUNT(*) FROM login_activities WHERE recommended_action = 'BLOCK'").fetchone()[0]
-    
-    # Activities requiring OTP
-    otp_required = conn.execute("SELECT COUNT(*) FROM login_activities WHERE recommended_action = 'ALLOW_WITH_OTP'").fetchone()[0]
-    
-    # Attack IP attempts
-    attack_ips = conn.execute('SELECT COUNT(*) FROM login_activities WHERE is_attack_ip = 1').fetchone()[0]
-    
-    conn.close()
+    """Get enhanced dashboard metrics from the trigger-maintained counters"""
+    counters = get_dashboard_counters()
     
     return {
-        'total_attempts': total_attempts,
-        'high_risk': high_risk,
-        'blocked': blocked,
-        'otp_required': otp_required,
-        'attack_ips': attack_ips
+        'total_attempts': counters['total_attempts'],
+        'high_risk': counters['high_risk'],
+        'blocked': counters['blocked'],
+        'otp_required': counters['otp_required'],
+        'attack_ips': counters['attack_ips']
     }
 
+def start_dashboard_feed():
+    """A live window of the newest login activities and the dashboard numbers (see utils.feed)"""
+    # Not cached: a feed must see writes from other processes at once
+    conn = get_connection()
+    return start_feed(conn)
+
+def poll_dashboard_feed(feed):
+    """Bring a dashboard feed up to date in place -> the parts that changed"""
+    conn = get_connection()
+    return poll_feed(conn, feed)
+
+@cached_read
+def get_dashboard_counters():
+    """All dashboard totals in a single primary-key read"""
+    conn = get_connection()
+    return counter_totals(conn)
+
+INSERT_LOGIN_ACTIVITY_COLUMNS = [
+    'user_id', 'login_ts', 'utc_offset', 'country', 'city', 'time_diff_hrs', 'distance_km',
+    'device_type', 'latency_ms', 'login_successful', 'is_attack_ip',
+    'risk_score', 'risk_percentage', 'risk_classification', 'recommended_action',
+    'recommendation_text', 'factor_codes', 'warning_mask', 'behavior_consistency',
+    'location_context', 'admin_action'
+]
+
+INSERT_LOGIN_ACTIVITY_SQL = '''
+    INSERT INTO login_activities 
+    ({})
+    VALUES ({})
+'''.format(', '.join(INSERT_LOGIN_ACTIVITY_COLUMNS), ', '.join('?' * len(INSERT_LOGIN_ACTIVITY_COLUMNS)))
+
+def login_activity_row(user_id, login_timestamp, country, city, time_diff, distance, device_type,
+                       latency, is_attack_ip, login_successful, prediction):
+    """Build the INSERT parameters for one scored login
+    (factor and warning lists are coded by insert_login_activities)
+    """
+    return (
+        user_id, *to_login_ts(login_timestamp), country, city,
+        time_diff, distance, device_type, latency, login_successful, is_attack_ip,
+        float(prediction['risk_score']), float(prediction['risk_percentage']), 
+        prediction['classification'], prediction['action'],
+        prediction['recommendation'], list(prediction['analysis_factors']),
+        list(prediction['warnings']), int(prediction['behavior_consistency']),
+        prediction['location_context'], 'Pending Review'
+    )
+
+_FACTORS = INSERT_LOGIN_ACTIVITY_COLUMNS.index('factor_codes')
+_WARNINGS = INSERT_LOGIN_ACTIVITY_COLUMNS.index('warning_mask')
+
+def encode_login_rows(conn, rows):
+    """Replace the factor and warning lists of login_activity_row() rows with their codes"""
+    if not rows:
+        return []
+    columns = list(zip(*rows))
+    factor_codes, warning_masks = encode_analysis(
+        conn, columns[_FACTORS], columns[_WARNINGS],
+        *(columns[INSERT_LOGIN_ACTIVITY_COLUMNS.index(name)] for name in PARAMETER_COLUMNS))
+    return [row[:_FACTORS] + (codes, mask) + row[_WARNINGS + 1:]
+            for row, codes, mask in zip(rows, factor_codes, warning_masks)]
+
+def insert_login_activities(rows):
+    """Insert many scored logins and update their users' profiles in a single transaction"""
+    with timed('db_insert'):
+        conn = get_connection()
+        rows = encode_login_rows(conn, rows)
+        with conn:
+            conn.executemany(INSERT_LOGIN_ACTIVITY_SQL, rows)
+            with timed('profile_update'):
+                update_user_profiles(conn, [
+                    {
+                        'user_id': row['user_id'],
+                        'login_timestamp': local_timestamp(row['login_ts'], row['utc_offset']),
+                        'country': row['country'],
+                        'city': row['city'],
+                        'device_type': row['device_type'],
+                        'latency': row['latency_ms'],
+                        'time_diff': row['time_diff_hrs'],
+                        'risk_percentage': row['risk_percentage'],
+                        'behavior_consistency': row['behavior_consistency'],
+                    }
+                    for row in (dict(zip(INSERT_LOGIN_ACTIVITY_COLUMNS, values)) for values in rows)
+                ])
+        invalidate_logins(row[0] for row in rows)
+
+def store_login_activities(rows):
+    """Insert scored logins now, or hand them to the write-behind queue when it is enabled"""
+    if ingest_enabled():
+        get_ingest_queue(DATABASE_PATH, insert_login_activities).submit(rows)
+    else:
+        insert_login_activities(rows)
+
 def add_login_activity_enhanced(user_id, country, city, time_diff, distance, device_type, latency, is_attack_ip, login_successful=True):
-    """Add new login activity with enhanced ML prediction"""
+    """Add new login activity with enhanced ML prediction
+    Pass time_diff/distance as None to derive them from the user's previous login
+    """
+    login_time = datetime.now().replace(microsecond=0)
+    
+    if time_diff is None or distance is None:
+        with timed('derive_features'):
+            derived_time_diff, derived_distance = derive_login_features(user_id, country, city, device_type, login_time)
+        time_diff = derived_time_diff if time_diff is None else time_diff
+        distance = derived_distance if distance is None else distance
     
     # Prepare data for ML model
     device_encoded = 0 if device_type == 'mobile' else 1 if device_type == 'desktop' else 2
@@ -524,164 +629,172 @@ def add_login_activity_enhanced(user_id, country, city, time_diff, distance, dev
         'is_attack_ip': 1 if is_attack_ip else 0,
         'login_successful': 1 if login_successful else 0,
         'country': country,
-        'city': city
+        'city': city,
+        'login_time': login_time
     }
     
     # Get enhanced ML prediction
-    prediction = get_full_model_prediction(user_id, login_data)
-    
-    # Insert into database
-    conn = get_connection()
-    cursor = conn.cursor()
+    with timed('prediction_total'):
+        prediction = get_full_model_prediction(user_id, login_data)
     
-    cursor.execute('''
-        INSERT INTO login_activities 
-        (user_id, login_timestamp, country, city, time_diff_hrs, distance_km, 
-         device_type, latency_ms, login_successful, is_attack_ip,
-         risk_score, risk_percentage, risk_classification, recommended_action,
-         recommendation_text, analysis_factors, warnings, behavior_consistency,
-         location_context, admin_action)
-        VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-    ''', (
-        user_id, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), country, city,
-        time_diff, distance, device_type, latency, login_successful, is_attack_ip,
-        prediction['risk_score'], prediction['risk_percentage'], 
-        prediction['classification'], prediction['action'],
-        prediction['recommendation'], json.dumps(prediction['analysis_factors']),
-        json.dumps(prediction['warnings']), prediction['behavior_consistency'],
-        prediction['location_context'], 'Pending Review'
-    ))
-    
-    conn.commit()
-    conn.close()
+    # Insert into database (or queue it, see utils.ingest)
+    store_login_activities([login_activity_row(
+        user_id, login_time.strftime('%Y-%m-%d %H:%M:%S'), country, city,
+        time_diff, distance, device_type, latency, is_attack_ip, login_successful, prediction
+    )])
+    record_login(user_id, country, city, device_type, login_time)
     
     return prediction
 
 def update_admin_action(activity_id, action, admin_user="admin"):
-    """Update admin action for a login activity"""
+    """Update admin action for a login activity -> (rows updated, ids skipped), see update_admin_actions_bulk"""
+    return update_admin_actions_bulk([activity_id], action, admin_user)
+
+# Ids per IN (...) lookup, below SQLite's bound-parameter limit
+_ID_CHUNK = 500
+
+def _close_match_ids(admin_user):
+    """more_ids for review_logins: the close matches of the logins being reviewed"""
+    def more_ids(conn, activity_ids):
+        matched = {match_id for activity_id in activity_ids
+                   for match_id, _ in close_matches(conn, activity_id, admin=admin_user)}
+        return sorted(matched - set(activity_ids))
+    return more_ids
+
+def update_admin_actions_bulk(activity_ids, action, admin_user="admin", include_matches=False):
+    """Set one admin action on many login activities in a single transaction -> (rows updated, ids skipped)
+
+    Logins another reviewer holds a live lease on are skipped (see utils.review_queue).
+    include_matches also decides each login's close matches (see utils.similarity), found inside the transaction.
+    """
+    activity_ids = list(dict.fromkeys(int(activity_id) for activity_id in activity_ids))
+    if not activity_ids:
+        return 0, []
+    reviewed_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
     conn = get_connection()
-    cursor = conn.cursor()
-    
-    cursor.execute('''
-        UPDATE login_activities 
-        SET admin_action = ?, reviewed_at = ?, reviewed_by = ?
-        WHERE id = ?
-    ''', (action, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), admin_user, activity_id))
     
-    conn.commit()
-    conn.close()
+    updated, skipped = review_logins(conn, activity_ids, action, admin_user, reviewed_at,
+                                     _close_match_ids(admin_user) if include_matches else None)
+    user_ids = set()
+    for start in range(0, len(updated), _ID_CHUNK):
+        chunk = updated[start:start + _ID_CHUNK]
+        user_ids.update(row[0] for row in conn.execute(
+            f'SELECT DISTINCT user_id FROM login_activities WHERE id IN ({", ".join("?" * len(chunk))})', chunk))
+    if updated:
+        invalidate_logins(user_ids)
+    return len(updated), skipped
+
+def claim_reviews(n, admin_user="admin"):
+    """Lease the next n pending logins of the review queue to admin_user -> their ids (see utils.review_queue)"""
+    conn = get_connection()
+    return claim_next(conn, n, admin_user)
+
+def _activities_in_order(conn, ids):
+    """Login activities with these ids, in the order given"""
+    df, _ = query_login_activities(conn, limit=None, ids=ids)
+    order = {activity_id: position for position, activity_id in enumerate(ids)}
+    return df.sort_values('#', key=lambda column: column.map(order)).reset_index(drop=True)
+
+def get_claimed_reviews(admin_user="admin"):
+    """Login activities admin_user holds a live lease on, in queue order"""
+    # Not cached: leases change without a write to login_activities
+    conn = get_connection()
+    return _activities_in_order(conn, leased_ids(conn, admin_user))
+
+def renew_reviews(activity_ids, admin_user="admin"):
+    """Extend admin_user's leases -> how many are still held"""
+    conn = get_connection()
+    return renew_leases(conn, activity_ids, admin_user)
+
+def release_reviews(activity_ids, admin_user="admin"):
+    """Put admin_user's claimed logins back in the queue"""
+    conn = get_connection()
+    return release_leases(conn, activity_ids, admin_user)
+
+def get_review_queue_stats():
+    """Review queue depth, leases and ages"""
+    conn = get_connection()
+    return queue_stats(conn)
+
+@cached_read
+def get_similar_incidents(activity_id, k=NEIGHBOR_COUNT):
+    """The k logins most like activity_id (see utils.similarity), nearest first, with their Distance"""
+    conn = get_connection()
+    neighbors = similar_incidents(conn, activity_id, k)
+    df = _activities_in_order(conn, [neighbor_id for neighbor_id, _ in neighbors])
+    df.insert(1, 'Distance', [distance for _, distance in neighbors])
+    return df
+
+def get_close_matches(activity_id, admin_user="admin", max_distance=MATCH_DISTANCE):
+    """Pending logins of the same user, city and device close enough to share activity_id's decision"""
+    # Not cached: other analysts' leases hide matches
+    conn = get_connection()
+    matches = close_matches(conn, activity_id, max_distance, admin_user)
+    df = _activities_in_order(conn, [match_id for match_id, _ in matches])
+    df.insert(1, 'Distance', [distance for _, distance in matches])
+    return df
 
+@cached_read
+def get_login_rollup(granularity, since, until=None):
+    """Hourly or daily login rollup rows for a time window (see utils.rollups)"""
+    conn = get_connection()
+    return get_rollup(conn, granularity, since, until)
+
+@cached_read
 def get_detection_accuracy():
     """Calculate detection accuracy for dashboard"""
-    conn = get_connection()
-    
-    # Count total reviewed items
-    total_reviewed = conn.execute('''
-        SELECT COUNT(*) FROM login_activities 
-        WHERE admin_action IN ('False Positive', 'True Positive - Blocked', 'Confirmed Correct')
-    ''').fetchone()[0]
-    
-    # Count correct predictions
-    correct_predictions = conn.execute('''
-        SELECT COUNT(*) FROM login_activities 
-        WHERE (risk_percentage >= 70 AND admin_action = 'True Positive - Blocked')
-           OR (risk_percentage < 70 AND admin_action = 'False Positive')
-           OR (admin_action = 'Confirmed Correct')
-    ''').fetchone()[0]
-    
-    conn.close()
-    
-    if total_reviewed == 0:
-        return 94  # Default accuracy for new system
-    
-    accuracy = (correct_predictions / total_reviewed) * 100
-    return round(accuracy)
+    return detection_accuracy(get_dashboard_counters())
 
 def get_login_activities_enhanced():
     """Get login activities with enhanced model output"""
-    conn = get_connection()
-    query = '''
-        SELECT 
-            la.id as "#",
-            la.user_id as "User ID",
-            la.login_timestamp as "Login Timestamp (UTC+8)",
-            la.country as "Country",
-            la.city as "City",
-            la.time_diff_hrs as "time_diff (hrs)",
-            la.distance_km as "distance (km)",
-            la.device_type as "device_type",
-            la.latency_ms as "latency (ms)",
-            la.login_successful as "login_successful",
-            la.is_attack_ip as "is_attack_ip",
-            la.risk_score as "risk_score",
-            la.risk_percentage as "Risk %",
-            la.risk_classification as "Classification",
-            la.recommended_action as "AI Action",
-            la.recommendation_text as "AI Recommendation",
-            la.analysis_factors as "Analysis Factors",
-            la.warnings as "Warnings",
-            la.behavior_consistency as "Behavior %",
-            la.location_context as "Location Context",
-            la.admin_action as "Admin Action"
-        FROM login_activities la
-        ORDER BY la.login_timestamp DESC
-    '''
-    df = pd.read_sql_query(query, conn)
-    conn.close()
-    
-    # Parse JSON fields
-    if len(df) > 0:
-        df['Analysis Factors'] = df['Analysis Factors'].apply(lambda x: json.loads(x) if x else [])
-        df['Warnings'] = df['Warnings'].apply(lambda x: json.loads(x) if x else [])
-    
-    return df
+    return get_login_activities_page(limit=None)[0]
 
+@cached_read
 def get_false_positives_count():
-    """Get count of false positives marked in last 7 days"""
+    """Get count of false positives marked in last 7 days (by login day)"""
     conn = get_connection()
-    
-    count = conn.execute('''
-        SELECT COUNT(*) FROM login_activities 
-        WHERE admin_action = 'False Positive'
-        AND login_timestamp >= datetime('now', '-7 days')
-    ''').fetchone()[0]
-    
-    conn.close()
-    return count
+    return false_positives_since(conn, local_today() - timedelta(days=7))
 
-def get_user_timeline_data(user_id):
-    """Get user's login timeline data for visualization"""
+TIMELINE_COLUMNS = [
+    'login_ts', 'utc_offset', 'country', 'city', 'distance_km', 'device_type', 'risk_percentage',
+    'risk_classification', 'behavior_consistency', 'location_context', 'admin_action',
+    'recommended_action', 'factor_codes', 'warning_mask'
+]
+
+@cached_user_read
+def get_user_timeline_data(user_id, include_archive=False):
+    """Get user's login timeline data for visualization (optionally reaching into the Parquet archive)"""
     conn = get_connection()
-    query = '''
-        SELECT 
-            login_timestamp,
-            country,
-            city,
-            distance_km,
-            device_type,
-            risk_percentage,
-            risk_classification,
-            behavior_consistency,
-            location_context,
-            admin_action,
-            recommended_action,
-            analysis_factors,
-            warnings
+    query = f'''
+        SELECT {", ".join(TIMELINE_COLUMNS)}
         FROM login_activities 
         WHERE user_id = ?
-        ORDER BY login_timestamp ASC
+        ORDER BY login_ts ASC
     '''
     df = pd.read_sql_query(query, conn, params=[user_id])
-    conn.close()
+    if include_archive:
+        archived = read_archive(conn, archive_dir(DATABASE_PATH), TIMELINE_COLUMNS, user_id=user_id)
+        if len(archived) > 0:
+            archived = archived.sort_values('login_ts', ignore_index=True)
+            df = pd.concat([archived, df], ignore_index=True) if len(df) > 0 else archived
     
     if len(df) > 0:
-        df['login_timestamp'] = pd.to_datetime(df['login_timestamp'])
-        df['date'] = df['login_timestamp'].dt.date
-        df['analysis_factors'] = df['analysis_factors'].apply(lambda x: json.loads(x) if x else [])
-        df['warnings'] = df['warnings'].apply(lambda x: json.loads(x) if x else [])
+        df.insert(0, 'login_timestamp', local_datetimes(df.pop('login_ts'), df.pop('utc_offset')))
+        df['date'] = df['login_timestamp'].dt.normalize()
+        df['analysis_factors'] = decode_factors(conn, df.pop('factor_codes'), df['behavior_consistency'],
+                                                df['location_context'], df['device_type'])
+        df['warnings'] = decode_warnings(conn, df.pop('warning_mask'))
+        compact_dtypes(df, {column: column for column in TIMELINE_COLUMNS})
     
     return df
 
+@cached_users_read
+def get_users():
+    """List all users for selection widgets"""
+    conn = get_connection()
+    return pd.read_sql_query("SELECT user_id, username FROM users ORDER BY username", conn)
+
+@cached_user_read
 def get_user_info(user_id):
     """Get user information"""
     conn = get_connection()
@@ -691,7 +804,6 @@ def get_user_info(user_id):
         WHERE user_id = ?
     '''
     result = pd.read_sql_query(query, conn, params=[user_id])
-    conn.close()
     
     if len(result) > 0:
         user_data = result.iloc[0]
@@ -700,41 +812,40 @@ def get_user_info(user_id):
         return user_data
     return None
 
+@cached_user_read
 def get_user_stats(user_id):
-    """Get user statistics"""
+    """Get user statistics from the running behavior profile"""
     conn = get_connection()
+    profile = load_user_profile(conn, user_id)
     
-    total_logins = conn.execute('SELECT COUNT(*) FROM login_activities WHERE user_id = ?', [user_id]).fetchone()[0]
-    high_risk = conn.execute('SELECT COUNT(*) FROM login_activities WHERE user_id = ? AND risk_percentage >= 70', [user_id]).fetchone()[0]
-    countries = conn.execute('SELECT COUNT(DISTINCT country) FROM login_activities WHERE user_id = ?', [user_id]).fetchone()[0]
-    avg_behavior = conn.execute('SELECT AVG(behavior_consistency) FROM login_activities WHERE user_id = ?', [user_id]).fetchone()[0]
-    
-    conn.close()
+    if profile is None:
+        return {'total_logins': 0, 'high_risk': 0, 'countries': 0, 'avg_behavior': 0}
     
     return {
-        'total_logins': total_logins,
-        'high_risk': high_risk,
-        'countries': countries,
-        'avg_behavior': round(avg_behavior or 0)
+        'total_logins': profile['login_count'],
+        'high_risk': profile['high_risk_count'],
+        'countries': len(profile['country_counts']),
+        'avg_behavior': round(profile['consistency_sum'] / profile['login_count']) if profile['login_count'] else 0
     }
 
+@cached_user_read
 def get_user_location_patterns(user_id):
     """Get user's location patterns for analysis"""
     conn = get_connection()
     query = '''
         SELECT country, city, COUNT(*) as frequency,
                AVG(risk_percentage) as avg_risk,
-               MIN(login_timestamp) as first_seen,
-               MAX(login_timestamp) as last_seen
+               strftime('%Y-%m-%d %H:%M:%S', MIN(login_ts + utc_offset * 60000) / 1000, 'unixepoch') as first_seen,
+               strftime('%Y-%m-%d %H:%M:%S', MAX(login_ts + utc_offset * 60000) / 1000, 'unixepoch') as last_seen
         FROM login_activities 
         WHERE user_id = ?
         GROUP BY country, city
         ORDER BY frequency DESC
     '''
     df = pd.read_sql_query(query, conn, params=[user_id])
-    conn.close()
     return df
 
+@cached_user_read
 def get_user_device_patterns(user_id):
     """Get user's device usage patterns"""
     conn = get_connection()
@@ -748,26 +859,26 @@ def get_user_device_patterns(user_id):
         ORDER BY frequency DESC
     '''
     df = pd.read_sql_query(query, conn, params=[user_id])
-    conn.close()
     return df
 
+@cached_user_read
 def get_user_risk_trends(user_id, days=30):
     """Get user's risk trends over time"""
     conn = get_connection()
+    # Range scan on (user_id, login_ts); days are local day numbers
     query = '''
-        SELECT DATE(login_timestamp) as date,
+        SELECT (login_ts + utc_offset * 60000) / {} as date,
                AVG(risk_percentage) as avg_risk,
                AVG(behavior_consistency) as avg_behavior,
                COUNT(*) as login_count
         FROM login_activities 
-        WHERE user_id = ? AND login_timestamp >= datetime('now', '-{} days')
-        GROUP BY DATE(login_timestamp)
+        WHERE user_id = ? AND login_ts >= ?
+        GROUP BY 1
         ORDER BY date
-    '''.format(days)
-    df = pd.read_sql_query(query, conn, params=[user_id])
-    conn.close()
+    '''.format(DAY_MS)
+    df = pd.read_sql_query(query, conn, params=[user_id, now_ms() - days * DAY_MS])
     
     if len(df) > 0:
-        df['date'] = pd.to_datetime(df['date'])
+        df['date'] = local_dates(df['date'])
     
     return df
\ No newline at end of file
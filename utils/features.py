@@ -0,0 +1,243 @@
+# utils/features.py
+"""
+Server-side derivation of time_diff and distance from the user's previous login.
+
+A bounded in-memory LRU map of user_id -> last login (timestamp, coordinates,
+device) is warmed from login_activities on first use and updated on every
+insert. Users that were evicted (or never warmed) are read through from SQLite;
+users without any stored login are remembered too. Each hit is checked against
+the user's latest login_ts in SQLite (an index seek), so logins stored by
+another process (the scoring service, the app) are read through, never missed.
+"""
+import math
+import os
+import threading
+from collections import OrderedDict
+
+from utils.timestamps import local_datetime, to_login_ts
+
+# Maximum number of users kept in memory; least recently seen users are evicted
+LAST_LOGIN_CAPACITY = int(os.environ.get('BANTAI_LAST_LOGIN_CAPACITY', '1000000'))
+
+EARTH_RADIUS_KM = 6371.0088
+
+# (latitude, longitude) of the cities BantAI sees most
+CITY_COORDINATES = {
+    # Philippines
+    'Manila': (14.5995, 120.9842), 'Makati': (14.5547, 121.0244), 'Taguig': (14.5176, 121.0509),
+    'Quezon City': (14.6760, 121.0437), 'Pasig': (14.5764, 121.0851), 'Mandaluyong': (14.5794, 121.0359),
+    'Parañaque': (14.4793, 121.0198), 'Cebu': (10.3157, 123.8854), 'Lapu-Lapu': (10.3103, 123.9494),
+    'Mandaue': (10.3236, 123.9223), 'Davao': (7.1907, 125.4553), 'Tagum': (7.4478, 125.8078),
+    'Iloilo': (10.7202, 122.5621), 'Bacolod': (10.6765, 122.9509),
+    # OFW hubs
+    'Dubai': (25.2048, 55.2708), 'Abu Dhabi': (24.4539, 54.3773), 'Sharjah': (25.3463, 55.4209),
+    'Riyadh': (24.7136, 46.6753), 'Jeddah': (21.4858, 39.1925), 'Dammam': (26.4207, 50.0888),
+    'Doha': (25.2854, 51.5310), 'Kuwait City': (29.3759, 47.9774), 'Singapore': (1.3521, 103.8198),
+    'Hong Kong': (22.3193, 114.1694), 'Tokyo': (35.6762, 139.6503),
+    'Los Angeles': (34.0522, -118.2437), 'San Francisco': (37.7749, -122.4194),
+    'New York': (40.7128, -74.0060), 'Chicago': (41.8781, -87.6298),
+    'Toronto': (43.6532, -79.3832), 'Vancouver': (49.2827, -123.1207), 'Calgary': (51.0447, -114.0719),
+    # Threat locations
+    'Lagos': (6.5244, 3.3792), 'Abuja': (9.0765, 7.3986), 'Moscow': (55.7558, 37.6173),
+    'St. Petersburg': (59.9311, 30.3609), 'Beijing': (39.9042, 116.4074), 'Shanghai': (31.2304, 121.4737),
+    'Pyongyang': (39.0392, 125.7625),
+}
+
+# Fallback when the city is unknown
+COUNTRY_COORDINATES = {
+    'Philippines': (12.8797, 121.7740), 'United Arab Emirates': (23.4241, 53.8478),
+    'Saudi Arabia': (23.8859, 45.0792), 'Qatar': (25.3548, 51.1839), 'Kuwait': (29.3117, 47.4818),
+    'Singapore': (1.3521, 103.8198), 'Hong Kong': (22.3193, 114.1694), 'Japan': (36.2048, 138.2529),
+    'United States': (37.0902, -95.7129), 'Canada': (56.1304, -106.3468), 'Russia': (61.5240, 105.3188),
+    'Nigeria': (9.0820, 8.6753), 'China': (35.8617, 104.1954), 'North Korea': (40.3399, 127.5101),
+}
+
+
+def location_coordinates(country, city):
+    """Best-known coordinates for a login location (None if unknown)"""
+    return CITY_COORDINATES.get(city) or COUNTRY_COORDINATES.get(country)
+
+
+def great_circle_km(origin, destination):
+    """Haversine distance in kilometres between two (lat, lon) points"""
+    lat1, lon1 = map(math.radians, origin)
+    lat2, lon2 = map(math.radians, destination)
+    a = (math.sin((lat2 - lat1) / 2) ** 2
+         + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2)
+    return 2 * EARTH_RADIUS_KM * math.asin(min(1.0, math.sqrt(a)))
+
+
+class LastLoginStore:
+    """Bounded LRU map of user_id -> (timestamp, coordinates, device_type)
+
+    Every entry keeps the login_ts it reflects. With a validator (user_id -> the
+    user's latest stored login_ts), each hit is checked against the database and
+    read through again when another process has stored a newer login since.
+    """
+
+    def __init__(self, capacity=LAST_LOGIN_CAPACITY, loader=None, validator=None):
+        self.capacity = capacity
+        self.loader = loader          # read-through for users not in memory: user_id -> (login_ts, entry)
+        self.validator = validator
+        self._entries = OrderedDict()  # user_id -> (login_ts, entry); (None, None) for a user without logins
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.evictions = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, user_id):
+        with self._lock:
+            cached = self._entries.get(user_id)
+            if cached is not None:
+                self._entries.move_to_end(user_id)
+        if cached is not None and self.validator is not None:
+            latest = self.validator(user_id)
+            if latest is not None and (cached[0] is None or latest > cached[0]):
+                cached = None
+                with self._lock:
+                    self.stale += 1
+        with self._lock:
+            if cached is not None:
+                self.hits += 1
+                return cached[1]
+            self.misses += 1
+
+        loaded = self.loader(user_id) if self.loader else None
+        if loaded is None:
+            with self._lock:
+                # Unless a login was recorded meanwhile
+                if self._entries.get(user_id, (None, None))[0] is None:
+                    self._entries[user_id] = (None, None)
+                    self._entries.move_to_end(user_id)
+                    self._evict()
+            return None
+        login_ts, entry = loaded
+        self.put(user_id, *entry, login_ts=login_ts)
+        # A login recorded meanwhile wins
+        with self._lock:
+            return self._entries.get(user_id, (None, None))[1]
+
+    def put(self, user_id, timestamp, coordinates, device_type, login_ts=None):
+        """login_ts: the stored login's epoch milliseconds (default: timestamp at the server's UTC offset)"""
+        login_ts = to_login_ts(timestamp)[0] if login_ts is None else login_ts
+        with self._lock:
+            current = self._entries.get(user_id)
+            # Out-of-order events never move a user's last login backwards
+            if current is not None and current[0] is not None and current[0] > login_ts:
+                return
+            self._entries[user_id] = (login_ts, (timestamp, coordinates, device_type))
+            self._entries.move_to_end(user_id)
+            self._evict()
+
+    def _evict(self):
+        while len(self._entries) > self.capacity:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def stats(self):
+        return {'users': len(self._entries), 'capacity': self.capacity, 'hits': self.hits,
+                'misses': self.misses, 'stale': self.stale, 'evictions': self.evictions}
+
+
+def _load_last_login(user_id):
+    """Read-through: the user's most recent stored login -> (login_ts, entry)"""
+    from utils.database import get_connection
+
+    conn = get_connection()
+    row = conn.execute('''
+        SELECT login_ts, utc_offset, country, city, device_type
+        FROM login_activities
+        WHERE user_id = ?
+        ORDER BY login_ts DESC
+        LIMIT 1
+    ''', (user_id,)).fetchone()
+    if row is None:
+        return None
+    return row[0], (local_datetime(row[0], row[1]), location_coordinates(row[2], row[3]), row[4])
+
+
+def _latest_login_ts(user_id):
+    """Validator: the user's latest stored login_ts (a seek on idx_login_user_ts)"""
+    from utils.database import get_connection
+
+    return get_connection().execute('SELECT MAX(login_ts) FROM login_activities WHERE user_id = ?',
+                                    (user_id,)).fetchone()[0]
+
+
+def warm_last_login_store(store):
+    """Fill the store with the most recently active users' last logins"""
+    from utils.database import get_connection
+
+    conn = get_connection()
+    # SQLite returns the bare columns from the row that holds MAX()
+    rows = conn.execute('''
+        SELECT user_id, MAX(login_ts) AS last_login, utc_offset, country, city, device_type
+        FROM login_activities
+        GROUP BY user_id
+        ORDER BY last_login DESC
+        LIMIT ?
+    ''', (store.capacity,)).fetchall()
+
+    # Oldest first so the most recent users end up most recently used
+    for user_id, last_login, utc_offset, country, city, device_type in reversed(rows):
+        store.put(user_id, local_datetime(last_login, utc_offset), location_coordinates(country, city), device_type,
+                  login_ts=last_login)
+    print(f"✅ Last-login store warmed with {len(rows):,} users")
+    return len(rows)
+
+
+_store = None
+_store_lock = threading.Lock()
+
+
+def get_last_login_store():
+    """Process-wide last-login store, warmed from the database on first use"""
+    global _store
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                store = LastLoginStore(loader=_load_last_login, validator=_latest_login_ts)
+                try:
+                    warm_last_login_store(store)
+                except Exception as e:
+                    print(f"⚠ Could not warm last-login store: {e}")
+                _store = store
+    return _store
+
+
+def derive_login_features(user_id, country, city, device_type, login_time, staged=None):
+    """
+    time_diff (hours) and distance (km) since the user's previous login.
+    First logins and unknown locations count as 0, like the seeded history.
+    staged: {user_id: last_login_entry()} of a batch not stored yet, looked up before the store
+    """
+    if staged is not None and user_id in staged:
+        previous = staged[user_id]
+    else:
+        previous = get_last_login_store().get(user_id)
+    if previous is None:
+        return 0.0, 0
+
+    previous_time, previous_coordinates, _ = previous
+    time_diff = max(0.0, (login_time - previous_time).total_seconds() / 3600)
+
+    coordinates = location_coordinates(country, city)
+    if coordinates is None or previous_coordinates is None:
+        distance = 0
+    else:
+        distance = round(great_circle_km(previous_coordinates, coordinates))
+    return round(time_diff, 2), distance
+
+
+def last_login_entry(country, city, device_type, login_time):
+    """A login as the store keeps it: (timestamp, coordinates, device_type)"""
+    return login_time, location_coordinates(country, city), device_type
+
+
+def record_login(user_id, country, city, device_type, login_time):
+    """Update the user's last login after an insert"""
+    get_last_login_store().put(user_id, *last_login_entry(country, city, device_type, login_time))
@@ -0,0 +1,136 @@
+# utils/feed.py
+"""
+Live feed behind the dashboard's auto-refresh.
+
+A feed is one session's window of recent login activities plus the
+dashboard numbers. poll_feed() brings it up to date with small reads
+instead of reloading the page's data:
+
+    - rows with id > the last id seen (at most the window size)
+    - rows of the window reviewed since the previous poll
+    - the trigger-maintained counters (see utils.counters), location counts included
+
+Each read is bounded by the window size, the rows added since the last
+poll or a primary key, so a poll costs the same on a thousand logins or
+ten million. poll_feed() returns the parts that changed.
+
+Reviews are matched on reviewed_at, which has one-second resolution and is
+taken just before its transaction commits: every poll looks back
+REVIEW_OVERLAP_SECONDS, and merging a review twice changes nothing.
+"""
+from datetime import datetime, timedelta
+
+import pandas as pd
+
+from utils.activities import query_login_activities
+from utils.counters import counter_totals, detection_accuracy, false_positives_since
+from utils.timestamps import local_today
+
+FEED_SIZE = 50
+REVIEW_OVERLAP_SECONDS = 5
+FALSE_POSITIVE_DAYS = 7
+
+# Columns of the dashboard's activity cards
+FEED_COLUMNS = [
+    '#', 'User ID', 'Login Timestamp (UTC+8)', 'Country', 'device_type', 'Risk %', 'Classification',
+    'AI Action', 'AI Recommendation', 'Analysis Factors', 'Warnings', 'Location Context', 'Admin Action',
+]
+
+# Dashboard label -> counter
+LOCATION_COUNTS = {
+    'OFW Hub Logins': 'ofw_logins',
+    'Domestic Logins': 'domestic_logins',
+}
+
+
+def _reviewed_since(now):
+    return (now - timedelta(seconds=REVIEW_OVERLAP_SECONDS)).strftime('%Y-%m-%d %H:%M:%S')
+
+
+def _numbers(conn):
+    totals = counter_totals(conn)
+    return {
+        'totals': totals,
+        'accuracy': detection_accuracy(totals),
+        'false_positives': false_positives_since(conn, local_today() - timedelta(days=FALSE_POSITIVE_DAYS)),
+        'locations': {label: totals[counter] for label, counter in LOCATION_COUNTS.items()},
+    }
+
+
+def _read_snapshot(conn, read):
+    """Run read(conn) in one read transaction, so its queries see the same commits"""
+    if conn.in_transaction:
+        return read(conn)
+    conn.execute('BEGIN')
+    try:
+        return read(conn)
+    finally:
+        conn.commit()
+
+
+def start_feed(conn, size=FEED_SIZE):
+    """A new feed: the newest `size` logins by time and the current numbers"""
+    def read(conn):
+        now = datetime.now()
+        last_id = conn.execute('SELECT COALESCE(MAX(id), 0) FROM login_activities').fetchone()[0]
+        rows, _ = query_login_activities(conn, FEED_COLUMNS, limit=size)
+        return {
+            'rows': rows,
+            'size': size,
+            'last_id': last_id,
+            'reviewed_since': _reviewed_since(now),
+            'numbers': _numbers(conn),
+        }
+    return _read_snapshot(conn, read)
+
+
+def _merge_reviews(rows, actions):
+    """rows with the {id: admin action} of new reviews applied -> (rows, whether any changed)"""
+    current = rows['Admin Action'].astype(object)
+    merged = pd.Series([actions.get(row_id, action) for row_id, action in zip(rows['#'], current)],
+                       index=rows.index, dtype=object)
+    if merged.equals(current):
+        return rows, False
+    rows = rows.copy()
+    rows['Admin Action'] = merged
+    return rows, True
+
+
+def poll_feed(conn, feed):
+    """Bring feed up to date in place -> set of the parts that changed ('rows', 'numbers')"""
+    def read(conn):
+        now = datetime.now()
+        new_rows = None
+        # Primary-key probe first; most polls find nothing new
+        if conn.execute('SELECT COALESCE(MAX(id), 0) FROM login_activities').fetchone()[0] > feed['last_id']:
+            new_rows, _ = query_login_activities(conn, FEED_COLUMNS, order_by='id', limit=feed['size'],
+                                                 after_id=feed['last_id'])
+        actions = {}
+        if len(feed['rows']):
+            ids = feed['rows']['#'].tolist()
+            actions = dict(conn.execute(f'SELECT id, admin_action FROM login_activities '
+                                        f'WHERE id IN ({", ".join("?" * len(ids))}) AND reviewed_at >= ?',
+                                        ids + [feed['reviewed_since']]))
+        return now, new_rows, actions, _numbers(conn)
+
+    now, new_rows, actions, numbers = _read_snapshot(conn, read)
+    changed = set()
+
+    rows = feed['rows']
+    if actions:
+        rows, reviews_changed = _merge_reviews(rows, actions)
+        if reviews_changed:
+            changed.add('rows')
+    if new_rows is not None and len(new_rows):
+        # Columns whose categories differ between the frames come out as objects, which is fine for display
+        rows = pd.concat([new_rows, rows[~rows['#'].isin(new_rows['#'])]], ignore_index=True).head(feed['size'])
+        feed['last_id'] = max(feed['last_id'], int(new_rows['#'].max()))
+        changed.add('rows')
+    feed['rows'] = rows
+
+    if numbers != feed['numbers']:
+        feed['numbers'] = numbers
+        changed.add('numbers')
+
+    feed['reviewed_since'] = _reviewed_since(now)
+    return changed
@@ -0,0 +1,255 @@
+# utils/inference.py
+"""
+Compile the pickled classifier into flat NumPy arrays so scoring does not go
+through sklearn's predict_proba (input validation, joblib dispatch, per-tree
+Python calls). Supported: DecisionTree/RandomForest/ExtraTrees classifiers and
+linear classifiers with coef_/intercept_. Anything else falls back to sklearn.
+"""
+import numpy as np
+
+# Rows per chunk when scoring batches, keeps the (trees x rows) node matrix small
+BATCH_CHUNK_ROWS = 4096
+
+# Below this many rows it is cheaper to run the single-row kernel per row
+SINGLE_ROW_LOOP_MAX = 32
+
+
+class CompiledForest:
+    """Flattened tree ensemble evaluated with vectorized node traversal"""
+
+    kind = 'forest'
+
+    def __init__(self, feature, threshold, children, value, roots, max_depth, classes, missing_right=None):
+        self.feature = feature        # (nodes,) split feature, 0 for leaves
+        self.threshold = threshold    # (nodes,) split threshold, +inf for leaves
+        self.children = children      # (2 * nodes,) [left, right] per node, leaves point to themselves
+        self.value = value            # (nodes, classes) normalized class probabilities per leaf
+        self.roots = roots            # (trees,) index of each tree's root node
+        self.max_depth = int(max_depth)
+        self.classes_ = classes
+        self.n_trees = len(roots)
+        # (nodes,) True where sklearn sends a missing (NaN) value right; None rejects NaN inputs
+        self.missing_right = missing_right
+
+        # Single-row tables: trees share many (feature, threshold) splits, so each
+        # distinct split is evaluated once per row and nodes just look the answer up.
+        # Node indices are kept doubled so the child lookup needs no multiply.
+        splits, split_of_node = np.unique(np.column_stack([feature, threshold]), axis=0, return_inverse=True)
+        self._split_feature = splits[:, 0].astype(np.intp)
+        self._split_threshold = splits[:, 1]
+        self._split_of_node2 = np.repeat(split_of_node.ravel().astype(np.intp), 2)
+        self._children2 = children * 2
+        self._roots2 = roots * 2
+
+    def _leaves(self, X, missing=False):
+        """Leaf index reached in every tree, shape (trees, rows); missing: X has NaN values"""
+        n = X.shape[0]
+        node = np.repeat(self.roots[:, None], n, axis=1)
+        # Offsets into the flattened row-major X so one take() reads every tree's feature
+        row_offset = (np.arange(n) * X.shape[1])[None, :]
+        flat_x = X.ravel()
+        for _ in range(self.max_depth):
+            x = np.take(flat_x, row_offset + np.take(self.feature, node))
+            go_right = x > np.take(self.threshold, node)
+            if missing:
+                go_right = np.where(np.isnan(x), np.take(self.missing_right, node), go_right)
+            node = np.take(self.children, 2 * node + go_right)
+        return node
+
+    def _leaves_single(self, row):
+        """Leaf index reached in every tree for one row, shape (trees,)"""
+        go_right = (row.take(self._split_feature) > self._split_threshold).astype(np.intp)
+        split_of_node2, children2 = self._split_of_node2, self._children2
+        node2 = self._roots2
+        for _ in range(self.max_depth):
+            node2 = children2.take(node2 + go_right.take(split_of_node2.take(node2)))
+        return node2 >> 1
+
+    def predict_proba(self, X):
+        # sklearn evaluates trees on float32 inputs against float64 thresholds
+        X = np.ascontiguousarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[None, :]
+        missing = np.isnan(X).any(axis=1)
+        if missing.any() and self.missing_right is None:
+            raise ValueError("Input X contains NaN.")
+
+        if X.shape[0] <= SINGLE_ROW_LOOP_MAX:
+            # Sequential sum in tree order, exactly like sklearn's accumulation;
+            # the split tables cannot route NaN, those rows walk the nodes instead
+            return np.vstack([np.cumsum(self.value[self._leaves(row[None, :], True)[:, 0] if has_nan
+                                                   else self._leaves_single(row)], axis=0)[-1] / self.n_trees
+                              for row, has_nan in zip(X, missing)])
+
+        out = np.empty((X.shape[0], self.value.shape[1]))
+        for start in range(0, X.shape[0], BATCH_CHUNK_ROWS):
+            leaves = self._leaves(X[start:start + BATCH_CHUNK_ROWS], missing[start:start + BATCH_CHUNK_ROWS].any())
+            total = self.value[leaves[0]].copy()
+            for tree_leaves in leaves[1:]:
+                total += self.value[tree_leaves]
+            out[start:start + BATCH_CHUNK_ROWS] = total / self.n_trees
+        return out
+
+    def to_arrays(self):
+        arrays = {
+            'kind': np.array(self.kind), 'feature': self.feature, 'threshold': self.threshold,
+            'children': self.children, 'value': self.value, 'roots': self.roots,
+            'max_depth': np.array(self.max_depth), 'classes': self.classes_,
+        }
+        if self.missing_right is not None:
+            arrays['missing_right'] = self.missing_right
+        return arrays
+
+
+class CompiledLinear:
+    """Linear classifier evaluated as a dot product plus logistic/softmax"""
+
+    kind = 'linear'
+
+    def __init__(self, coef, intercept, classes):
+        self.coef = coef              # (outputs, features)
+        self.intercept = intercept    # (outputs,)
+        self.classes_ = classes
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
+        # Like sklearn's linear models, which do not accept missing values
+        if np.isnan(X).any():
+            raise ValueError("Input X contains NaN.")
+        scores = X @ self.coef.T + self.intercept
+        if scores.shape[1] == 1:
+            positive = 1.0 / (1.0 + np.exp(-scores[:, 0]))
+            return np.column_stack([1.0 - positive, positive])
+        scores -= scores.max(axis=1, keepdims=True)
+        np.exp(scores, out=scores)
+        scores /= scores.sum(axis=1, keepdims=True)
+        return scores
+
+    def to_arrays(self):
+        return {'kind': np.array(self.kind), 'coef': self.coef,
+                'intercept': self.intercept, 'classes': self.classes_}
+
+
+def _tree_classifiers(model):
+    """Return the fitted tree estimators if the model is a tree ensemble"""
+    if hasattr(model, 'tree_'):
+        return [model]
+    estimators = getattr(model, 'estimators_', None)
+    if isinstance(estimators, list) and estimators and all(hasattr(e, 'tree_') for e in estimators):
+        # Forests only; boosting ensembles store regressors and need a different combiner
+        if type(model).__name__ in ('RandomForestClassifier', 'ExtraTreesClassifier'):
+            return estimators
+    return None
+
+
+def _compile_forest(model, trees):
+    features, thresholds, children, values, roots, missing_right = [], [], [], [], [], []
+    offset = 0
+    max_depth = 0
+    for estimator in trees:
+        tree = estimator.tree_
+        if tree.n_outputs != 1:
+            return None
+        n = tree.node_count
+        is_leaf = tree.children_left == -1
+        own_index = np.arange(n) + offset
+
+        left = np.where(is_leaf, own_index, tree.children_left + offset)
+        right = np.where(is_leaf, own_index, tree.children_right + offset)
+
+        value = tree.value[:, 0, :].astype(np.float64)
+        normalizer = value.sum(axis=1, keepdims=True)
+        normalizer[normalizer == 0.0] = 1.0
+
+        features.append(np.where(is_leaf, 0, tree.feature))
+        thresholds.append(np.where(is_leaf, np.inf, tree.threshold))
+        children.append(np.column_stack([left, right]).ravel())
+        values.append(value / normalizer)
+        roots.append(offset)
+        # sklearn routes NaN by missing_go_to_left (learnt, or towards the larger child when fit without NaN)
+        missing_left = getattr(tree, 'missing_go_to_left', None)
+        missing_right.append(None if missing_left is None else ~np.asarray(missing_left, dtype=bool))
+        max_depth = max(max_depth, tree.max_depth)
+        offset += n
+
+    return CompiledForest(
+        feature=np.concatenate(features).astype(np.intp),
+        threshold=np.concatenate(thresholds).astype(np.float64),
+        children=np.concatenate(children).astype(np.intp),
+        value=np.concatenate(values),
+        roots=np.array(roots, dtype=np.intp),
+        max_depth=max_depth,
+        classes=np.asarray(model.classes_),
+        missing_right=None if any(m is None for m in missing_right) else np.concatenate(missing_right),
+    )
+
+
+def _compile_linear(model):
+    coef = np.atleast_2d(np.asarray(model.coef_, dtype=np.float64))
+    intercept = np.atleast_1d(np.asarray(model.intercept_, dtype=np.float64))
+    if not hasattr(model, 'predict_proba'):
+        return None
+    return CompiledLinear(coef, intercept, np.asarray(model.classes_))
+
+
+def compile_model(model):
+    """
+    Compile a fitted classifier to flat arrays.
+    Returns the compiled model, or the original model if it is unsupported
+    (parity with sklearn is covered by tests/test_inference.py).
+    """
+    if model is None:
+        return None
+
+    try:
+        trees = _tree_classifiers(model)
+        if trees is not None:
+            compiled = _compile_forest(model, trees)
+        elif hasattr(model, 'coef_') and hasattr(model, 'intercept_'):
+            compiled = _compile_linear(model)
+        else:
+            compiled = None
+
+        if compiled is None:
+            print(f"   Compiled inference not supported for {type(model).__name__} - using sklearn")
+            return model
+    except Exception as e:
+        print(f"⚠ Model compilation failed - using sklearn: {e}")
+        return model
+
+    print(f"   Compiled {type(model).__name__} to NumPy arrays")
+    return compiled
+
+
+def save_compiled(compiled, path):
+    """Write a compiled model to .npz so it can be loaded without sklearn"""
+    np.savez_compressed(path, **compiled.to_arrays())
+
+
+def load_compiled(path):
+    """Load a model written by save_compiled()"""
+    with np.load(path, allow_pickle=False) as data:
+        kind = str(data['kind'])
+        if kind == CompiledForest.kind:
+            return CompiledForest(data['feature'], data['threshold'], data['children'], data['value'],
+                                  data['roots'], int(data['max_depth']), data['classes'],
+                                  data['missing_right'] if 'missing_right' in data.files else None)
+        if kind == CompiledLinear.kind:
+            return CompiledLinear(data['coef'], data['intercept'], data['classes'])
+    raise ValueError(f"Unknown compiled model kind: {kind}")
+
+
+if __name__ == '__main__':
+    # python -m utils.inference bantai_model.pkl bantai_model_compiled.npz
+    import sys
+    from utils.model_manager import _load_from_disk
+
+    source, target = sys.argv[1], sys.argv[2]
+    model = _load_from_disk(source)[0]
+    compiled = compile_model(model)
+    if compiled is model:
+        sys.exit(f"❌ {type(model).__name__} cannot be compiled")
+    save_compiled(compiled, target)
+    print(f"✅ Compiled model written to {target}")
@@ -0,0 +1,205 @@
+# utils/ingest.py
+"""
+Write-behind ingestion for scored logins.
+
+With BANTAI_INGEST=queue the login decision is returned as soon as it is
+made; the row goes onto a bounded in-memory queue and a single writer thread
+stores it with the rest of its group:
+
+    - a group is committed when it reaches BANTAI_INGEST_BATCH_SIZE rows or
+      BANTAI_INGEST_FLUSH_MS after its first row arrived, whichever is first
+    - when the queue is full (or a commit fails) rows are appended to a spill
+      file next to the database and fsynced, then replayed once the queue
+      has drained; a spill file left by a crash is replayed at start
+    - stop(), also registered with atexit, drains the queue and the spill
+      file before returning
+
+Rows reach the database up to one flush interval after the decision, so the
+dashboard counters lag by about that much.
+
+Metrics: gauges ingest_queue_depth, ingest_spill_rows and
+ingest_last_batch_size; counters ingest_batches, ingest_rows, ingest_spilled
+and ingest_failed_batches; histogram ingest_commit.
+"""
+import atexit
+import json
+import os
+import queue
+import threading
+import time
+
+from utils.metrics import timed, increment, set_gauge
+
+QUEUE_SIZE = int(os.environ.get('BANTAI_INGEST_QUEUE_SIZE', '10000'))
+BATCH_SIZE = int(os.environ.get('BANTAI_INGEST_BATCH_SIZE', '500'))
+FLUSH_MS = float(os.environ.get('BANTAI_INGEST_FLUSH_MS', '200'))
+
+_enabled = os.environ.get('BANTAI_INGEST', 'sync') == 'queue'
+_queues = {}
+_queues_lock = threading.Lock()
+
+
+class IngestQueue:
+    """Bounded queue drained by one writer thread in group commits"""
+
+    def __init__(self, insert, spill_path, max_size=QUEUE_SIZE, batch_size=BATCH_SIZE, flush_ms=FLUSH_MS):
+        self.insert = insert
+        self.spill_path = spill_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000
+        self.queue = queue.Queue(maxsize=max_size)
+        self.spill_rows = 0
+        self._spill_lock = threading.Lock()
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        # A replay interrupted by a crash goes back into the spill file
+        replay_path = self.spill_path + '.replay'
+        if os.path.exists(replay_path):
+            with open(replay_path, encoding='utf-8') as replay, open(self.spill_path, 'a', encoding='utf-8') as spill:
+                spill.write(replay.read())
+            os.remove(replay_path)
+        if os.path.exists(self.spill_path):
+            with open(self.spill_path, encoding='utf-8') as spill:
+                self.spill_rows = sum(1 for _ in spill)
+        self._thread = threading.Thread(target=self._run, name='bantai-ingest', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout=None):
+        """Write everything still queued or spilled, then stop the writer"""
+        if self._thread is None:
+            return
+        self._stopping.set()
+        self._thread.join(timeout)
+        self._thread = None
+
+    def submit(self, rows):
+        """Queue rows for writing; never blocks (overflow goes to the spill file)"""
+        overflow = []
+        for row in rows:
+            try:
+                self.queue.put_nowait(row)
+            except queue.Full:
+                overflow.append(row)
+        if overflow:
+            self._spill(overflow)
+            increment('ingest_spilled', len(overflow))
+        set_gauge('ingest_queue_depth', self.queue.qsize())
+
+    def _spill(self, rows):
+        with self._spill_lock:
+            with open(self.spill_path, 'a', encoding='utf-8') as spill:
+                for row in rows:
+                    # numpy scalars from the feature pipeline serialise as plain numbers
+                    spill.write(json.dumps(row, default=lambda value: value.item()) + '\n')
+                spill.flush()
+                os.fsync(spill.fileno())
+            self.spill_rows += len(rows)
+            set_gauge('ingest_spill_rows', self.spill_rows)
+
+    def _collect(self):
+        """Wait for one row, then take more until the batch is full or the flush interval is up"""
+        try:
+            batch = [self.queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self.queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        try:
+            with timed('ingest_commit'):
+                self.insert(batch)
+        except Exception as e:
+            # Keep the rows; they are retried from the spill file
+            print(f"⚠ Ingest commit of {len(batch)} rows failed, spilling to disk: {e}")
+            increment('ingest_failed_batches')
+            self._spill(batch)
+            return False
+        increment('ingest_batches')
+        increment('ingest_rows', len(batch))
+        set_gauge('ingest_last_batch_size', len(batch))
+        return True
+
+    def _replay_spill(self):
+        """Move the spill file aside and write it back in batches; False if a batch failed again"""
+        with self._spill_lock:
+            if not os.path.exists(self.spill_path):
+                return True
+            replay_path = self.spill_path + '.replay'
+            os.replace(self.spill_path, replay_path)
+            self.spill_rows = 0
+        with open(replay_path, encoding='utf-8') as spill:
+            rows = [tuple(json.loads(line)) for line in spill if line.strip()]
+        failed = False
+        for start in range(0, len(rows), self.batch_size):
+            if failed:
+                self._spill(rows[start:start + self.batch_size])
+            else:
+                failed = not self._write(rows[start:start + self.batch_size])
+        os.remove(replay_path)
+        set_gauge('ingest_spill_rows', self.spill_rows)
+        return not failed
+
+    def _run(self):
+        # Rows left by an earlier process go first
+        self._replay_spill()
+        while True:
+            batch = self._collect()
+            set_gauge('ingest_queue_depth', self.queue.qsize())
+            if batch:
+                self._write(batch)
+            elif self.spill_rows:
+                # Idle: catch up on rows that overflowed; back off if the database still refuses them
+                if not self._replay_spill():
+                    self._stopping.wait(1)
+            if self._stopping.is_set() and self.queue.empty():
+                break
+        if self.spill_rows:
+            self._replay_spill()
+
+
+def ingest_enabled():
+    return _enabled
+
+
+def set_ingest_enabled(enabled):
+    """Switch between write-behind and synchronous inserts (queued rows are flushed first)"""
+    global _enabled
+    if not enabled:
+        flush_all()
+    _enabled = bool(enabled)
+
+
+def get_ingest_queue(database_path, insert):
+    """The running queue for a database, started on first use"""
+    ingest = _queues.get(database_path)
+    if ingest is None:
+        with _queues_lock:
+            ingest = _queues.get(database_path)
+            if ingest is None:
+                ingest = IngestQueue(insert, database_path + '.spill.jsonl')
+                ingest.start()
+                _queues[database_path] = ingest
+    return ingest
+
+
+def flush_all():
+    """Stop every queue after writing what it holds"""
+    with _queues_lock:
+        queues = list(_queues.values())
+        _queues.clear()
+    for ingest in queues:
+        ingest.stop()
+
+
+atexit.register(flush_all)
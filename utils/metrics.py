@@ -0,0 +1,159 @@
+# utils/metrics.py
+"""
+Lightweight in-process latency histograms and counters for the scoring pipeline.
+
+    with timed('predict_proba'):
+        model.predict_proba(features)
+
+When disabled (BANTAI_METRICS=0) timed() hands back a shared no-op context
+manager, so the hooks cost one function call and an attribute check.
+"""
+import os
+import threading
+import time
+from datetime import datetime
+
+# Fixed histogram bucket upper bounds in milliseconds (last bucket catches everything else)
+BUCKETS_MS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, float('inf'))
+
+_enabled = os.environ.get('BANTAI_METRICS', '1') != '0'
+_lock = threading.Lock()
+_histograms = {}
+_counters = {}
+_gauges = {}
+_started_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+class Histogram:
+    """Fixed-bucket latency histogram"""
+
+    def __init__(self):
+        self.counts = [0] * len(BUCKETS_MS)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def observe(self, ms):
+        index = 0
+        while ms > BUCKETS_MS[index]:
+            index += 1
+        with _lock:
+            self.counts[index] += 1
+            self.count += 1
+            self.total_ms += ms
+            if ms > self.max_ms:
+                self.max_ms = ms
+
+    def percentile(self, q):
+        """Upper bound of the bucket holding the q-th percentile"""
+        if self.count == 0:
+            return None
+        target = q / 100 * self.count
+        seen = 0
+        for bound, count in zip(BUCKETS_MS, self.counts):
+            seen += count
+            if seen >= target:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def snapshot(self):
+        return {
+            'count': self.count,
+            'mean_ms': self.total_ms / self.count if self.count else None,
+            'p50_ms': self.percentile(50),
+            'p90_ms': self.percentile(90),
+            'p99_ms': self.percentile(99),
+            'max_ms': self.max_ms if self.count else None,
+            'buckets': list(self.counts),
+        }
+
+
+class _Timer:
+    __slots__ = ('histogram', 'started')
+
+    def __init__(self, histogram):
+        self.histogram = histogram
+
+    def __enter__(self):
+        self.started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.histogram.observe((time.perf_counter() - self.started) * 1000)
+        return False
+
+
+class _NoopTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+_NOOP = _NoopTimer()
+
+
+def _histogram(name):
+    histogram = _histograms.get(name)
+    if histogram is None:
+        with _lock:
+            histogram = _histograms.setdefault(name, Histogram())
+    return histogram
+
+
+def timed(stage):
+    """Context manager recording the wall time of a pipeline stage"""
+    if not _enabled:
+        return _NOOP
+    return _Timer(_histogram(stage))
+
+
+def observe_ms(stage, ms):
+    """Record an already measured duration"""
+    if _enabled:
+        _histogram(stage).observe(ms)
+
+
+def increment(name, amount=1):
+    """Bump a counter; counters are kept even when timing is disabled"""
+    with _lock:
+        _counters[name] = _counters.get(name, 0) + amount
+
+
+def set_gauge(name, value):
+    """Record the latest value of a level-type metric (queue depth etc.)"""
+    _gauges[name] = value
+
+
+def metrics_enabled():
+    return _enabled
+
+
+def set_metrics_enabled(enabled):
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def reset_metrics():
+    global _started_at
+    with _lock:
+        _histograms.clear()
+        _counters.clear()
+        _gauges.clear()
+        _started_at = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+
+
+def metrics_snapshot():
+    """Machine-readable dump of every histogram and counter"""
+    return {
+        'enabled': _enabled,
+        'since': _started_at,
+        'taken_at': datetime.now().strftime('%Y-%m-%d %H:%M:%S'),
+        'buckets_ms': [b if b != float('inf') else 'inf' for b in BUCKETS_MS],
+        'histograms': {name: h.snapshot() for name, h in sorted(_histograms.items())},
+        'counters': dict(sorted(_counters.items())),
+        'gauges': dict(sorted(_gauges.items())),
+    }
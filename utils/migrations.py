@@ -0,0 +1,374 @@
+# utils/migrations.py
+"""
+Numbered, forward-only schema migrations for the BantAI database.
+
+    python -m utils.migrations [--database bantai_security.db] [--check] [--vacuum]
+
+Applied migrations are recorded in schema_version. Every migration runs in
+its own transaction and keeps existing login history; a column is only
+dropped after its data has been converted into the replacement columns.
+--vacuum reclaims the space such conversions free. --check runs EXPLAIN QUERY PLAN on
+the hot queries each migration is meant to speed up and fails if any of them
+still scans the table.
+"""
+import argparse
+import json
+import sqlite3
+import sys
+from datetime import datetime
+
+from utils.analysis_codes import check_code_space, create_analysis_texts, encode_analysis, unknown_texts
+from utils.archive import CREATE_ARCHIVE_FILES_SQL
+from utils.counters import create_counter_triggers, create_counters
+from utils.profiles import CREATE_USER_PROFILES_SQL, rebuild_user_profiles
+from utils.review_queue import CLAIM_SQL, OLDEST_PENDING_SQL, create_review_queue
+from utils.rollups import create_rollup_triggers, create_rollups
+from utils.similarity import create_similarity_indexes, neighbor_sql
+from utils.timestamps import UTC_OFFSET_MINUTES, local_time_sql
+
+SCHEMA_VERSION_SQL = '''
+    CREATE TABLE IF NOT EXISTS schema_version (
+        version INTEGER PRIMARY KEY,
+        name VARCHAR(100) NOT NULL,
+        applied_at TIMESTAMP NOT NULL
+    )
+'''
+
+
+def _baseline(conn):
+    """Tables as the app originally created them"""
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS users (
+            user_id VARCHAR(50) PRIMARY KEY,
+            username VARCHAR(100),
+            email VARCHAR(255),
+            home_locations TEXT,  -- JSON array
+            common_devices TEXT,  -- JSON array
+            created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+        )
+    ''')
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS login_activities (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id VARCHAR(50),
+            login_timestamp TIMESTAMP,
+            country VARCHAR(100),
+            city VARCHAR(100),
+            time_diff_hrs DECIMAL(10,2),
+            distance_km INTEGER,
+            device_type VARCHAR(50),
+            latency_ms INTEGER,
+            login_successful BOOLEAN,
+            is_attack_ip BOOLEAN,
+
+            -- Enhanced model output fields
+            risk_score DECIMAL(10,6),
+            risk_percentage DECIMAL(5,2),
+            risk_classification VARCHAR(10),
+            recommended_action VARCHAR(20),
+            recommendation_text TEXT,
+            analysis_factors TEXT,  -- JSON array
+            warnings TEXT,  -- JSON array
+            behavior_consistency INTEGER,
+            location_context VARCHAR(100),
+
+            -- Admin action
+            admin_action VARCHAR(100) DEFAULT 'Pending Review',
+            reviewed_at TIMESTAMP,
+            reviewed_by VARCHAR(100),
+
+            FOREIGN KEY (user_id) REFERENCES users(user_id)
+        )
+    ''')
+
+
+def _columns(conn, table):
+    return [row[1] for row in conn.execute(f'PRAGMA table_info({table})')]
+
+
+def _model_version_column(conn):
+    """Model that produced each row's risk score"""
+    if 'model_version' not in _columns(conn, 'login_activities'):
+        conn.execute('ALTER TABLE login_activities ADD COLUMN model_version VARCHAR(20)')
+
+
+def _rescore_checkpoints(conn):
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS rescore_checkpoints (
+            job_id VARCHAR(100) PRIMARY KEY,
+            model_version VARCHAR(20),
+            last_id INTEGER NOT NULL DEFAULT 0,
+            rows_done INTEGER NOT NULL DEFAULT 0,
+            started_at TIMESTAMP,
+            updated_at TIMESTAMP,
+            finished_at TIMESTAMP
+        )
+    ''')
+
+
+def _user_profiles(conn):
+    """Per-user behavior profiles, backfilled from existing history"""
+    conn.execute(CREATE_USER_PROFILES_SQL)
+    rebuild_user_profiles(conn)
+
+
+def _login_activity_indexes(conn):
+    """Indexes for every column the pages filter, group or sort on"""
+    # Timeline and per-user pattern queries; also serves the last-login lookup
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_login_user_time ON login_activities (user_id, login_timestamp)')
+    # Recent-first listings and date-range trends
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_login_timestamp ON login_activities (login_timestamp)')
+    # KPI counts; single-column indexes make these COUNTs index-only
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_login_risk ON login_activities (risk_percentage)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_login_action ON login_activities (recommended_action)')
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_login_attack_ip ON login_activities (is_attack_ip)')
+    # Review outcomes, covering the accuracy query's risk filter
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_login_admin_action ON login_activities (admin_action, risk_percentage)')
+
+
+def _analysis_chunks(conn, chunk_size):
+    """(ids, factor lists, warning lists, consistency, location context, device type) of the JSON rows, by id"""
+    last_id = 0
+    while True:
+        rows = conn.execute('''
+            SELECT id, analysis_factors, warnings, behavior_consistency, location_context, device_type
+            FROM login_activities WHERE id > ? ORDER BY id LIMIT ?
+        ''', (last_id, chunk_size)).fetchall()
+        if not rows:
+            return
+        ids, factors, warnings, consistency, context, device = zip(*rows)
+        yield (ids, [json.loads(value) if value else [] for value in factors],
+               [json.loads(value) if value else [] for value in warnings], consistency, context, device)
+        last_id = ids[-1]
+
+
+def _coded_analysis(conn, chunk_size=20000):
+    """analysis_factors/warnings JSON -> factor_codes/warning_mask plus the analysis_texts dictionary"""
+    create_analysis_texts(conn)
+    columns = _columns(conn, 'login_activities')
+    for column in ('factor_codes', 'warning_mask'):
+        if column not in columns:
+            conn.execute(f'ALTER TABLE login_activities ADD COLUMN {column} INTEGER')
+
+    # Fail before converting any row if the stored texts do not fit the code space
+    new_factors, new_warnings = set(), set()
+    for _, *chunk in _analysis_chunks(conn, chunk_size):
+        factors, warnings = unknown_texts(conn, *chunk)
+        new_factors |= factors
+        new_warnings |= warnings
+    check_code_space(conn, new_factors, new_warnings)
+
+    for ids, *chunk in _analysis_chunks(conn, chunk_size):
+        factor_codes, warning_masks = encode_analysis(conn, *chunk)
+        conn.executemany('UPDATE login_activities SET factor_codes = ?, warning_mask = ? WHERE id = ?',
+                         zip(factor_codes, warning_masks, ids))
+
+    # The rollup triggers read the warnings column, switch them to warning_mask before dropping it
+    create_rollup_triggers(conn)
+    if sqlite3.sqlite_version_info >= (3, 35, 0):
+        conn.execute('ALTER TABLE login_activities DROP COLUMN analysis_factors')
+        conn.execute('ALTER TABLE login_activities DROP COLUMN warnings')
+    else:
+        conn.execute('UPDATE login_activities SET analysis_factors = NULL, warnings = NULL')
+
+
+def _epoch_timestamps(conn):
+    """login_timestamp text -> login_ts epoch milliseconds plus utc_offset, and the login_activities_local view"""
+    columns = _columns(conn, 'login_activities')
+    for column in ('login_ts', 'utc_offset'):
+        if column not in columns:
+            conn.execute(f'ALTER TABLE login_activities ADD COLUMN {column} INTEGER')
+
+    # Stored text is the server's local time (see utils.timestamps)
+    conn.execute('''
+        UPDATE login_activities
+        SET utc_offset = ?,
+            login_ts = CAST(ROUND((julianday(login_timestamp) - 2440587.5) * 86400000) AS INTEGER) - ? * 60000
+    ''', (UTC_OFFSET_MINUTES, UTC_OFFSET_MINUTES))
+
+    conn.execute('DROP INDEX IF EXISTS idx_login_user_time')
+    conn.execute('DROP INDEX IF EXISTS idx_login_timestamp')
+    # Per-user timelines and last logins; covers the daily risk trend so it never touches the table
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_login_user_ts ON login_activities '
+                 '(user_id, login_ts, utc_offset, risk_percentage, behavior_consistency)')
+    # Recent-first listings and date ranges
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_login_ts ON login_activities (login_ts)')
+
+    # Rebuild the triggers on login_ts before the text column goes
+    create_counter_triggers(conn)
+    create_rollup_triggers(conn)
+    if sqlite3.sqlite_version_info >= (3, 35, 0):
+        conn.execute('ALTER TABLE login_activities DROP COLUMN login_timestamp')
+    else:
+        conn.execute('UPDATE login_activities SET login_timestamp = NULL')
+    _local_view(conn)
+
+
+def _local_view(conn):
+    """login_activities with the local login_timestamp text column, for queries written against the old schema"""
+    columns = [column for column in _columns(conn, 'login_activities') if column != 'login_timestamp']
+    conn.execute('DROP VIEW IF EXISTS login_activities_local')
+    conn.execute(f'''
+        CREATE VIEW login_activities_local AS
+        SELECT {", ".join(columns[:2])}, {local_time_sql()} AS login_timestamp, {", ".join(columns[2:])}
+        FROM login_activities
+    ''')
+
+
+def _archive_files(conn):
+    """Manifest of the Parquet files archived login history was moved to (see utils.archive)"""
+    conn.execute(CREATE_ARCHIVE_FILES_SQL)
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_archive_files_ts ON archive_files (min_login_ts, max_login_ts)')
+
+
+# (version, name, apply, [(query, params)] that must be served by an index afterwards)
+MIGRATIONS = [
+    (1, 'baseline', _baseline, []),
+    (2, 'login_activities.model_version', _model_version_column, []),
+    (3, 'rescore_checkpoints', _rescore_checkpoints, []),
+    (4, 'user_profiles', _user_profiles, [
+        ('SELECT * FROM user_profiles WHERE user_id = ?', ['U_1023']),
+    ]),
+    # Timestamp queries moved to version 9 with the column they use
+    (5, 'login_activities indexes', _login_activity_indexes, [
+        ('SELECT country, city, COUNT(*) FROM login_activities WHERE user_id = ? GROUP BY country, city', ['U_1023']),
+        ('SELECT COUNT(*) FROM login_activities WHERE risk_percentage >= 70', []),
+        ("SELECT COUNT(*) FROM login_activities WHERE recommended_action = 'BLOCK'", []),
+        ("SELECT COUNT(*) FROM login_activities WHERE recommended_action = 'ALLOW_WITH_OTP'", []),
+        ('SELECT COUNT(*) FROM login_activities WHERE is_attack_ip = 1', []),
+        ("SELECT COUNT(*) FROM login_activities WHERE admin_action = 'False Positive'", []),
+        ("SELECT COUNT(*) FROM login_activities "
+         "WHERE admin_action IN ('False Positive', 'True Positive - Blocked', 'Confirmed Correct')", []),
+    ]),
+    (6, 'dashboard_counters', create_counters, [
+        ('SELECT * FROM dashboard_counters WHERE id = 1', []),
+        ("SELECT SUM(count) FROM false_positive_daily WHERE day >= DATE('now', '-7 days')", []),
+    ]),
+    (7, 'login rollups', create_rollups, [
+        ('SELECT * FROM login_rollup_hourly WHERE bucket BETWEEN ? AND ? ORDER BY bucket',
+         ['2026-01-01 00:00:00', '2026-01-02 00:00:00']),
+        ('SELECT * FROM login_rollup_daily WHERE bucket BETWEEN ? AND ? ORDER BY bucket',
+         ['2026-01-01', '2026-01-31']),
+    ]),
+    (8, 'coded analysis factors and warnings', _coded_analysis, []),
+    (9, 'epoch millisecond login timestamps', _epoch_timestamps, [
+        ('SELECT * FROM login_activities WHERE user_id = ? ORDER BY login_ts ASC', ['U_1023']),
+        ('SELECT * FROM login_activities ORDER BY login_ts DESC, id DESC LIMIT ?', [50]),
+        ('SELECT * FROM login_activities WHERE login_ts >= ? AND login_ts < ? ORDER BY login_ts DESC',
+         [1767225600000, 1769904000000]),
+        ('SELECT (login_ts + utc_offset * 60000) / 86400000 AS day, AVG(risk_percentage) FROM login_activities '
+         'WHERE user_id = ? AND login_ts >= ? GROUP BY day', ['U_1023', 1767225600000]),
+    ]),
+    (10, 'archive_files', _archive_files, [
+        # The archival job's batch selection
+        ('SELECT id FROM login_activities WHERE login_ts < ? ORDER BY login_ts, id LIMIT ?', [1767225600000, 50000]),
+        ('SELECT path FROM archive_files WHERE max_login_ts >= ? AND min_login_ts < ?',
+         [1767225600000, 1769904000000]),
+    ]),
+    (11, 'review queue', create_review_queue, [
+        (CLAIM_SQL, [1767225600000, 10]),
+        (OLDEST_PENDING_SQL, []),
+        ('SELECT activity_id FROM review_leases WHERE leased_until <= ?', [1767225600000]),
+    ]),
+    (12, 'similarity indexes', create_similarity_indexes, [
+        (neighbor_sql(27), ['Dubai', 'mobile', *range(27), 2000]),
+        (neighbor_sql(27, same_user=True, pending_only=True),
+         ['U_1023', 'Dubai', 'mobile', *range(27), 1767225600000, 'admin', 2000]),
+    ]),
+    (13, 'location counters', create_counters, []),
+]
+
+LATEST_VERSION = MIGRATIONS[-1][0]
+
+
+def current_version(conn):
+    conn.execute(SCHEMA_VERSION_SQL)
+    return conn.execute('SELECT COALESCE(MAX(version), 0) FROM schema_version').fetchone()[0]
+
+
+def migrate(conn, target=LATEST_VERSION):
+    """Apply every pending migration up to target; returns the resulting version"""
+    version = current_version(conn)
+    conn.commit()
+    for number, name, apply, _ in MIGRATIONS:
+        if number <= version or number > target:
+            continue
+        # Take the write lock first so concurrent processes apply each migration once
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            if current_version(conn) >= number:
+                conn.rollback()
+                version = number
+                continue
+            apply(conn)
+            conn.execute('INSERT INTO schema_version (version, name, applied_at) VALUES (?, ?, ?)',
+                         (number, name, datetime.now().strftime('%Y-%m-%d %H:%M:%S')))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        print(f"✅ Applied migration {number}: {name}")
+        version = number
+    return version
+
+
+def query_plan(conn, query, params=()):
+    """EXPLAIN QUERY PLAN detail lines"""
+    return [row[-1] for row in conn.execute(f'EXPLAIN QUERY PLAN {query}', params)]
+
+
+# Indexes a LIMITed query may walk in order: it stops after the first rows
+ORDERED_SCAN_INDEXES = ('idx_login_ts', 'idx_review_queue')
+
+
+def _uses_index(plan):
+    """True when every step of the plan searches an index or walks one of ORDERED_SCAN_INDEXES
+
+    SCAN ... USING [COVERING] INDEX reads the whole index, no better than a table scan.
+    """
+    for step in plan:
+        if step.startswith('SCAN') and step.split()[-1] not in ORDERED_SCAN_INDEXES:
+            return False
+    return True
+
+
+def check_query_plans(conn):
+    """Hot queries whose plan does not use an index -> [(version, query, plan)]"""
+    failures = []
+    for number, _, _, checks in MIGRATIONS:
+        for query, params in checks:
+            plan = query_plan(conn, query, params)
+            if not _uses_index(plan):
+                failures.append((number, query, plan))
+    return failures
+
+
+def main():
+    from utils import database
+
+    parser = argparse.ArgumentParser(description="Apply pending schema migrations")
+    parser.add_argument('--database', default=database.DATABASE_PATH)
+    parser.add_argument('--check', action='store_true', help="verify the hot queries use an index")
+    parser.add_argument('--vacuum', action='store_true', help="rewrite the file to reclaim free pages")
+    args = parser.parse_args()
+
+    database.DATABASE_PATH = args.database
+    conn = database.get_connection()
+    version = migrate(conn)
+    print(f"Schema version {version}")
+
+    if args.vacuum:
+        conn.execute('VACUUM')
+        print("✅ Database vacuumed")
+
+    if args.check:
+        failures = check_query_plans(conn)
+        for number, query, plan in failures:
+            print(f"❌ migration {number}: {' '.join(query.split())}\n   {'; '.join(plan)}")
+        if failures:
+            sys.exit(1)
+        print("✅ All hot queries use an index")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,233 @@
+# utils/model_manager.py
+import os
+import pickle
+import hashlib
+import threading
+import time
+from datetime import datetime
+
+from utils.inference import compile_model
+from utils.score_lut import load_lut
+
+MODEL_PATH = os.environ.get('BANTAI_MODEL_PATH', 'bantai_model.pkl')
+
+# How often (seconds) callers are allowed to stat the model file for changes
+RELOAD_CHECK_INTERVAL = float(os.environ.get('BANTAI_MODEL_CHECK_INTERVAL', '5'))
+
+# Score with the NumPy-compiled model instead of sklearn's predict_proba
+COMPILED_INFERENCE = os.environ.get('BANTAI_COMPILED_INFERENCE', '1') != '0'
+
+# sklearn's Cython tree walk wins once batches get large
+COMPILED_MAX_BATCH_ROWS = 128
+
+# 'model' scores with the (compiled) model, 'lut' with the precomputed score table
+SCORING_MODE = os.environ.get('BANTAI_SCORING_MODE', 'model')
+LUT_PATH = os.environ.get('BANTAI_LUT_PATH', 'bantai_score_lut.npz')
+LUT_INTERPOLATE = os.environ.get('BANTAI_LUT_INTERPOLATE', '0') == '1'
+
+# The active model and its metadata live in one dict that is replaced as a
+# whole on reload, so readers always see a consistent (model, version) pair
+# without taking a lock.
+_active = {
+    'model': None,
+    'compiled': None,
+    'lut': None,
+    'version': None,
+    'mtime': None,
+    'size': None,
+}
+
+_status = {
+    'path': MODEL_PATH,
+    'version': None,
+    'model_type': None,
+    'compiled': False,
+    'scoring_mode': 'model',
+    'lut_max_error': None,
+    'loaded_at': None,
+    'load_seconds': None,
+    'last_reload_at': None,
+    'last_reload_status': 'not_loaded',
+    'last_reload_error': None,
+    'reload_count': 0,
+    'failed_reload_count': 0,
+}
+
+_load_lock = threading.Lock()
+_initialized = False
+_last_check = 0.0
+
+
+def _extract_model(model_data):
+    """Pull the estimator out of the pickled artifact"""
+    # The training notebook saves a dictionary with the model and its metadata
+    if isinstance(model_data, dict):
+        if 'model' in model_data:
+            return model_data['model']
+        elif 'classifier' in model_data:
+            return model_data['classifier']
+        raise KeyError(f"No model found in artifact keys: {list(model_data.keys())}")
+    # It's already the model object
+    return model_data
+
+
+def _load_from_disk(path):
+    """Read, hash and unpickle the model file"""
+    stat = os.stat(path)
+    with open(path, 'rb') as f:
+        raw = f.read()
+    version = hashlib.sha256(raw).hexdigest()[:12]
+    model = _extract_model(pickle.loads(raw))
+    return model, version, stat.st_mtime, stat.st_size
+
+
+def _swap_in(path, force=False):
+    """Load the model file and atomically replace the active model.
+
+    Must be called with _load_lock held.
+    """
+    global _active
+
+    _status['last_reload_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    started = time.perf_counter()
+    try:
+        model, version, mtime, size = _load_from_disk(path)
+    except FileNotFoundError:
+        _status['last_reload_status'] = 'missing'
+        _status['last_reload_error'] = f"Model file not found: {path}"
+        print(f"⚠ Model file not found ({path}) - using dummy predictions")
+        return False
+    except Exception as e:
+        # Keep serving the previous model if the new artifact is broken
+        _status['last_reload_status'] = 'failed'
+        _status['last_reload_error'] = str(e)
+        _status['failed_reload_count'] += 1
+        print(f"❌ Model reload failed, keeping version {_active['version']}: {e}")
+        return False
+
+    if version == _active['version'] and not force:
+        # File was touched but the content is identical
+        _active = dict(_active, mtime=mtime, size=size)
+        _status['last_reload_status'] = 'unchanged'
+        _status['last_reload_error'] = None
+        return True
+
+    compiled = compile_model(model) if COMPILED_INFERENCE else model
+    if compiled is model:
+        compiled = None
+    lut = _load_score_table(version) if SCORING_MODE == 'lut' else None
+
+    _active = {'model': model, 'compiled': compiled, 'lut': lut, 'version': version, 'mtime': mtime, 'size': size}
+
+    _status.update({
+        'path': path,
+        'version': version,
+        'model_type': type(model).__name__,
+        'compiled': compiled is not None,
+        'scoring_mode': 'lut' if lut is not None else 'model',
+        'lut_max_error': lut.errors.get(('interpolated' if lut.interpolate else 'cells') + '_max') if lut else None,
+        'loaded_at': _status['last_reload_at'],
+        'load_seconds': time.perf_counter() - started,
+        'last_reload_status': 'ok',
+        'last_reload_error': None,
+    })
+    _status['reload_count'] += 1
+    print(f"✅ ML model loaded successfully (version {version}, {type(model).__name__})")
+    return True
+
+
+def _load_score_table(version):
+    """The score lookup table for this model version, or None to score with the model"""
+    try:
+        lut = load_lut(LUT_PATH, interpolate=LUT_INTERPOLATE)
+    except FileNotFoundError:
+        print(f"⚠ Score table not found ({LUT_PATH}) - scoring with the model")
+        return None
+    except Exception as e:
+        print(f"⚠ Score table could not be loaded - scoring with the model: {e}")
+        return None
+    if lut.model_version != version:
+        # A table built from another model would silently change decisions
+        print(f"⚠ Score table was built for model {lut.model_version}, not {version} - scoring with the model")
+        return None
+    print(f"   Scoring from lookup table {LUT_PATH}")
+    return lut
+
+
+def _reload_in_background(path):
+    """Reload without blocking callers that keep using the old model"""
+    try:
+        _swap_in(path)
+    finally:
+        _load_lock.release()
+
+
+def _check_for_update():
+    """Start a background reload when the model file changed on disk"""
+    global _last_check
+
+    now = time.monotonic()
+    if now - _last_check < RELOAD_CHECK_INTERVAL:
+        return
+    _last_check = now
+
+    try:
+        stat = os.stat(MODEL_PATH)
+    except OSError:
+        return
+
+    if stat.st_mtime == _active['mtime'] and stat.st_size == _active['size']:
+        return
+
+    # Only one reload at a time; everyone else carries on with the current model
+    if not _load_lock.acquire(blocking=False):
+        return
+    threading.Thread(target=_reload_in_background, args=(MODEL_PATH,), daemon=True).start()
+
+
+def get_model():
+    """Return the process-wide model, loading it on first use"""
+    global _initialized
+
+    if not _initialized:
+        with _load_lock:
+            if not _initialized:
+                _swap_in(MODEL_PATH)
+                _initialized = True
+    else:
+        _check_for_update()
+
+    return _active['model']
+
+
+def get_scorer(n_rows=1):
+    """Return the fastest predict_proba implementation for a batch of n_rows"""
+    get_model()
+    active = _active
+    if active['lut'] is not None:
+        return active['lut']
+    if active['compiled'] is None or n_rows > COMPILED_MAX_BATCH_ROWS:
+        return active['model']
+    return active['compiled']
+
+
+def get_model_version():
+    """Return the content hash of the active model (None if not loaded)"""
+    get_model()
+    return _active['version']
+
+
+def reload_model(force=False):
+    """Synchronously reload the model file; returns True on success"""
+    global _initialized
+    with _load_lock:
+        ok = _swap_in(MODEL_PATH, force=force)
+        _initialized = True
+    return ok
+
+
+def get_model_status():
+    """Snapshot of model load/reload state for monitoring and alerting"""
+    status = dict(_status)
+    status['model_available'] = _active['model'] is not None
+    return status
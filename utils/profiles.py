@@ -0,0 +1,200 @@
+# utils/profiles.py
+"""
+Incrementally maintained per-user behavior profiles.
+
+Each login updates its user's running statistics in O(1): device, country,
+city and hour-of-day frequency counts plus Welford mean/variance of latency
+and time_diff. Behavior consistency is scored against this profile instead
+of re-scanning the user's history.
+"""
+import json
+import math
+from datetime import datetime
+
+from utils.timestamps import login_time_sql
+
+# Below this many logins the profile is too thin to judge; use the static heuristic
+MIN_PROFILE_LOGINS = 3
+
+DEVICE_NAMES = {0: 'mobile', 1: 'desktop', 2: 'tablet'}
+
+PROFILE_COLUMNS = [
+    'user_id', 'login_count', 'high_risk_count', 'consistency_sum',
+    'device_counts', 'country_counts', 'city_counts', 'hour_counts',
+    'latency_mean', 'latency_m2', 'time_diff_mean', 'time_diff_m2',
+    'first_login', 'last_login', 'updated_at',
+]
+
+_JSON_COLUMNS = ('device_counts', 'country_counts', 'city_counts', 'hour_counts')
+
+CREATE_USER_PROFILES_SQL = '''
+    CREATE TABLE IF NOT EXISTS user_profiles (
+        user_id VARCHAR(50) PRIMARY KEY,
+        login_count INTEGER NOT NULL DEFAULT 0,
+        high_risk_count INTEGER NOT NULL DEFAULT 0,
+        consistency_sum INTEGER NOT NULL DEFAULT 0,
+        device_counts TEXT,   -- JSON {"mobile": 12, ...}
+        country_counts TEXT,  -- JSON {"Philippines": 10, ...}
+        city_counts TEXT,     -- JSON {"Manila": 7, ...}
+        hour_counts TEXT,     -- JSON array of 24 counts
+        latency_mean REAL NOT NULL DEFAULT 0,
+        latency_m2 REAL NOT NULL DEFAULT 0,
+        time_diff_mean REAL NOT NULL DEFAULT 0,
+        time_diff_m2 REAL NOT NULL DEFAULT 0,
+        first_login TIMESTAMP,
+        last_login TIMESTAMP,
+        updated_at TIMESTAMP
+    )
+'''
+
+_UPSERT_SQL = 'INSERT OR REPLACE INTO user_profiles ({}) VALUES ({})'.format(
+    ', '.join(PROFILE_COLUMNS), ', '.join('?' * len(PROFILE_COLUMNS)))
+
+
+def new_profile(user_id):
+    return {
+        'user_id': user_id, 'login_count': 0, 'high_risk_count': 0, 'consistency_sum': 0,
+        'device_counts': {}, 'country_counts': {}, 'city_counts': {}, 'hour_counts': [0] * 24,
+        'latency_mean': 0.0, 'latency_m2': 0.0, 'time_diff_mean': 0.0, 'time_diff_m2': 0.0,
+        'first_login': None, 'last_login': None, 'updated_at': None,
+    }
+
+
+def _row_to_profile(row):
+    profile = dict(zip(PROFILE_COLUMNS, row))
+    for column in _JSON_COLUMNS:
+        profile[column] = json.loads(profile[column]) if profile[column] else new_profile(None)[column]
+    return profile
+
+
+def _profile_to_row(profile):
+    return tuple(json.dumps(profile[c]) if c in _JSON_COLUMNS else profile[c] for c in PROFILE_COLUMNS)
+
+
+def load_user_profiles(conn, user_ids):
+    """Fetch profiles for many users in one query -> {user_id: profile}"""
+    user_ids = list(user_ids)
+    profiles = {}
+    # Stay under SQLite's bound-parameter limit
+    for start in range(0, len(user_ids), 500):
+        chunk = user_ids[start:start + 500]
+        rows = conn.execute(
+            'SELECT {} FROM user_profiles WHERE user_id IN ({})'.format(
+                ', '.join(PROFILE_COLUMNS), ', '.join('?' * len(chunk))),
+            chunk
+        ).fetchall()
+        for row in rows:
+            profiles[row[0]] = _row_to_profile(row)
+    return profiles
+
+
+def load_user_profile(conn, user_id):
+    return load_user_profiles(conn, [user_id]).get(user_id)
+
+
+def _welford(mean, m2, count, value):
+    """Running mean / sum of squared deviations after adding one value (count includes it)"""
+    delta = value - mean
+    mean += delta / count
+    return mean, m2 + delta * (value - mean)
+
+
+def apply_login(profile, login_timestamp, country, city, device_type, latency, time_diff,
+                risk_percentage, behavior_consistency):
+    """Fold one login into a profile in place"""
+    profile['login_count'] += 1
+    n = profile['login_count']
+    if risk_percentage is not None and risk_percentage >= 70:
+        profile['high_risk_count'] += 1
+    profile['consistency_sum'] += int(behavior_consistency or 0)
+
+    for column, key in (('device_counts', device_type), ('country_counts', country), ('city_counts', city)):
+        counts = profile[column]
+        counts[key] = counts.get(key, 0) + 1
+
+    hour = _parse_timestamp(login_timestamp).hour
+    profile['hour_counts'][hour] += 1
+
+    profile['latency_mean'], profile['latency_m2'] = _welford(
+        profile['latency_mean'], profile['latency_m2'], n, float(latency or 0))
+    profile['time_diff_mean'], profile['time_diff_m2'] = _welford(
+        profile['time_diff_mean'], profile['time_diff_m2'], n, float(time_diff or 0))
+
+    timestamp = str(login_timestamp)[:19]
+    if profile['first_login'] is None or timestamp < profile['first_login']:
+        profile['first_login'] = timestamp
+    if profile['last_login'] is None or timestamp > profile['last_login']:
+        profile['last_login'] = timestamp
+    profile['updated_at'] = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    return profile
+
+
+def update_user_profiles(conn, logins):
+    """
+    Apply new logins to their users' profiles inside the caller's transaction.
+    logins: iterable of dicts with login_timestamp, country, city, device_type,
+    latency, time_diff, risk_percentage, behavior_consistency and user_id.
+    """
+    logins = list(logins)
+    if not logins:
+        return
+    profiles = load_user_profiles(conn, {login['user_id'] for login in logins})
+    for login in logins:
+        profile = profiles.setdefault(login['user_id'], new_profile(login['user_id']))
+        apply_login(profile, login['login_timestamp'], login['country'], login['city'], login['device_type'],
+                    login['latency'], login['time_diff'], login['risk_percentage'], login['behavior_consistency'])
+    conn.executemany(_UPSERT_SQL, [_profile_to_row(p) for p in profiles.values()])
+
+
+def rebuild_user_profiles(conn):
+    """Recompute every profile from login_activities in one pass (caller commits)"""
+    conn.execute('DELETE FROM user_profiles')
+    cursor = conn.execute(f'''
+        SELECT user_id, {login_time_sql(conn)}, country, city, device_type, latency_ms, time_diff_hrs,
+               risk_percentage, behavior_consistency
+        FROM login_activities
+        ORDER BY id
+    ''')
+    profiles = {}
+    for user_id, *values in cursor:
+        apply_login(profiles.setdefault(user_id, new_profile(user_id)), *values)
+    conn.executemany(_UPSERT_SQL, [_profile_to_row(p) for p in profiles.values()])
+    return len(profiles)
+
+
+def _parse_timestamp(value):
+    if isinstance(value, datetime):
+        return value
+    return datetime.strptime(str(value)[:19], '%Y-%m-%d %H:%M:%S')
+
+
+def _familiarity(count, total):
+    """0 for never seen; at least 0.5 once seen, 1.0 when it is the user's habit"""
+    if not count or not total:
+        return 0.0
+    return min(1.0, 0.5 + count / total)
+
+
+def consistency_from_profile(profile, device_name, country, city, latency, login_time):
+    """Behavior consistency (0-100) of a login against the user's profile"""
+    total = profile['login_count']
+
+    device = _familiarity(profile['device_counts'].get(device_name, 0), total)
+
+    location = _familiarity(profile['city_counts'].get(city, 0), total)
+    if location == 0:
+        # New city in a familiar country still counts for something
+        location = 0.5 * _familiarity(profile['country_counts'].get(country, 0), total)
+
+    hour = _parse_timestamp(login_time).hour
+    hours = profile['hour_counts']
+    nearby_hours = hours[(hour - 1) % 24] + hours[hour] + hours[(hour + 1) % 24]
+    schedule = _familiarity(nearby_hours, total)
+
+    # Latency z-score against the user's running mean/std (10 ms floor on std)
+    std = max(10.0, math.sqrt(profile['latency_m2'] / total)) if total > 1 else 10.0
+    z = abs(float(latency) - profile['latency_mean']) / std
+    network = max(0.0, 1.0 - z / 4)
+
+    score = 0.3 * device + 0.4 * location + 0.15 * schedule + 0.15 * network
+    return int(round(score * 100))
@@ -0,0 +1,202 @@
+# utils/rescore.py
+"""
+Re-score the whole login_activities history with the current model.
+
+    python -m utils.rescore [--workers 8] [--chunk-size 20000] [--job-id NAME] [--restart]
+
+Rows are streamed in id order. Each chunk is scored by a pool of worker
+processes that load the model once, and the results are written back in id
+order together with a checkpoint, so an interrupted job resumes where it
+stopped. Every rescored row records the model version that produced it.
+
+Behavior consistency is scored against each user's current profile, which
+already includes the logins after the row being rescored. Old rows are
+therefore judged by the user's habits as they are now, not as they were at
+login time; the model's risk score does not depend on it.
+"""
+import argparse
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime
+
+import pandas as pd
+
+from utils import database
+from utils.cache import bump_data_version
+from utils.analysis_codes import encode_analysis
+from utils.connection import connect
+from utils.migrations import migrate
+from utils.model_manager import get_model, get_model_version
+from utils.timestamps import local_time_sql
+
+CHUNK_SIZE = 20000
+
+SELECT_CHUNK_SQL = f'''
+    SELECT id, user_id, {local_time_sql()} AS login_time, time_diff_hrs AS time_diff, distance_km AS distance, device_type,
+           latency_ms AS latency, is_attack_ip, login_successful, country, city
+    FROM login_activities
+    WHERE id > ? AND id <= ?
+    ORDER BY id
+'''
+
+UPDATE_SQL = '''
+    UPDATE login_activities
+    SET risk_score = ?, risk_percentage = ?, risk_classification = ?, recommended_action = ?,
+        recommendation_text = ?, factor_codes = ?, warning_mask = ?, behavior_consistency = ?,
+        location_context = ?, model_version = ?
+    WHERE id = ?
+'''
+
+
+def _init_worker(database_path):
+    """Runs once per worker process: point at the database and load the model"""
+    database.DATABASE_PATH = database_path
+    get_model()
+
+
+def _score_chunk(bounds):
+    """Worker: read one id range, score it in a single batch, return UPDATE rows and device types"""
+    from utils.scoring import score_logins_batch
+
+    start_id, end_id = bounds
+    conn = database.get_connection()
+    chunk = pd.read_sql_query(SELECT_CHUNK_SQL, conn, params=[start_id, end_id])
+    if chunk.empty:
+        return bounds, [], []
+
+    version = get_model_version()
+    scored = score_logins_batch(chunk)
+    rows = [
+        (risk_score, risk_percentage, classification, action, recommendation,
+         list(factors), list(warnings), int(consistency), context, version, int(row_id))
+        for risk_score, risk_percentage, classification, action, recommendation, factors, warnings,
+            consistency, context, row_id in zip(
+            scored['risk_score'], scored['risk_percentage'], scored['classification'], scored['action'],
+            scored['recommendation'], scored['analysis_factors'], scored['warnings'],
+            scored['behavior_consistency'], scored['location_context'], chunk['id'])
+    ]
+    return bounds, rows, list(chunk['device_type'])
+
+
+def _encode_rows(conn, rows, device_types):
+    """Swap the factor and warning lists of UPDATE rows for their stored codes"""
+    if not rows:
+        return rows
+    _, _, _, _, _, factors, warnings, consistency, context, _, _ = zip(*rows)
+    factor_codes, warning_masks = encode_analysis(conn, factors, warnings, consistency, context, device_types)
+    return [row[:5] + (codes, mask) + row[7:] for row, codes, mask in zip(rows, factor_codes, warning_masks)]
+
+
+def _chunk_bounds(conn, after_id, chunk_size):
+    """Yield (start, end] id ranges of chunk_size rows, walking the primary key"""
+    while True:
+        row = conn.execute(
+            'SELECT id FROM login_activities WHERE id > ? ORDER BY id LIMIT 1 OFFSET ?',
+            (after_id, chunk_size - 1)
+        ).fetchone()
+        if row is None:
+            last = conn.execute('SELECT MAX(id) FROM login_activities WHERE id > ?', (after_id,)).fetchone()[0]
+            if last is not None:
+                yield after_id, last
+            return
+        yield after_id, row[0]
+        after_id = row[0]
+
+
+def _load_checkpoint(conn, job_id, model_version, restart):
+    now = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    row = conn.execute('SELECT last_id, rows_done FROM rescore_checkpoints WHERE job_id = ?', (job_id,)).fetchone()
+    if row is None or restart:
+        conn.execute('''
+            INSERT OR REPLACE INTO rescore_checkpoints
+            (job_id, model_version, last_id, rows_done, started_at, updated_at, finished_at)
+            VALUES (?, ?, 0, 0, ?, ?, NULL)
+        ''', (job_id, model_version, now, now))
+        conn.commit()
+        return 0, 0
+    return row
+
+
+def rescore_all(job_id=None, workers=None, chunk_size=CHUNK_SIZE, restart=False):
+    """Re-score every stored login with the current model; returns the number of rows updated"""
+    model_version = get_model_version()
+    if model_version is None:
+        raise RuntimeError("Model not available - nothing to rescore with")
+
+    job_id = job_id or f"rescore-{model_version}"
+    workers = workers or os.cpu_count() or 1
+
+    # A single writer connection in this process; workers only read
+    conn = connect(database.DATABASE_PATH)
+    migrate(conn)
+    last_id, rows_done = _load_checkpoint(conn, job_id, model_version, restart)
+    total = conn.execute('SELECT COUNT(*) FROM login_activities WHERE id > ?', (last_id,)).fetchone()[0]
+    print(f"🔁 Job {job_id}: rescoring {total:,} rows after id {last_id} with {workers} workers")
+
+    started = time.perf_counter()
+    bounds = _chunk_bounds(conn, last_id, chunk_size)
+    in_flight = set()
+    finished = {}   # chunk start id -> (end id, rows), waiting for earlier chunks
+    next_start = last_id
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                             initargs=(database.DATABASE_PATH,)) as pool:
+        exhausted = False
+        while in_flight or not exhausted:
+            # Keep every worker busy plus one chunk queued each
+            while not exhausted and len(in_flight) < workers * 2:
+                chunk = next(bounds, None)
+                if chunk is None:
+                    exhausted = True
+                    break
+                in_flight.add(pool.submit(_score_chunk, chunk))
+
+            done, in_flight = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                (start_id, end_id), rows, device_types = future.result()
+                finished[start_id] = (end_id, _encode_rows(conn, rows, device_types))
+
+            # Write back in id order so the checkpoint always marks a fully rescored prefix
+            while next_start in finished:
+                end_id, rows = finished.pop(next_start)
+                with conn:
+                    conn.executemany(UPDATE_SQL, rows)
+                    rows_done += len(rows)
+                    conn.execute('''
+                        UPDATE rescore_checkpoints SET last_id = ?, rows_done = ?, updated_at = ?
+                        WHERE job_id = ?
+                    ''', (end_id, rows_done, datetime.now().strftime('%Y-%m-%d %H:%M:%S'), job_id))
+                next_start = end_id
+
+            elapsed = time.perf_counter() - started
+            print(f"   ... {rows_done:,} rows done, last id {next_start} ({rows_done / max(elapsed, 1e-9):,.0f} rows/s)")
+
+    with conn:
+        conn.execute('UPDATE rescore_checkpoints SET finished_at = ? WHERE job_id = ?',
+                     (datetime.now().strftime('%Y-%m-%d %H:%M:%S'), job_id))
+    # Profiles keep a running sum of behavior_consistency, which rescoring just changed
+    with conn:
+        database.rebuild_user_profiles(conn)
+    conn.close()
+    # Every row and profile may have changed
+    bump_data_version(database.DATABASE_PATH)
+    print(f"✅ Rescore complete: {rows_done:,} rows with model {model_version} in {time.perf_counter() - started:.1f}s")
+    return rows_done
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Re-score login_activities with the current model")
+    parser.add_argument('--database', default=database.DATABASE_PATH)
+    parser.add_argument('--job-id', help="checkpoint name (default: rescore-<model version>)")
+    parser.add_argument('--workers', type=int, default=None, help="worker processes (default: all cores)")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--restart', action='store_true', help="ignore an existing checkpoint")
+    args = parser.parse_args()
+
+    database.DATABASE_PATH = args.database
+    rescore_all(job_id=args.job_id, workers=args.workers, chunk_size=args.chunk_size, restart=args.restart)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,244 @@
+# utils/review_queue.py
+"""
+Prioritized review queue with time-limited leases, so concurrent analysts
+never review the same login.
+
+The queue is every login with admin_action = 'Pending Review', riskiest
+first: by 10-point risk band (RISK_BAND_SQL), oldest first within a band.
+The review_queue view lists it in that order and the partial expression
+index idx_review_queue holds exactly those rows in that order, so taking
+the head of the queue is an index seek, O(log n), however large the
+backlog is.
+
+    claim_next(conn, 5, 'alice')  # ids of the next five unleased logins, leased to alice
+
+A claim takes the write lock (BEGIN IMMEDIATE), walks the index skipping
+rows with a live lease and records leases in review_leases, so two claims
+never return the same row. Leases run out after BANTAI_REVIEW_LEASE_SECONDS
+(default 600); an expired lease no longer hides its row, which puts the
+login back in the queue at its original position. Reviewing a login
+(any admin_action other than 'Pending Review') drops its lease through a
+trigger. review_logins() skips logins leased to another analyst, so a
+stale screen never decides a colleague's claim; a login that was already
+reviewed can be decided again to correct it.
+
+    python -m utils.review_queue [--database bantai_security.db] [--expire]
+
+prints the queue depth, leases and age of the oldest pending login
+(--expire first deletes expired leases).
+"""
+import argparse
+import os
+import time
+
+from utils.metrics import increment, set_gauge
+from utils.timestamps import now_ms
+
+LEASE_SECONDS = int(os.environ.get('BANTAI_REVIEW_LEASE_SECONDS', '600'))
+
+PENDING = 'Pending Review'
+
+# Priority band of a row; queries must repeat this expression exactly to use the index
+# (they name it with INDEXED BY: without statistics the planner prefers idx_login_admin_action and sorts)
+RISK_BAND_SQL = 'CAST(risk_percentage / 10 AS INTEGER)'
+
+QUEUE_ORDER_SQL = f'{RISK_BAND_SQL} DESC, login_ts, id'
+
+CREATE_REVIEW_QUEUE_SQL = [
+    f'''
+    CREATE INDEX IF NOT EXISTS idx_review_queue ON login_activities ({QUEUE_ORDER_SQL})
+    WHERE admin_action = '{PENDING}'
+    ''',
+    # Age of the oldest pending login
+    f'''
+    CREATE INDEX IF NOT EXISTS idx_review_queue_age ON login_activities (login_ts)
+    WHERE admin_action = '{PENDING}'
+    ''',
+    f'''
+    CREATE VIEW IF NOT EXISTS review_queue AS
+    SELECT id, user_id, login_ts, risk_percentage, {RISK_BAND_SQL} AS risk_band
+    FROM login_activities
+    WHERE admin_action = '{PENDING}'
+    ORDER BY {QUEUE_ORDER_SQL}
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS review_leases (
+        activity_id INTEGER PRIMARY KEY,
+        admin VARCHAR(100) NOT NULL,
+        leased_until INTEGER NOT NULL  -- epoch milliseconds
+    )
+    ''',
+    'CREATE INDEX IF NOT EXISTS idx_review_leases_until ON review_leases (leased_until)',
+    f'''
+    CREATE TRIGGER IF NOT EXISTS trg_review_leases_reviewed AFTER UPDATE OF admin_action ON login_activities
+    WHEN NEW.admin_action IS NOT '{PENDING}'
+    BEGIN
+        DELETE FROM review_leases WHERE activity_id = NEW.id;
+    END
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS trg_review_leases_delete AFTER DELETE ON login_activities
+    BEGIN
+        DELETE FROM review_leases WHERE activity_id = OLD.id;
+    END
+    ''',
+]
+
+# Next unleased logins in queue order
+CLAIM_SQL = f'''
+    SELECT id FROM login_activities INDEXED BY idx_review_queue
+    WHERE admin_action = '{PENDING}'
+      AND NOT EXISTS (SELECT 1 FROM review_leases WHERE activity_id = login_activities.id AND leased_until > ?)
+    ORDER BY {QUEUE_ORDER_SQL}
+    LIMIT ?
+'''
+
+# A decision (or a corrected one), for a login no other admin holds a live lease on
+REVIEW_SQL = '''
+    UPDATE login_activities SET admin_action = ?, reviewed_at = ?, reviewed_by = ?
+    WHERE id = ?
+      AND NOT EXISTS (SELECT 1 FROM review_leases
+                      WHERE activity_id = login_activities.id AND leased_until > ? AND admin IS NOT ?)
+'''
+
+OLDEST_PENDING_SQL = f'''
+    SELECT MIN(login_ts) FROM login_activities INDEXED BY idx_review_queue_age WHERE admin_action = '{PENDING}'
+'''
+
+
+def create_review_queue(conn):
+    """Indexes, view, lease table and triggers (used by the schema migration)"""
+    # Older rows may have no admin action at all; they are pending too
+    conn.execute(f"UPDATE login_activities SET admin_action = '{PENDING}' WHERE admin_action IS NULL")
+    for sql in CREATE_REVIEW_QUEUE_SQL:
+        conn.execute(sql)
+
+
+def _write_transaction(conn, work):
+    """Run work(conn) holding the write lock; commits unless the caller has a transaction open"""
+    if conn.in_transaction:
+        return work(conn)
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        result = work(conn)
+        conn.commit()
+        return result
+    except Exception:
+        conn.rollback()
+        raise
+
+
+def expire_leases(conn):
+    """Delete leases that have run out -> how many"""
+    def work(conn):
+        expired = conn.execute('DELETE FROM review_leases WHERE leased_until <= ?', (now_ms(),)).rowcount
+        if expired:
+            increment('review_leases_expired', expired)
+        return expired
+    return _write_transaction(conn, work)
+
+
+def claim_next(conn, n, admin, lease_seconds=LEASE_SECONDS):
+    """Lease the next n unleased logins of the queue to admin -> their ids, riskiest first"""
+    def work(conn):
+        now = now_ms()
+        expire_leases(conn)
+        ids = [row[0] for row in conn.execute(CLAIM_SQL, (now, n))]
+        conn.executemany('INSERT OR REPLACE INTO review_leases (activity_id, admin, leased_until) VALUES (?, ?, ?)',
+                         [(activity_id, admin, now + lease_seconds * 1000) for activity_id in ids])
+        return ids
+
+    started = time.perf_counter()
+    ids = _write_transaction(conn, work)
+    increment('review_claims')
+    increment('review_claimed_rows', len(ids))
+    set_gauge('review_last_claim_ms', round((time.perf_counter() - started) * 1000, 3))
+    return ids
+
+
+def renew_leases(conn, ids, admin, lease_seconds=LEASE_SECONDS):
+    """Extend admin's live leases on ids -> how many were extended (an expired or lost lease is not renewed)"""
+    def work(conn):
+        now = now_ms()
+        return conn.executemany(
+            'UPDATE review_leases SET leased_until = ? WHERE activity_id = ? AND admin = ? AND leased_until > ?',
+            [(now + lease_seconds * 1000, activity_id, admin, now) for activity_id in ids]).rowcount
+    return _write_transaction(conn, work)
+
+
+def release_leases(conn, ids, admin):
+    """Give admin's leases on ids back to the queue -> how many"""
+    def work(conn):
+        return conn.executemany('DELETE FROM review_leases WHERE activity_id = ? AND admin = ?',
+                                [(activity_id, admin) for activity_id in ids]).rowcount
+    return _write_transaction(conn, work)
+
+
+def review_logins(conn, ids, action, admin, reviewed_at, more_ids=None):
+    """Record admin's decision on ids in one write transaction -> (ids updated, ids skipped)
+
+    Logins leased to another admin are skipped. more_ids(conn, ids)
+    returns further logins to decide, looked up under the same write lock.
+    """
+    def work(conn):
+        now = now_ms()
+        updated, skipped = [], []
+        for activity_id in ids + (more_ids(conn, ids) if more_ids else []):
+            done = conn.execute(REVIEW_SQL, (action, reviewed_at, admin, activity_id, now, admin)).rowcount
+            (updated if done else skipped).append(activity_id)
+        return updated, skipped
+    return _write_transaction(conn, work)
+
+
+def leased_ids(conn, admin):
+    """Ids admin holds a live lease on, in queue order"""
+    return [row[0] for row in conn.execute(f'''
+        SELECT id FROM login_activities
+        WHERE admin_action = '{PENDING}'
+          AND id IN (SELECT activity_id FROM review_leases WHERE admin = ? AND leased_until > ?)
+        ORDER BY {QUEUE_ORDER_SQL}
+    ''', (admin, now_ms()))]
+
+
+def queue_stats(conn):
+    """Queue depth, live leases and ages (seconds) of the oldest pending login and of the queue head"""
+    now = now_ms()
+    depth = conn.execute(f"SELECT COUNT(*) FROM login_activities WHERE admin_action = '{PENDING}'").fetchone()[0]
+    leased = conn.execute('SELECT COUNT(*) FROM review_leases WHERE leased_until > ?', (now,)).fetchone()[0]
+    oldest = conn.execute(OLDEST_PENDING_SQL).fetchone()[0]
+    head = conn.execute(f'''
+        SELECT login_ts FROM login_activities INDEXED BY idx_review_queue
+        WHERE admin_action = '{PENDING}' ORDER BY {QUEUE_ORDER_SQL} LIMIT 1
+    ''').fetchone()
+    stats = {
+        'depth': depth,
+        'leased': leased,
+        'available': max(depth - leased, 0),
+        'oldest_age_seconds': round((now - oldest) / 1000) if oldest is not None else 0,
+        'head_age_seconds': round((now - head[0]) / 1000) if head else 0,
+    }
+    for name, value in stats.items():
+        set_gauge(f'review_queue_{name}', value)
+    return stats
+
+
+def main():
+    from utils import database
+
+    parser = argparse.ArgumentParser(description="Show the review queue")
+    parser.add_argument('--database', default=database.DATABASE_PATH)
+    parser.add_argument('--expire', action='store_true', help="delete expired leases first")
+    args = parser.parse_args()
+
+    database.DATABASE_PATH = args.database
+    conn = database.get_connection()
+    if args.expire:
+        print(f"✅ Expired {expire_leases(conn):,} leases")
+    stats = queue_stats(conn)
+    print(f"📦 {stats['depth']:,} pending logins, {stats['leased']:,} leased, {stats['available']:,} available")
+    print(f"   oldest pending {stats['oldest_age_seconds'] / 3600:.1f} h, "
+          f"queue head {stats['head_age_seconds'] / 3600:.1f} h old")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+# utils/rollups.py
+"""
+Hourly and daily login rollups kept current by triggers on login_activities.
+
+login_rollup_hourly and login_rollup_daily hold one row per time bucket with
+attempts, high-risk flags, success/failure and warning-category counts, so
+the dashboard charts read a handful of bucket rows instead of aggregating
+every login on each rerun.
+
+    python -m utils.rollups [--database bantai_security.db] [--rebuild]
+
+compares the live rollups with a from-scratch recount (and replaces them with
+the recount when --rebuild is given).
+"""
+import argparse
+import sys
+from datetime import datetime
+
+import pandas as pd
+
+from utils.analysis_codes import WARNING_TEXTS
+from utils.timestamps import epoch_timestamps, login_time_sql
+
+# Granularity -> (table, bucket expression for a local login time, pandas frequency, bucket format)
+GRANULARITIES = {
+    'hourly': ('login_rollup_hourly', "strftime('%Y-%m-%d %H:00:00', {ts})", 'h', '%Y-%m-%d %H:%M:%S'),
+    'daily': ('login_rollup_daily', "DATE({ts})", 'D', '%Y-%m-%d'),
+}
+
+# Warning category -> text generate_warnings puts in the warnings
+WARNING_CATEGORIES = {
+    'Attack IP': '⚠ Known attack IP',
+    'Failed Login': '⚠ Failed login attempt',
+    'Abnormal Latency': '⚠ Abnormal latency',
+    'Impossible Travel': '⚠ Impossible travel distance',
+    'High Risk Score': '⚠ High risk score',
+}
+
+WARNING_COLUMNS = {category: 'warn_' + category.lower().replace(' ', '_') for category in WARNING_CATEGORIES}
+
+# Rollup column -> condition on a login_activities row ({r} is the row alias)
+ROLLUP_CONDITIONS = {
+    'attempts': "1",
+    'high_risk': "{r}.risk_percentage >= 70",
+    'successful': "{r}.login_successful = 1",
+    'failed': "{r}.login_successful = 0",
+}
+
+ROLLUP_COLUMNS = list(ROLLUP_CONDITIONS) + list(WARNING_COLUMNS.values())
+
+# Columns whose change can move a row between counts (plus the login time and warnings)
+WATCHED_COLUMNS = ('risk_percentage', 'login_successful')
+
+
+def _coded(conn):
+    """True once warnings are stored as warning_mask (migration 8) rather than JSON text"""
+    return 'warning_mask' in [row[1] for row in conn.execute('PRAGMA table_info(login_activities)')]
+
+
+def _conditions(coded):
+    conditions = dict(ROLLUP_CONDITIONS)
+    for category, column in WARNING_COLUMNS.items():
+        text = WARNING_CATEGORIES[category]
+        if coded:
+            conditions[column] = f"({{r}}.warning_mask & {1 << WARNING_TEXTS.index(text)}) != 0"
+        else:
+            # json.dumps escapes the ⚠, so match the rest of the text
+            conditions[column] = f"instr({{r}}.warnings, '{text[2:]}') > 0"
+    return conditions
+
+
+def _create_table_sql(table):
+    columns = ',\n        '.join(f'{name} INTEGER NOT NULL DEFAULT 0' for name in ROLLUP_COLUMNS)
+    return f'''
+    CREATE TABLE IF NOT EXISTS {table} (
+        bucket TIMESTAMP PRIMARY KEY,
+        {columns}
+    )
+    '''
+
+
+def _flag(conditions, name, row):
+    return f"(CASE WHEN {conditions[name].format(r=row)} THEN 1 ELSE 0 END)"
+
+
+def _add_row(conditions, table, bucket, row, login_time):
+    flags = ', '.join(_flag(conditions, name, row) for name in ROLLUP_COLUMNS)
+    updates = ', '.join(f'{name} = {name} + excluded.{name}' for name in ROLLUP_COLUMNS)
+    return f'''
+        INSERT INTO {table} (bucket, {", ".join(ROLLUP_COLUMNS)})
+        SELECT {bucket.format(ts=login_time)}, {flags} WHERE {login_time} IS NOT NULL
+        ON CONFLICT (bucket) DO UPDATE SET {updates};'''
+
+
+def _remove_row(conditions, table, bucket, row, login_time):
+    assignments = ', '.join(f'{name} = {name} - {_flag(conditions, name, row)}' for name in ROLLUP_COLUMNS)
+    return f'''
+        UPDATE {table} SET {assignments}
+        WHERE bucket = {bucket.format(ts=login_time)};'''
+
+
+def _triggers_sql(conn, granularity):
+    table, bucket, _, _ = GRANULARITIES[granularity]
+    coded = _coded(conn)
+    conditions = _conditions(coded)
+    new_time, old_time = login_time_sql(conn, 'NEW'), login_time_sql(conn, 'OLD')
+    watched = (WATCHED_COLUMNS + (('warning_mask',) if coded else ('warnings',))
+               + (('login_ts', 'utc_offset') if epoch_timestamps(conn) else ('login_timestamp',)))
+    return [
+        f'''
+    CREATE TRIGGER IF NOT EXISTS trg_{table}_insert AFTER INSERT ON login_activities
+    BEGIN
+        {_add_row(conditions, table, bucket, 'NEW', new_time)}
+    END
+    ''',
+        f'''
+    CREATE TRIGGER IF NOT EXISTS trg_{table}_delete AFTER DELETE ON login_activities
+    BEGIN
+        {_remove_row(conditions, table, bucket, 'OLD', old_time)}
+    END
+    ''',
+        f'''
+    CREATE TRIGGER IF NOT EXISTS trg_{table}_update
+    AFTER UPDATE OF {', '.join(watched)} ON login_activities
+    BEGIN
+        {_remove_row(conditions, table, bucket, 'OLD', old_time)}
+        {_add_row(conditions, table, bucket, 'NEW', new_time)}
+    END
+    ''',
+    ]
+
+
+def create_rollups(conn):
+    """Tables, triggers and backfill (used by the schema migration)"""
+    for table, _, _, _ in GRANULARITIES.values():
+        conn.execute(_create_table_sql(table))
+    create_rollup_triggers(conn)
+    rebuild_rollups(conn)
+
+
+def create_rollup_triggers(conn):
+    """(Re)create the triggers for however warnings and login times are currently stored"""
+    for granularity, (table, _, _, _) in GRANULARITIES.items():
+        for event in ('insert', 'delete', 'update'):
+            conn.execute(f'DROP TRIGGER IF EXISTS trg_{table}_{event}')
+        for sql in _triggers_sql(conn, granularity):
+            conn.execute(sql)
+
+
+def recount(conn, granularity):
+    """Rollup rows recomputed from login_activities -> {bucket: {column: count}}"""
+    _, bucket, _, _ = GRANULARITIES[granularity]
+    login_time = login_time_sql(conn, 'login_activities')
+    conditions = _conditions(_coded(conn))
+    sums = ', '.join(f'SUM({_flag(conditions, name, "login_activities")})' for name in ROLLUP_COLUMNS)
+    rows = conn.execute(f'''
+        SELECT {bucket.format(ts=login_time)}, {sums} FROM login_activities
+        WHERE {login_time} IS NOT NULL
+        GROUP BY 1
+    ''').fetchall()
+    return {row[0]: dict(zip(ROLLUP_COLUMNS, row[1:])) for row in rows}
+
+
+def live_rollups(conn, granularity):
+    table, _, _, _ = GRANULARITIES[granularity]
+    rows = conn.execute(f'SELECT bucket, {", ".join(ROLLUP_COLUMNS)} FROM {table} WHERE attempts != 0').fetchall()
+    return {row[0]: dict(zip(ROLLUP_COLUMNS, row[1:])) for row in rows}
+
+
+def rebuild_rollups(conn):
+    """Replace every rollup table with a recount (caller commits)"""
+    for granularity, (table, _, _, _) in GRANULARITIES.items():
+        buckets = recount(conn, granularity)
+        conn.execute(f'DELETE FROM {table}')
+        conn.executemany(
+            f'INSERT INTO {table} (bucket, {", ".join(ROLLUP_COLUMNS)}) '
+            f'VALUES (?, {", ".join("?" * len(ROLLUP_COLUMNS))})',
+            [[bucket] + [counts[name] for name in ROLLUP_COLUMNS] for bucket, counts in buckets.items()])
+
+
+def check_rollups(conn):
+    """Differences between live and recounted rollups -> [(granularity, bucket, live, expected)]"""
+    diffs = []
+    for granularity in GRANULARITIES:
+        live = live_rollups(conn, granularity)
+        expected = recount(conn, granularity)
+        for bucket in sorted(set(live) | set(expected)):
+            if live.get(bucket) != expected.get(bucket):
+                diffs.append((granularity, bucket, live.get(bucket), expected.get(bucket)))
+    return diffs
+
+
+def get_rollup(conn, granularity, since, until=None):
+    """Bucket rows between since and until (default now), zero-filled -> DataFrame indexed by bucket"""
+    table, _, freq, bucket_format = GRANULARITIES[granularity]
+    start = pd.Timestamp(since).floor(freq)
+    end = pd.Timestamp(until or datetime.now()).floor(freq)
+
+    df = pd.read_sql_query(
+        f'SELECT bucket, {", ".join(ROLLUP_COLUMNS)} FROM {table} WHERE bucket BETWEEN ? AND ? ORDER BY bucket',
+        conn, params=(start.strftime(bucket_format), end.strftime(bucket_format)))
+    df['bucket'] = pd.to_datetime(df['bucket'])
+    buckets = pd.date_range(start, end, freq=freq, name='bucket')
+    return df.set_index('bucket').reindex(buckets, fill_value=0)
+
+
+def main():
+    from utils import database
+
+    parser = argparse.ArgumentParser(description="Check the login rollups against a full recount")
+    parser.add_argument('--database', default=database.DATABASE_PATH)
+    parser.add_argument('--rebuild', action='store_true', help="replace the live rollups with the recount")
+    args = parser.parse_args()
+
+    database.DATABASE_PATH = args.database
+    conn = database.get_connection()
+    diffs = check_rollups(conn)
+    for granularity, bucket, live, expected in diffs:
+        print(f"❌ {granularity} {bucket}: live {live}, recount {expected}")
+
+    if args.rebuild:
+        with conn:
+            rebuild_rollups(conn)
+        print("✅ Rollups rebuilt from login_activities")
+    elif diffs:
+        sys.exit(1)
+    else:
+        print("✅ Login rollups match a full recount")
+
+
+if __name__ == '__main__':
+    main()
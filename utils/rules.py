@@ -0,0 +1,261 @@
+# utils/rules.py
+"""
+Pre-model decision rules for clear-cut login events.
+
+Rules are checked in order before the model runs; the first rule whose
+conditions all hold decides the event (BLOCK or ALLOW) and the model,
+context and recommendation work for it is skipped. Each rule is plain data:
+
+    {"name": "attack_ip_failed_far", "action": "BLOCK", "risk_score": 0.95,
+     "when": [["is_attack_ip", "==", 1], ["login_successful", "==", 0], ["distance", ">", 10000]]}
+
+The cascade is off unless BANTAI_RULES=1. BANTAI_RULES_FILE points at a JSON
+list of rules replacing the defaults. Check a rule set against the model on
+stored history before switching it on:
+
+    python -m utils.rules --compare [--limit 100000]
+"""
+import argparse
+import json
+import operator
+import os
+import threading
+import time
+
+import numpy as np
+
+# Same signals as generate_warnings(); thresholds match its cut-offs
+DEFAULT_RULES = [
+    {
+        'name': 'attack_ip_failed_far',
+        'action': 'BLOCK',
+        'risk_score': 0.95,
+        'when': [['is_attack_ip', '==', 1], ['login_successful', '==', 0], ['distance', '>', 10000]],
+    },
+    {
+        'name': 'attack_ip_failed_slow',
+        'action': 'BLOCK',
+        'risk_score': 0.95,
+        'when': [['is_attack_ip', '==', 1], ['login_successful', '==', 0], ['latency', '>', 2000]],
+    },
+    {
+        'name': 'clean_local',
+        'action': 'ALLOW',
+        'risk_score': 0.05,
+        'when': [['is_attack_ip', '==', 0], ['login_successful', '==', 1], ['distance', '<', 50],
+                 ['latency', '<=', 500], ['time_diff', '>=', 1]],
+    },
+]
+
+OPERATORS = {
+    '==': operator.eq, '!=': operator.ne,
+    '<': operator.lt, '<=': operator.le,
+    '>': operator.gt, '>=': operator.ge,
+}
+
+FIELDS = ('time_diff', 'distance', 'device_type', 'is_attack_ip', 'login_successful', 'latency')
+
+# The score a rule reports has to land in the risk bucket of its action
+ACTION_LEVELS = {'ALLOW': 'LOW', 'BLOCK': 'HIGH'}
+
+
+def _risk_level(score):
+    return 'LOW' if score < 0.3 else 'MEDIUM' if score < 0.7 else 'HIGH'
+
+
+def validate_rules(rules):
+    """Raise ValueError for malformed rules"""
+    for rule in rules:
+        name = rule.get('name')
+        if not name:
+            raise ValueError(f"Rule without a name: {rule!r}")
+        if rule.get('action') not in ACTION_LEVELS:
+            raise ValueError(f"Rule {name}: action must be ALLOW or BLOCK")
+        score = rule.get('risk_score')
+        if (not isinstance(score, (int, float)) or not 0 <= score <= 1
+                or _risk_level(score) != ACTION_LEVELS[rule['action']]):
+            raise ValueError(f"Rule {name}: risk_score {score!r} does not match action {rule['action']}")
+        if not rule.get('when'):
+            raise ValueError(f"Rule {name}: needs at least one condition")
+        for field, op, _ in rule['when']:
+            if field not in FIELDS:
+                raise ValueError(f"Rule {name}: unknown field {field!r}")
+            if op not in OPERATORS:
+                raise ValueError(f"Rule {name}: unknown operator {op!r}")
+    return rules
+
+
+def load_rules(path=None):
+    """Rules from a JSON file, or the defaults"""
+    path = path or os.environ.get('BANTAI_RULES_FILE')
+    if not path:
+        return DEFAULT_RULES
+    with open(path, encoding='utf-8') as f:
+        return validate_rules(json.load(f))
+
+
+_enabled = os.environ.get('BANTAI_RULES', '0') == '1'
+# Loaded on first use, so a bad BANTAI_RULES_FILE cannot break importing the app
+_rules = None
+_rules_lock = threading.Lock()
+
+
+def rules_enabled():
+    return _enabled
+
+
+def set_rules_enabled(enabled):
+    global _enabled
+    _enabled = bool(enabled)
+
+
+def get_rules():
+    """Active rule set; the defaults if BANTAI_RULES_FILE cannot be loaded"""
+    global _rules
+    if _rules is None:
+        with _rules_lock:
+            if _rules is None:
+                try:
+                    _rules = load_rules()
+                except Exception as e:
+                    print(f"⚠ Could not load rules from {os.environ.get('BANTAI_RULES_FILE')}: {e} - using defaults")
+                    _rules = DEFAULT_RULES
+    return _rules
+
+
+def set_rules(rules):
+    global _rules
+    _rules = validate_rules(list(rules))
+
+
+def _matches(rule, values):
+    """All conditions hold; works on scalars and on NumPy arrays alike"""
+    result = True
+    for field, op, threshold in rule['when']:
+        result = result & OPERATORS[op](values[field], threshold)
+    return result
+
+
+def match_rule(login_data, rules=None):
+    """First rule that decides this event, or None"""
+    for rule in rules if rules is not None else get_rules():
+        if _matches(rule, login_data):
+            return rule
+    return None
+
+
+def match_rules_batch(columns, n, rules=None):
+    """
+    Index of the deciding rule for every row (-1 where the model must decide).
+    columns: mapping of field name -> array of length n
+    """
+    decided = np.full(n, -1, dtype=np.int64)
+    for index, rule in enumerate(rules if rules is not None else get_rules()):
+        hit = np.asarray(_matches(rule, columns), dtype=bool) & (decided < 0)
+        decided[hit] = index
+    return decided
+
+
+def rule_factor(rule):
+    """Analysis factor recorded for a rule decision"""
+    return f"Decided by rule: {rule['name']}"
+
+
+def compare_rules_with_model(limit=None, timing_rows=500, rules=None):
+    """
+    Replay stored logins through the rules and the model.
+    Reports per rule how many rows it absorbed and how often its action
+    agrees with the model's, plus mean single-event latency with and without the cascade.
+    """
+    import pandas as pd
+    from utils.database import get_connection, get_full_model_prediction
+    from utils.model_manager import get_scorer
+    from utils.scoring import ACTIONS, build_feature_matrix
+
+    global _enabled, _rules
+    rules = rules if rules is not None else get_rules()
+    conn = get_connection()
+    query = '''
+        SELECT time_diff_hrs AS time_diff, distance_km AS distance, device_type,
+               latency_ms AS latency, is_attack_ip, login_successful, country, city
+        FROM login_activities
+        ORDER BY id DESC
+    '''
+    if limit:
+        query += f' LIMIT {int(limit)}'
+    history = pd.read_sql_query(query, conn)
+    if history.empty:
+        raise RuntimeError("No stored logins to compare against")
+
+    model = get_scorer(len(history))
+    if model is None:
+        raise RuntimeError("Model not available - nothing to compare against")
+
+    features = build_feature_matrix(history)
+    columns = dict(zip(FIELDS, features.T))
+    risk = model.predict_proba(features)[:, 1]
+    model_actions = ACTIONS[np.where(risk < 0.3, 0, np.where(risk < 0.7, 1, 2))]
+    decided = match_rules_batch(columns, len(history), rules)
+
+    report = {'rows': len(history), 'rules': []}
+    for index, rule in enumerate(rules):
+        hit = decided == index
+        agree = int((model_actions[hit] == rule['action']).sum())
+        report['rules'].append({
+            'name': rule['name'],
+            'action': rule['action'],
+            'absorbed': int(hit.sum()),
+            'agrees_with_model': agree,
+            'agreement': agree / int(hit.sum()) if hit.any() else None,
+        })
+    absorbed = decided >= 0
+    rule_actions = np.array([rule['action'] for rule in rules], dtype=object)
+    changed = int((model_actions[absorbed] != rule_actions[decided[absorbed]]).sum())
+    report['absorbed'] = int(absorbed.sum())
+    report['decisions_changed'] = changed
+
+    # Mean single-event latency over a sample, model only vs. cascade
+    sample = history.head(timing_rows).to_dict('records')
+    for event in sample:
+        event['device_type'] = {'mobile': 0, 'desktop': 1, 'tablet': 2}.get(event['device_type'], 2)
+    saved = _enabled, _rules
+    try:
+        for label, enabled in (('model_only_mean_ms', False), ('cascade_mean_ms', True)):
+            _enabled, _rules = enabled, rules
+            started = time.perf_counter()
+            for event in sample:
+                get_full_model_prediction('rules-compare', event)
+            report[label] = (time.perf_counter() - started) * 1000 / len(sample)
+    finally:
+        _enabled, _rules = saved
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pre-model decision rules")
+    parser.add_argument('--compare', action='store_true', help="compare the rules with the model on stored logins")
+    parser.add_argument('--limit', type=int, default=None, help="most recent rows to replay")
+    parser.add_argument('--rules-file', default=None, help="JSON rule set (default: BANTAI_RULES_FILE or built-ins)")
+    args = parser.parse_args()
+
+    rules = load_rules(args.rules_file)
+    if not args.compare:
+        print(json.dumps(rules, indent=2))
+        return
+
+    report = compare_rules_with_model(limit=args.limit, rules=rules)
+    print(f"Replayed {report['rows']:,} stored logins")
+    for rule in report['rules']:
+        agreement = f"{rule['agreement']:.1%}" if rule['agreement'] is not None else "n/a"
+        print(f"  {rule['name']:<28} {rule['action']:<6} absorbed {rule['absorbed']:>8,}  agrees with model {agreement}")
+    print(f"Absorbed {report['absorbed']:,} rows; {report['decisions_changed']:,} decisions differ from the model")
+    print(f"Mean latency per event: model only {report['model_only_mean_ms']:.3f} ms, "
+          f"cascade {report['cascade_mean_ms']:.3f} ms")
+    if report['decisions_changed']:
+        print("⚠ Rule set changes decisions - review before enabling BANTAI_RULES")
+    else:
+        print("✅ Rule set matches the model on every absorbed row")
+
+
+if __name__ == '__main__':
+    main()
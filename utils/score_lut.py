@@ -0,0 +1,306 @@
+# utils/score_lut.py
+"""
+Precomputed risk-score lookup table.
+
+The model has six inputs; three are tiny categoricals (device_type 0-2,
+is_attack_ip, login_successful). The build step quantizes time_diff, distance
+and latency into cells whose edges are taken from the model's own split
+points, evaluates the model once per cell and stores the resulting score
+table as a compressed .npz. Scoring is then a handful of array indexes:
+
+    python -m utils.score_lut build [--model bantai_model.pkl] [--out bantai_score_lut.npz] [--cells 48 48 48]
+    python -m utils.score_lut check [--lut bantai_score_lut.npz] [--database bantai_security.db]
+
+Loading and scoring only needs NumPy. The max-error figures stored with the
+table are measured on random probe rows against the real model, so they are
+an empirical bound, not a proof.
+"""
+import argparse
+import time
+from bisect import bisect_left, bisect_right
+
+import numpy as np
+
+LUT_PATH = 'bantai_score_lut.npz'
+
+# Default number of cells per continuous feature (time_diff, distance, latency)
+DEFAULT_CELLS = (48, 48, 48)
+
+# Positions in the model's feature vector
+CONTINUOUS = (0, 1, 5)         # time_diff, distance, latency
+CATEGORICAL = (2, 3, 4)        # device_type, is_attack_ip, login_successful
+CATEGORY_SIZES = (3, 2, 2)
+
+PROBE_ROWS = 200000
+
+
+class ScoreLUT:
+    """Quantized score surface with a predict_proba interface"""
+
+    kind = 'lut'
+
+    def __init__(self, edges, centers, table, interpolate=False, model_version=None, errors=None):
+        self.edges = edges            # per continuous feature: inner cell edges (x <= edge -> left cell)
+        self.centers = centers        # per continuous feature: representative value of every cell
+        self.table = table            # (3, 2, 2, cells_t, cells_d, cells_l) positive-class probability
+        self.interpolate = interpolate
+        self.model_version = model_version
+        self.errors = errors or {}
+        self.classes_ = np.array([0, 1])
+        self._flat = table.ravel()
+        self._strides = np.array(table.strides) // table.itemsize
+        # Plain-Python copies for the single-row path, where NumPy call overhead dominates
+        self._edge_lists = [e.tolist() for e in edges]
+        self._center_lists = [c.tolist() for c in centers]
+        self._stride_list = self._strides.tolist()
+
+    def _category_offset(self, X):
+        offset = 0
+        for column, size, stride in zip(CATEGORICAL, CATEGORY_SIZES, self._strides[:3]):
+            offset = offset + np.clip(X[:, column].astype(np.intp), 0, size - 1) * stride
+        return offset
+
+    def _score_cells(self, X):
+        """Score of the cell every row falls in (exact for the model's piecewise-constant surface)"""
+        index = self._category_offset(X)
+        for column, edges, stride in zip(CONTINUOUS, self.edges, self._strides[3:]):
+            index = index + np.searchsorted(edges, X[:, column], side='left') * stride
+        return self._flat[index]
+
+    def _score_interpolated(self, X):
+        """Multilinear interpolation between neighbouring cell centers"""
+        base = self._category_offset(X)
+        corners = [(base, np.ones(len(X)))]
+        for column, centers, stride in zip(CONTINUOUS, self.centers, self._strides[3:]):
+            x = np.clip(X[:, column], centers[0], centers[-1])
+            low = np.clip(np.searchsorted(centers, x, side='right') - 1, 0, len(centers) - 2)
+            weight = (x - centers[low]) / (centers[low + 1] - centers[low])
+            corners = [
+                corner
+                for index, w in corners
+                for corner in ((index + low * stride, w * (1 - weight)),
+                               (index + (low + 1) * stride, w * weight))
+            ]
+        return sum(self._flat[index] * w for index, w in corners)
+
+    def _score_row(self, row):
+        """One row without array overhead; same arithmetic as the vectorized paths"""
+        strides = self._stride_list
+        index = 0
+        for column, size, stride in zip(CATEGORICAL, CATEGORY_SIZES, strides[:3]):
+            index += min(max(int(row[column]), 0), size - 1) * stride
+        if not self.interpolate:
+            for column, edges, stride in zip(CONTINUOUS, self._edge_lists, strides[3:]):
+                index += bisect_left(edges, row[column]) * stride
+            return float(self._flat[index])
+
+        corners = [(index, 1.0)]
+        for column, centers, stride in zip(CONTINUOUS, self._center_lists, strides[3:]):
+            x = min(max(row[column], centers[0]), centers[-1])
+            low = min(max(bisect_right(centers, x) - 1, 0), len(centers) - 2)
+            weight = (x - centers[low]) / (centers[low + 1] - centers[low])
+            corners = [corner for i, w in corners
+                       for corner in ((i + low * stride, w * (1 - weight)), (i + (low + 1) * stride, w * weight))]
+        flat = self._flat
+        return float(sum(float(flat[i]) * w for i, w in corners))
+
+    def predict_proba(self, X):
+        X = np.asarray(X, dtype=np.float64)
+        if X.ndim == 1:
+            X = X[None, :]
+        if len(X) == 1:
+            positive = self._score_row(X[0].tolist())
+            return np.array([[1.0 - positive, positive]])
+        positive = self._score_interpolated(X) if self.interpolate else self._score_cells(X)
+        positive = positive.astype(np.float64)
+        return np.column_stack([1.0 - positive, positive])
+
+    def to_arrays(self):
+        arrays = {
+            'kind': np.array(self.kind), 'table': self.table,
+            'interpolate': np.array(self.interpolate),
+            'model_version': np.array(self.model_version or ''),
+        }
+        for i, (edges, centers) in enumerate(zip(self.edges, self.centers)):
+            arrays[f'edges_{i}'] = edges
+            arrays[f'centers_{i}'] = centers
+        for name, value in self.errors.items():
+            arrays[f'error_{name}'] = np.array(value)
+        return arrays
+
+
+def _cell_edges(thresholds, cells):
+    """Inner edges at quantiles of the model's split points, always keeping the outermost splits"""
+    if len(thresholds) == 0:
+        return np.array([0.0])
+    quantiles = np.quantile(thresholds, np.linspace(0, 1, cells - 1))
+    # Snap to real split points so cell borders coincide with model borders
+    unique = np.unique(thresholds)
+    snapped = unique[np.clip(np.searchsorted(unique, quantiles), 0, len(unique) - 1)]
+    return np.unique(snapped)
+
+
+def _cell_centers(edges):
+    """A value inside every cell: midpoints, nudged past the outer edges for the open cells"""
+    pad = np.maximum(1e-3, np.abs(edges[[0, -1]]) * 1e-3)
+    inner = (edges[:-1] + edges[1:]) / 2
+    return np.concatenate([[edges[0] - pad[0]], inner, [edges[-1] + pad[1]]])
+
+
+def _split_thresholds(model, feature):
+    """Every split threshold the model uses on one feature"""
+    trees = [model] if hasattr(model, 'tree_') else list(getattr(model, 'estimators_', []))
+    values = [t.tree_.threshold[t.tree_.feature == feature] for t in trees if hasattr(t, 'tree_')]
+    return np.concatenate(values) if values else np.array([])
+
+
+def _grid_rows(centers):
+    """Model inputs for every (category, cell) combination in table order"""
+    axes = [np.arange(size, dtype=np.float64) for size in CATEGORY_SIZES] + list(centers)
+    mesh = np.meshgrid(*axes, indexing='ij')
+    X = np.empty((mesh[0].size, 6))
+    for column, values in zip(CATEGORICAL + CONTINUOUS, mesh):
+        X[:, column] = values.ravel()
+    return X
+
+
+def _probe_rows(lut, n_rows=PROBE_ROWS, seed=0):
+    """Random rows spread across every cell, plus points just either side of each edge"""
+    rng = np.random.default_rng(seed)
+    X = np.empty((n_rows, 6))
+    for column, size in zip(CATEGORICAL, CATEGORY_SIZES):
+        X[:, column] = rng.integers(0, size, n_rows)
+    for column, edges, centers in zip(CONTINUOUS, lut.edges, lut.centers):
+        low, high = centers[0] - abs(centers[0]) * 0.5, centers[-1] + abs(centers[-1]) * 0.5
+        values = rng.uniform(low, high, n_rows)
+        near_edge = rng.random(n_rows) < 0.5
+        picks = rng.choice(edges, n_rows)
+        values[near_edge] = (picks + rng.choice([-1e-3, 1e-3], n_rows) * np.maximum(1.0, np.abs(picks)))[near_edge]
+        X[:, column] = np.maximum(values, 0.0)
+    return X
+
+
+def measure_error(lut, model, X=None):
+    """Max/mean/p99 absolute score error and risk-bucket agreement against the real model"""
+    if X is None:
+        X = _probe_rows(lut)
+    expected = model.predict_proba(X)[:, 1]
+    actual = lut.predict_proba(X)[:, 1]
+    error = np.abs(actual - expected)
+
+    def bucket(score):
+        return np.where(score < 0.3, 0, np.where(score < 0.7, 1, 2))
+
+    return {
+        'max': float(error.max()),
+        'mean': float(error.mean()),
+        'p99': float(np.percentile(error, 99)),
+        'bucket_agreement': float((bucket(actual) == bucket(expected)).mean()),
+        'probe_rows': len(X),
+    }
+
+
+def build_lut(model, cells=DEFAULT_CELLS, model_version=None):
+    """Evaluate the model over the quantized grid"""
+    if list(getattr(model, 'classes_', [0, 1])) != [0, 1]:
+        raise ValueError("Lookup tables are only built for binary 0/1 classifiers")
+
+    edges = [_cell_edges(_split_thresholds(model, column), n) for column, n in zip(CONTINUOUS, cells)]
+    centers = [_cell_centers(e) for e in edges]
+    shape = CATEGORY_SIZES + tuple(len(c) for c in centers)
+    table = model.predict_proba(_grid_rows(centers))[:, 1].astype(np.float32).reshape(shape)
+
+    lut = ScoreLUT(edges, centers, table, model_version=model_version)
+    X = _probe_rows(lut)
+    lut.errors = {'cells_' + k: v for k, v in measure_error(lut, model, X).items()}
+    lut.interpolate = True
+    lut.errors.update({'interpolated_' + k: v for k, v in measure_error(lut, model, X).items()})
+    lut.interpolate = False
+    return lut
+
+
+def save_lut(lut, path=LUT_PATH):
+    np.savez_compressed(path, **lut.to_arrays())
+
+
+def load_lut(path=LUT_PATH, interpolate=None):
+    """Load a table written by save_lut(); interpolate overrides the stored default"""
+    with np.load(path, allow_pickle=False) as data:
+        if str(data['kind']) != ScoreLUT.kind:
+            raise ValueError(f"{path} is not a score lookup table")
+        edges = [data[f'edges_{i}'] for i in range(len(CONTINUOUS))]
+        centers = [data[f'centers_{i}'] for i in range(len(CONTINUOUS))]
+        errors = {key[len('error_'):]: data[key].item() for key in data.files if key.startswith('error_')}
+        return ScoreLUT(
+            edges, centers, data['table'],
+            interpolate=bool(data['interpolate']) if interpolate is None else interpolate,
+            model_version=str(data['model_version']) or None,
+            errors=errors,
+        )
+
+
+def _print_errors(errors):
+    for mode in ('cells', 'interpolated'):
+        print(f"   {mode:<12} max error {errors[mode + '_max']:.4f}, p99 {errors[mode + '_p99']:.4f}, "
+              f"mean {errors[mode + '_mean']:.5f}, risk bucket agreement {errors[mode + '_bucket_agreement']:.2%}")
+
+
+def main():
+    from utils import model_manager
+
+    parser = argparse.ArgumentParser(description="Build or check the quantized score lookup table")
+    parser.add_argument('command', choices=['build', 'check'])
+    parser.add_argument('--model', default=model_manager.MODEL_PATH)
+    parser.add_argument('--lut', '--out', dest='lut', default=LUT_PATH)
+    parser.add_argument('--cells', type=int, nargs=3, default=list(DEFAULT_CELLS),
+                        metavar=('TIME_DIFF', 'DISTANCE', 'LATENCY'))
+    parser.add_argument('--database', default=None, help="also measure the error on stored logins")
+    args = parser.parse_args()
+
+    model, version = model_manager._load_from_disk(args.model)[:2]
+    if args.command == 'build':
+        started = time.perf_counter()
+        lut = build_lut(model, cells=args.cells, model_version=version)
+        save_lut(lut, args.lut)
+        print(f"✅ Score table for model {version} written to {args.lut} "
+              f"({lut.table.size:,} cells, {time.perf_counter() - started:.1f}s)")
+        _print_errors(lut.errors)
+        return
+
+    lut = load_lut(args.lut)
+    if lut.model_version != version:
+        print(f"⚠ Table was built for model {lut.model_version}, current model is {version}")
+    lut.errors = {'cells_' + k: v for k, v in measure_error(lut, model).items()}
+    lut.interpolate = True
+    lut.errors.update({'interpolated_' + k: v for k, v in measure_error(lut, model).items()})
+    print(f"Score table {args.lut} vs model {version} on {PROBE_ROWS:,} probe rows:")
+    _print_errors(lut.errors)
+
+    if args.database:
+        X = _stored_logins(args.database)
+        lut.interpolate = False
+        lut.errors = {'cells_' + k: v for k, v in measure_error(lut, model, X).items()}
+        lut.interpolate = True
+        lut.errors.update({'interpolated_' + k: v for k, v in measure_error(lut, model, X).items()})
+        print(f"... and on {len(X):,} stored logins:")
+        _print_errors(lut.errors)
+
+
+def _stored_logins(database_path):
+    """Model inputs of every stored login"""
+    import pandas as pd
+    from utils.connection import connect
+    from utils.scoring import build_feature_matrix
+
+    conn = connect(database_path)
+    history = pd.read_sql_query('''
+        SELECT time_diff_hrs AS time_diff, distance_km AS distance, device_type,
+               is_attack_ip, login_successful, latency_ms AS latency
+        FROM login_activities
+    ''', conn)
+    conn.close()
+    return build_feature_matrix(history)
+
+
+if __name__ == '__main__':
+    main()
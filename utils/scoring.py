@@ -0,0 +1,239 @@
+# utils/scoring.py
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from utils.model_manager import get_scorer
+from utils.metrics import timed, increment
+from utils.analysis_codes import WARNING_TEXTS
+from utils.database import get_location_context, get_connection
+from utils.rules import get_rules, match_rules_batch, rule_factor, rules_enabled
+from utils.profiles import MIN_PROFILE_LOGINS, consistency_from_profile, load_user_profiles
+
+# Feature order the model was trained on
+FEATURE_COLUMNS = ['time_diff', 'distance', 'device_type', 'is_attack_ip', 'login_successful', 'latency']
+
+DEVICE_CODES = {'mobile': 0, 'desktop': 1, 'tablet': 2}
+DEVICE_NAMES = np.array(['mobile', 'desktop', 'tablet', 'unknown'], dtype=object)
+
+CLASSIFICATIONS = np.array(['LOW', 'MEDIUM', 'HIGH'], dtype=object)
+ACTIONS = np.array(['ALLOW', 'ALLOW_WITH_OTP', 'BLOCK'], dtype=object)
+RECOMMENDATIONS = np.array([
+    "ALLOW: Legitimate travel with consistent behavior.",
+    "ALLOW with SMS OTP: Possible legitimate travel, verify with additional authentication.",
+    "BLOCK: High risk detected, prevent access and require manual review.",
+], dtype=object)
+
+DISTANCE_FACTORS = np.array([
+    "Travel is plausible (Same location or local area)",
+    "Travel is plausible (Domestic travel)",
+    "Long-distance travel detected",
+], dtype=object)
+
+# The five generate_warnings() flags, in the bit order they are stored with
+MODEL_WARNINGS = WARNING_TEXTS[:5]
+
+# Every combination of the five warning flags, indexed by bitmask
+_WARNING_LISTS = np.empty(1 << len(MODEL_WARNINGS), dtype=object)
+for _mask in range(len(_WARNING_LISTS)):
+    _WARNING_LISTS[_mask] = [text for bit, text in enumerate(MODEL_WARNINGS) if _mask >> bit & 1]
+
+FALLBACK_PREDICTIONS = {
+    'missing': {
+        'recommendation': 'ALLOW with SMS OTP: Model not available - manual review required.',
+        'analysis_factors': ['Model not loaded - using fallback prediction', 'Manual verification recommended'],
+        'warnings': ['⚠ Model unavailable'],
+    },
+    'failed': {
+        'recommendation': 'ALLOW with SMS OTP: Model prediction failed - manual review required.',
+        'analysis_factors': ['Model prediction error - using fallback', 'Manual verification recommended'],
+        'warnings': ['⚠ Model prediction failed'],
+    },
+}
+
+
+def _to_frame(events):
+    """Accept a list of dicts, a DataFrame or a pyarrow Table"""
+    if isinstance(events, pd.DataFrame):
+        return events.reset_index(drop=True)
+    if hasattr(events, 'to_pandas'):
+        return events.to_pandas()
+    return pd.DataFrame.from_records(list(events))
+
+
+def build_feature_matrix(frame):
+    """Build the (n, 6) model input matrix in one shot"""
+    frame = _to_frame(frame)
+    device = frame['device_type']
+    if device.dtype == object:
+        # Accept raw device names as well as the encoded values
+        device = device.map(lambda d: DEVICE_CODES.get(d, 2) if isinstance(d, str) else d)
+
+    columns = [frame[col] for col in FEATURE_COLUMNS]
+    columns[2] = device
+    return np.column_stack([np.asarray(col, dtype=np.float64) for col in columns])
+
+
+def _fallback_frame(n, reason):
+    """Dummy predictions for every row, same as the single-row fallback"""
+    fallback = FALLBACK_PREDICTIONS[reason]
+    return pd.DataFrame({
+        'risk_score': np.full(n, 0.250),
+        'risk_percentage': np.full(n, 25.0),
+        'classification': np.full(n, 'MEDIUM', dtype=object),
+        'action': np.full(n, 'ALLOW_WITH_OTP', dtype=object),
+        'recommendation': np.full(n, fallback['recommendation'], dtype=object),
+        'analysis_factors': [list(fallback['analysis_factors']) for _ in range(n)],
+        'warnings': [list(fallback['warnings']) for _ in range(n)],
+        'behavior_consistency': np.full(n, 75),
+        'location_context': np.full(n, 'Unknown location context', dtype=object),
+    })
+
+
+def _location_contexts(country, city):
+    """Resolve location context once per distinct (country, city) pair"""
+    codes, uniques = pd.MultiIndex.from_arrays([country, city]).factorize()
+    contexts = np.array([get_location_context(c, ci) for c, ci in uniques], dtype=object)
+    return contexts[codes], codes
+
+
+def _analysis_factors(distance_bucket, consistency, location_codes, location_contexts, device_codes,
+                      decided, rules):
+    """Build factor lists once per distinct combination and broadcast them back"""
+    n_locations = int(location_codes.max()) + 1 if len(location_codes) else 1
+    key = ((distance_bucket * 101 + consistency) * n_locations + location_codes) * 4 + device_codes
+    key = key * (len(rules) + 1) + decided + 1
+    unique_keys, first_index, inverse = np.unique(key, return_index=True, return_inverse=True)
+
+    lists = np.empty(len(unique_keys), dtype=object)
+    for i, row in enumerate(first_index):
+        lists[i] = [
+            DISTANCE_FACTORS[distance_bucket[row]],
+            f"Behavior consistency: {consistency[row]}%",
+            f"Location: {location_contexts[row]}",
+            f"Device type: {DEVICE_NAMES[device_codes[row]]}",
+        ]
+        if decided[row] >= 0:
+            lists[i].append(rule_factor(rules[decided[row]]))
+    return lists[inverse]
+
+
+def _profile_consistency(frame, consistency, device_codes):
+    """Overwrite the heuristic consistency for users with an established profile"""
+    conn = get_connection()
+    profiles = load_user_profiles(conn, frame['user_id'].unique())
+    if not profiles:
+        return consistency
+
+    login_times = frame['login_time'] if 'login_time' in frame else pd.Series([datetime.now()] * len(frame))
+    for row, (user_id, country, city, latency, login_time) in enumerate(zip(
+            frame['user_id'], frame['country'], frame['city'], frame['latency'], login_times)):
+        profile = profiles.get(user_id)
+        if profile is not None and profile['login_count'] >= MIN_PROFILE_LOGINS:
+            consistency[row] = consistency_from_profile(
+                profile, DEVICE_NAMES[device_codes[row]], country, city, latency, login_time)
+    return consistency
+
+
+def _build_predictions(frame, features, risk_score, decided, rules):
+    """Turn risk scores into the full prediction fields with array operations"""
+    time_diff, distance, device, is_attack_ip, login_successful, latency = features.T
+
+    # Classification and action share the same LOW/MEDIUM/HIGH bucket
+    level = np.where(risk_score < 0.3, 0, np.where(risk_score < 0.7, 1, 2))
+
+    device_codes = np.where(np.isin(device, (0, 1, 2)), device, 3).astype(np.int64)
+
+    # Same rules as calculate_behavior_consistency: profile when known, heuristic otherwise
+    with timed('batch_behavior_consistency'):
+        consistency = np.where(device == 0, 85, np.where(distance < 100, 95, 70)).astype(np.int64)
+        if 'user_id' in frame:
+            consistency = _profile_consistency(frame, consistency, device_codes)
+
+    location_context, location_codes = _location_contexts(frame['country'], frame['city'])
+
+    distance_bucket = np.where(distance < 50, 0, np.where(distance < 1000, 1, 2))
+    analysis_factors = _analysis_factors(distance_bucket, consistency, location_codes,
+                                         location_context, device_codes, decided, rules)
+
+    warning_mask = (
+        (is_attack_ip != 0).astype(np.int64)
+        | (login_successful == 0).astype(np.int64) << 1
+        | (latency > 2000).astype(np.int64) << 2
+        | (distance > 10000).astype(np.int64) << 3
+        | (risk_score > 0.8).astype(np.int64) << 4
+    )
+
+    return pd.DataFrame({
+        'risk_score': risk_score,
+        'risk_percentage': risk_score * 100,
+        'classification': CLASSIFICATIONS[level],
+        'action': ACTIONS[level],
+        'recommendation': RECOMMENDATIONS[level],
+        'analysis_factors': analysis_factors,
+        'warnings': _WARNING_LISTS[warning_mask],
+        'behavior_consistency': consistency,
+        'location_context': location_context,
+    }, index=frame.index)
+
+
+def _with_rule_rows(fallback, frame, features, risk_score, decided, rules):
+    """Fallback predictions for model rows, rule decisions kept for the rest"""
+    by_rule = decided >= 0
+    if not by_rule.any():
+        return fallback
+    ruled = _build_predictions(frame[by_rule], features[by_rule], risk_score[by_rule], decided[by_rule], rules)
+    return pd.concat([fallback[~by_rule], ruled]).sort_index()
+
+
+def score_logins_batch(events):
+    """
+    Score many login events with a single predict_proba call.
+    Returns a DataFrame with the same fields as get_full_model_prediction, one row per event.
+    """
+    frame = _to_frame(events)
+    n = len(frame)
+    if n == 0:
+        return _fallback_frame(0, 'missing')
+
+    increment('predictions', n)
+    with timed('batch_feature_prep'):
+        features = build_feature_matrix(frame)
+
+    # Rule cascade first; only undecided rows go to the model
+    rules = get_rules() if rules_enabled() else []
+    decided = np.full(n, -1, dtype=np.int64)
+    if rules_enabled():
+        with timed('batch_rules'):
+            decided = match_rules_batch(dict(zip(FEATURE_COLUMNS, features.T)), n, rules)
+        by_rule = decided >= 0
+        if by_rule.any():
+            increment('rule_decisions', int(by_rule.sum()))
+            for index, count in zip(*np.unique(decided[by_rule], return_counts=True)):
+                increment(f"rule_{rules[index]['name']}", int(count))
+
+    risk_score = np.empty(n, dtype=np.float64)
+    by_model = decided < 0
+    if not by_model.all():
+        risk_score[~by_model] = np.array([float(rule['risk_score']) for rule in rules])[decided[~by_model]]
+
+    if by_model.any():
+        n_model = int(by_model.sum())
+        with timed('batch_model_load'):
+            model = get_scorer(n_model)
+        if model is None:
+            increment('fallback_predictions', n_model)
+            increment('fallback_model_missing', n_model)
+            return _with_rule_rows(_fallback_frame(n, 'missing'), frame, features, risk_score, decided, rules)
+        try:
+            with timed('batch_predict_proba'):
+                model_features = features if n_model == n else features[by_model]
+                risk_score[by_model] = model.predict_proba(model_features)[:, 1]
+        except Exception as e:
+            print(f"Error in batch model prediction: {e}")
+            increment('fallback_predictions', n_model)
+            increment('fallback_model_error', n_model)
+            return _with_rule_rows(_fallback_frame(n, 'failed'), frame, features, risk_score, decided, rules)
+
+    return _build_predictions(frame, features, risk_score, decided, rules)
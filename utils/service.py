@@ -0,0 +1,215 @@
+# utils/service.py
+"""
+Standalone BantAI scoring service for the bank's login flow.
+
+    uvicorn utils.service:app --host 0.0.0.0 --port 8000
+
+Concurrent requests that arrive within BANTAI_MAX_WAIT_MS of each other are
+coalesced into one batched model call and one INSERT transaction (or handed
+to the write-behind queue with BANTAI_INGEST=queue, see utils.ingest).
+"""
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+from datetime import datetime
+from typing import List, Optional
+
+from fastapi import FastAPI
+from pydantic import BaseModel, Field
+
+from utils.database import store_login_activities, login_activity_row
+from utils.features import derive_login_features, get_last_login_store, last_login_entry, record_login
+from utils.ingest import flush_all
+from utils.metrics import metrics_snapshot
+from utils.model_manager import get_model, get_model_status
+from utils.scoring import score_logins_batch
+
+MAX_BATCH_SIZE = int(os.environ.get('BANTAI_MAX_BATCH_SIZE', '64'))
+MAX_WAIT_MS = float(os.environ.get('BANTAI_MAX_WAIT_MS', '2'))
+
+
+class LoginEvent(BaseModel):
+    user_id: str
+    country: str
+    city: str
+    time_diff: Optional[float] = Field(None, ge=0, description="Hours since the previous login (derived if omitted)")
+    distance: Optional[float] = Field(None, ge=0, description="Km from the previous login (derived if omitted)")
+    device_type: str = Field(description="mobile, desktop or tablet")
+    latency: float = Field(ge=0, description="Round-trip network time in ms")
+    is_attack_ip: bool = False
+    login_successful: bool = True
+
+
+class ScoreResponse(BaseModel):
+    risk_score: float
+    risk_percentage: float
+    classification: str
+    action: str
+    recommendation: str
+    analysis_factors: List[str]
+    warnings: List[str]
+    behavior_consistency: int
+    location_context: str
+
+
+def score_and_store(events):
+    """Score a batch of events and persist them to login_activities"""
+    login_time = datetime.now().replace(microsecond=0)
+    login_timestamp = login_time.strftime('%Y-%m-%d %H:%M:%S')
+
+    # Fill in time_diff/distance from each user's last login, in arrival order. Logins of this
+    # batch are staged locally and only reach the store once the batch is stored
+    features, staged = [], {}
+    for e in events:
+        time_diff, distance = e.time_diff, e.distance
+        if time_diff is None or distance is None:
+            derived = derive_login_features(e.user_id, e.country, e.city, e.device_type, login_time, staged)
+            time_diff = derived[0] if time_diff is None else time_diff
+            distance = derived[1] if distance is None else distance
+        staged[e.user_id] = last_login_entry(e.country, e.city, e.device_type, login_time)
+        features.append((time_diff, distance))
+
+    predictions = score_logins_batch([
+        {
+            'user_id': e.user_id,
+            'login_time': login_time,
+            'time_diff': time_diff,
+            'distance': distance,
+            'device_type': e.device_type,
+            'latency': e.latency,
+            'is_attack_ip': int(e.is_attack_ip),
+            'login_successful': int(e.login_successful),
+            'country': e.country,
+            'city': e.city,
+        }
+        for e, (time_diff, distance) in zip(events, features)
+    ]).to_dict('records')
+
+    store_login_activities([
+        login_activity_row(e.user_id, login_timestamp, e.country, e.city, time_diff, distance,
+                           e.device_type, e.latency, e.is_attack_ip, e.login_successful, p)
+        for e, (time_diff, distance), p in zip(events, features, predictions)
+    ])
+    for e in events:
+        record_login(e.user_id, e.country, e.city, e.device_type, login_time)
+    return predictions
+
+
+class MicroBatcher:
+    """Collects concurrent requests and scores them together"""
+
+    def __init__(self, handler, max_batch_size=MAX_BATCH_SIZE, max_wait_ms=MAX_WAIT_MS):
+        self.handler = handler
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self.queue = asyncio.Queue()
+        self.batches = 0
+        self.items = 0
+        self._task = None
+        self._stopped = False
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """Stop the worker and fail every request it will not answer"""
+        self._stopped = True
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+        while not self.queue.empty():
+            _, future = self.queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Scoring service is shutting down"))
+
+    async def submit(self, item):
+        if self._stopped:
+            raise RuntimeError("Scoring service is shutting down")
+        future = asyncio.get_running_loop().create_future()
+        await self.queue.put((item, future))
+        return await future
+
+    async def _collect(self):
+        """Wait for one request, then take whatever else arrives within max_wait"""
+        batch = [await self.queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), remaining))
+            except asyncio.TimeoutError:
+                break
+        # Anything already queued rides along without waiting
+        while len(batch) < self.max_batch_size and not self.queue.empty():
+            batch.append(self.queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            batch = await self._collect()
+            items = [item for item, _ in batch]
+            try:
+                # Model and SQLite work runs off the event loop so new requests keep queueing
+                results = await loop.run_in_executor(None, self.handler, items)
+            except asyncio.CancelledError:
+                # Stopped mid-batch: the handler may still finish, but nobody waits for it
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(RuntimeError("Scoring service is shutting down"))
+                raise
+            except Exception as e:
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.batches += 1
+            self.items += len(batch)
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Load (and compile) the model and warm the last-login store before accepting traffic
+    get_model()
+    get_last_login_store()
+    app.state.batcher = MicroBatcher(score_and_store)
+    app.state.batcher.start()
+    yield
+    await app.state.batcher.stop()
+    flush_all()
+
+
+app = FastAPI(title="BantAI Scoring Service", version="1.0", lifespan=lifespan)
+
+
+@app.post("/v1/score", response_model=ScoreResponse)
+async def score(event: LoginEvent):
+    """Score one login attempt and record it"""
+    return await app.state.batcher.submit(event)
+
+
+@app.get("/healthz")
+async def healthz():
+    batcher = app.state.batcher
+    return {
+        'model': get_model_status(),
+        'batches': batcher.batches,
+        'mean_batch_size': batcher.items / batcher.batches if batcher.batches else 0,
+        'queue_depth': batcher.queue.qsize(),
+        'last_login_store': get_last_login_store().stats(),
+    }
+
+
+@app.get("/v1/metrics")
+async def metrics():
+    """Stage latency histograms and fallback counters"""
+    return metrics_snapshot()
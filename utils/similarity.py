@@ -0,0 +1,230 @@
+# utils/similarity.py
+"""
+Nearest-neighbour lookup of login activities over the model's features, so
+an analyst can see how similar incidents were decided and apply a decision
+to near-identical pending ones.
+
+A login's feature vector is its time_diff, distance and latency, each
+normalized to [0, 1] on a log scale (normalized_features), plus the attack
+IP and login success flags. The user, city and device are keys: neighbours
+always share the city and device, and a different user adds USER_WEIGHT to
+the distance.
+
+The index is a grid: CELL_SQL quantizes the three continuous features into
+CELL_BINS bins each and packs them with the two flags into one integer. The
+expression indexes idx_similar_location (city, device, cell, then the
+features, so lookups never touch the table) and idx_similar_user (user,
+city, device, cell) file every row under its cell. SQLite maintains them
+on every insert and update, so the index grows with the table and needs no
+rebuild.
+
+A lookup reads the user's own logins in the city on the device, then other
+users' logins in the query's cell, then in the adjacent cells, ranking the
+candidates by exact distance after each read, and stops as soon as no
+unread login can be nearer than the k-th found. Results are exact among the
+user's logins and other users' logins within one bin on every feature (up
+to CANDIDATE_LIMIT candidates), which bounds the search to a few cells
+however large the table is:
+
+    similar_incidents(conn, 1042)  # [(id, distance)], nearest first
+    close_matches(conn, 1042)      # pending logins of the same user, city and device within MATCH_DISTANCE
+"""
+import math
+from bisect import bisect_right
+from itertools import product
+
+import numpy as np
+
+from utils.metrics import timed
+from utils.review_queue import PENDING
+from utils.timestamps import now_ms
+
+# (low, high) end of each continuous feature's log scale; values outside normalize to 0 or 1
+FEATURE_RANGES = {'time_diff_hrs': (0.0, 48.0), 'distance_km': (0.0, 10000.0), 'latency_ms': (10.0, 3000.0)}
+
+CELL_BINS = 8
+
+# A login of another user counts this much further away
+USER_WEIGHT = 0.25
+
+# Largest distance at which a pending login is offered for a bulk decision;
+# below 1 / CELL_BINS, so the adjacent cells hold every such login
+MATCH_DISTANCE = 0.1
+
+# Candidates ranked per lookup at most; the nearest cells are read first
+CANDIDATE_LIMIT = 2000
+
+NEIGHBOR_COUNT = 10
+
+FLAG_OPTIONS = [(0, 0), (0, 1), (1, 0), (1, 1)]
+
+
+def _log_scale(low, high):
+    return math.log1p(low), math.log1p(high) - math.log1p(low)
+
+
+def _normalize(values, low, high):
+    offset, span = _log_scale(low, high)
+    values = np.nan_to_num(np.asarray(values, dtype=float))
+    return np.clip((np.log1p(np.clip(values, 0, None)) - offset) / span, 0, 1)
+
+
+def _bin_edges(low, high):
+    """Raw values at which each bin starts (rounded, so the SQL and Python binning agree)"""
+    offset, span = _log_scale(low, high)
+    return [round(math.expm1(offset + k / CELL_BINS * span), 3) for k in range(1, CELL_BINS)]
+
+
+BIN_EDGES = {column: _bin_edges(*bounds) for column, bounds in FEATURE_RANGES.items()}
+
+# The same edges in normalized units, for the distance from a vector to its cell's walls
+NORMALIZED_EDGES = {column: _normalize(edges, *FEATURE_RANGES[column]) for column, edges in BIN_EDGES.items()}
+
+
+def _bin_sql(column):
+    cases = ' '.join(f'WHEN COALESCE({column}, 0) < {edge} THEN {k}' for k, edge in enumerate(BIN_EDGES[column]))
+    return f'CASE {cases} ELSE {CELL_BINS - 1} END'
+
+
+# Grid cell of a row; queries must repeat this expression exactly to use the indexes
+CELL_SQL = (f"((({_bin_sql('time_diff_hrs')}) * {CELL_BINS} + ({_bin_sql('distance_km')})) * {CELL_BINS}"
+            f" + ({_bin_sql('latency_ms')})) * 4 + COALESCE(is_attack_ip, 0) * 2 + COALESCE(login_successful, 0)")
+
+FEATURE_COLUMNS = ['time_diff_hrs', 'distance_km', 'latency_ms', 'is_attack_ip', 'login_successful']
+
+CREATE_SIMILARITY_INDEXES_SQL = [
+    f'''CREATE INDEX IF NOT EXISTS idx_similar_location
+        ON login_activities (city, device_type, {CELL_SQL}, user_id, {", ".join(FEATURE_COLUMNS)})''',
+    f'CREATE INDEX IF NOT EXISTS idx_similar_user ON login_activities (user_id, city, device_type, {CELL_SQL})',
+]
+
+
+def create_similarity_indexes(conn):
+    """Grid indexes over the feature vectors (used by the schema migration)"""
+    for sql in CREATE_SIMILARITY_INDEXES_SQL:
+        conn.execute(sql)
+
+
+def neighbor_sql(cell_count, same_user=False, pending_only=False):
+    """Candidates in cell_count cells (any cell for 0); parameters: [user_id,] city, device_type, *cells, [now, admin,] limit"""
+    index, keys = ('idx_similar_user', 'user_id = ? AND ') if same_user else ('idx_similar_location', '')
+    pending = f'''
+      AND admin_action = '{PENDING}'
+      AND NOT EXISTS (SELECT 1 FROM review_leases
+                      WHERE activity_id = login_activities.id AND leased_until > ? AND admin IS NOT ?)
+    ''' if pending_only else ''
+    cells = f'AND {CELL_SQL} IN ({", ".join("?" * cell_count)})' if cell_count else ''
+    return f'''
+        SELECT id, user_id, {", ".join(FEATURE_COLUMNS)}
+        FROM login_activities INDEXED BY {index}
+        WHERE {keys}city = ? AND device_type = ? {cells} {pending}
+        LIMIT ?
+    '''
+
+
+def normalized_features(time_diff, distance, latency, is_attack_ip, login_successful):
+    """Feature vectors, one row per login: three log-scaled features in [0, 1] and the two flags"""
+    continuous = [_normalize(values, *bounds)
+                  for values, bounds in zip((time_diff, distance, latency), FEATURE_RANGES.values())]
+    flags = [np.nan_to_num(np.asarray(values, dtype=float)) for values in (is_attack_ip, login_successful)]
+    return np.column_stack(continuous + flags)
+
+
+def feature_cell(row):
+    """(time_diff, distance, latency, is_attack_ip, login_successful) -> (bins, flags) as CELL_SQL files it"""
+    bins = tuple(bisect_right(BIN_EDGES[column], value or 0) for column, value in zip(FEATURE_RANGES, row[:3]))
+    return bins, (int(row[3] or 0), int(row[4] or 0))
+
+
+def adjacent_cells(bins, flag_options, reach=1):
+    """Cell numbers within reach bins of bins on every feature, for each (is_attack_ip, login_successful) option"""
+    ranges = [range(max(b - reach, 0), min(b + reach + 1, CELL_BINS)) for b in bins]
+    return [((t * CELL_BINS + d) * CELL_BINS + lat) * 4 + attack * 2 + success
+            for t, d, lat in product(*ranges) for attack, success in flag_options]
+
+
+def _wall_distance(vector, bins, reach=0):
+    """Distance from a normalized vector to the nearest inner wall of the block of cells within reach of bins
+
+    The 0 and 1 ends of a feature are no walls, no rows lie past them.
+    """
+    walls = [1.0]
+    for value, b, edges in zip(vector, bins, NORMALIZED_EDGES.values()):
+        if b - reach > 0:
+            walls.append(value - edges[b - reach - 1])
+        if b + reach < CELL_BINS - 1:
+            walls.append(edges[b + reach] - value)
+    return max(min(walls), 0.0)
+
+
+def _login(conn, activity_id):
+    return conn.execute(f'SELECT user_id, city, device_type, {", ".join(FEATURE_COLUMNS)} '
+                        'FROM login_activities WHERE id = ?', (activity_id,)).fetchone()
+
+
+def _ranked(login, activity_id, candidates):
+    """Candidates other than activity_id with their distance to login, nearest first"""
+    candidates = [row for row in candidates if row[0] != activity_id]
+    if not candidates:
+        return []
+    columns = list(zip(*candidates))
+    vectors = normalized_features(*columns[2:])
+    distance = np.sqrt(((vectors - normalized_features(*[[value] for value in login[3:]])) ** 2).sum(axis=1))
+    distance += USER_WEIGHT * (np.array(columns[1], dtype=object) != login[0])
+    order = np.argsort(distance, kind='stable')
+    return [(int(columns[0][i]), round(float(distance[i]), 4)) for i in order]
+
+
+def similar_incidents(conn, activity_id, k=NEIGHBOR_COUNT):
+    """The k logins nearest to activity_id in the same city and on the same device -> [(id, distance)]
+
+    Other users' logins are only considered within one bin on every feature,
+    so fewer than k come back when the login has few close neighbours.
+    """
+    with timed('similar_incidents'):
+        login = _login(conn, activity_id)
+        if login is None:
+            return []
+        bins, flags = feature_cell(login[3:])
+        vector = normalized_features(*[[value] for value in login[3:]])[0][:3]
+        own = adjacent_cells(bins, [flags], reach=0)
+        ring = [cell for cell in adjacent_cells(bins, [flags]) if cell not in own]
+        # (same user, cells, distance of the nearest login left unread in the block afterwards):
+        # the user's own logins come first, all of them; other users start USER_WEIGHT away,
+        # beyond the own cell's walls more, other flags 1 further
+        probes = [
+            (True, [], USER_WEIGHT),
+            (False, own, _wall_distance(vector, bins) + USER_WEIGHT),
+            (False, ring, 1 + USER_WEIGHT),
+            (False, adjacent_cells(bins, [option for option in FLAG_OPTIONS if option != flags]), math.inf),
+        ]
+
+        candidates, ranked = {}, []
+        for same_user, cells, unread_distance in probes:
+            limit = CANDIDATE_LIMIT - len(candidates)
+            if limit <= 0:
+                break
+            params = (login[0],) * same_user + (login[1], login[2], *cells, limit)
+            for row in conn.execute(neighbor_sql(len(cells), same_user), params):
+                candidates[row[0]] = row
+            ranked = _ranked(login, activity_id, list(candidates.values()))
+            if len(ranked) >= k and ranked[k - 1][1] <= unread_distance:
+                break
+        return ranked[:k]
+
+
+def close_matches(conn, activity_id, max_distance=MATCH_DISTANCE, admin=None):
+    """Pending logins of the same user, city and device within max_distance of activity_id -> [(id, distance)]
+
+    Logins another analyst holds a review lease on are left out; admin's own are kept.
+    """
+    with timed('close_matches'):
+        login = _login(conn, activity_id)
+        if login is None:
+            return []
+        bins, flags = feature_cell(login[3:])
+        # Different flags are at least 1 apart, further than any close match
+        cells = adjacent_cells(bins, [flags])
+        candidates = conn.execute(neighbor_sql(len(cells), same_user=True, pending_only=True),
+                                  (login[0], login[1], login[2], *cells, now_ms(), admin, CANDIDATE_LIMIT)).fetchall()
+        return [(i, distance) for i, distance in _ranked(login, activity_id, candidates) if distance <= max_distance]
@@ -0,0 +1,99 @@
+# utils/timestamps.py
+"""
+Login times as stored since schema version 9.
+
+login_activities.login_ts holds the instant as integer milliseconds since the
+Unix epoch (UTC) and utc_offset the minutes east of UTC it was recorded at,
+so time ranges are integer comparisons on an index and the local wall-clock
+time the pages show ("Login Timestamp (UTC+8)") can still be rebuilt.
+
+Naive datetimes and 'YYYY-MM-DD HH:MM:SS' text, which is what the app
+produces with datetime.now(), are local time at UTC_OFFSET_MINUTES
+(BANTAI_UTC_OFFSET_MINUTES, default the server's own offset).
+"""
+import os
+import time
+from datetime import date, datetime, timedelta, timezone
+
+import pandas as pd
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+DAY_MS = 86400000
+
+_offset = os.environ.get('BANTAI_UTC_OFFSET_MINUTES')
+UTC_OFFSET_MINUTES = int(_offset) if _offset else int(datetime.now().astimezone().utcoffset() / timedelta(minutes=1))
+
+_EPOCH = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+def local_time_sql(row=None):
+    """SQL for a row's local time as TIMESTAMP_FORMAT text"""
+    prefix = f'{row}.' if row else ''
+    return f"datetime({prefix}login_ts / 1000 + {prefix}utc_offset * 60, 'unixepoch')"
+
+
+def epoch_timestamps(conn):
+    """True once login times are stored as login_ts/utc_offset (migration 9) rather than text"""
+    return 'login_ts' in [row[1] for row in conn.execute('PRAGMA table_info(login_activities)')]
+
+
+def login_time_sql(conn, row=None):
+    """local_time_sql(), or the login_timestamp text column on a schema older than version 9"""
+    if epoch_timestamps(conn):
+        return local_time_sql(row)
+    return f'{row}.login_timestamp' if row else 'login_timestamp'
+
+
+def to_login_ts(value, utc_offset=UTC_OFFSET_MINUTES):
+    """datetime, date or timestamp text -> (login_ts, utc_offset); naive values are local at utc_offset"""
+    if isinstance(value, str):
+        value = datetime.fromisoformat(value)
+    elif not isinstance(value, datetime):
+        value = datetime.combine(value, datetime.min.time())
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone(timedelta(minutes=utc_offset)))
+    else:
+        utc_offset = int(value.utcoffset() / timedelta(minutes=1))
+    return (value - _EPOCH) // timedelta(milliseconds=1), utc_offset
+
+
+def to_epoch_ms(value, utc_offset=UTC_OFFSET_MINUTES):
+    return to_login_ts(value, utc_offset)[0]
+
+
+def timestamp_bound(value, end=False):
+    """login_ts bound and operator for a date range; a plain date as the end includes that whole day"""
+    if isinstance(value, date) and not isinstance(value, datetime) and end:
+        return to_epoch_ms(value + timedelta(days=1)), '<'
+    return to_epoch_ms(value), '<=' if end else '>='
+
+
+def now_ms():
+    return time.time_ns() // 1000000
+
+
+def local_datetime(login_ts, utc_offset=UTC_OFFSET_MINUTES):
+    """Epoch milliseconds -> naive local datetime"""
+    return datetime(1970, 1, 1) + timedelta(milliseconds=login_ts + utc_offset * 60000)
+
+
+def local_timestamp(login_ts, utc_offset=UTC_OFFSET_MINUTES):
+    return local_datetime(login_ts, utc_offset).strftime(TIMESTAMP_FORMAT)
+
+
+def local_today():
+    return local_datetime(now_ms()).date()
+
+
+def local_datetimes(login_ts, utc_offset):
+    """Columns of epoch milliseconds and offsets -> datetime64 Series of local times (no text parsing)"""
+    login_ts = pd.Series(login_ts)
+    local_ms = login_ts.to_numpy('int64') + pd.Series(utc_offset).to_numpy('int64') * 60000
+    return pd.Series(local_ms.astype('datetime64[ms]').astype('datetime64[ns]'), index=login_ts.index)
+
+
+def local_dates(days):
+    """Local day numbers ((login_ts + offset) // DAY_MS) -> datetime64 Series"""
+    days = pd.Series(days)
+    return pd.Series(days.to_numpy('int64').astype('datetime64[D]').astype('datetime64[ns]'), index=days.index)
+